@@ -0,0 +1,116 @@
+"""
+Per-task analyzer overhead: cold subprocess launches vs warm analyzers.
+
+Generates a small Python repository, then runs the same "all" analysis
+several times with a cold TaskExecutor and with a warm one (pylint and
+flake8 servers plus dmypy). Incremental state and the findings cache are
+reset before every task so each one really runs the analyzers.
+
+    python benchmark_analyzers.py --tasks 10 --files 20
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from p2p_network.worker.findings_cache import FindingsCache
+from p2p_network.worker.incremental import AnalysisStateStore
+from p2p_network.worker.repo_cache import RepoCache
+from p2p_network.worker.task_executor import TaskExecutor
+
+MODULE_TEMPLATE = '''import os
+
+
+def helper_{i}(value: int) -> int:
+    total = 0
+    for step in range(value):
+        total += step * {i}
+    return total
+
+
+class Widget{i}:
+    def __init__(self, name: str):
+        self.name = name
+
+    def describe(self) -> str:
+        return os.path.join(self.name, str(helper_{i}(3)))
+'''
+
+
+def make_repository(files: int) -> str:
+    repo_dir = tempfile.mkdtemp(prefix="bench_repo_")
+    for i in range(files):
+        with open(os.path.join(repo_dir, f"module_{i}.py"), "w") as f:
+            f.write(MODULE_TEMPLATE.format(i=i))
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com", "-C", repo_dir]
+    subprocess.run(["git", "init", "-q", repo_dir], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "bench"], check=True)
+    return repo_dir
+
+
+def run_tasks(code_url: str, tasks: int, warm: bool, scratch: str):
+    executor = TaskExecutor(
+        repo_cache=RepoCache(os.path.join(scratch, "repos")),
+        warm_analyzers=warm
+    )
+    timings = {"total": []}
+    try:
+        for i in range(tasks):
+            executor.analysis_state = AnalysisStateStore(os.path.join(scratch, f"state_{warm}_{i}"))
+            executor.findings_cache = FindingsCache(os.path.join(scratch, f"findings_{warm}_{i}"))
+            started = time.perf_counter()
+            result = executor.execute_analysis(f"bench-{i}", code_url, "all")
+            timings["total"].append(time.perf_counter() - started)
+            for tool, findings in result.get("results", {}).items():
+                if "error" in findings:
+                    raise RuntimeError(f"{tool} failed: {findings['error']}")
+                timings.setdefault(tool, []).append(findings["duration"])
+    finally:
+        executor.close()
+    return timings
+
+
+def report(label: str, timings):
+    # The first task pays for starting the warm processes; show it apart
+    first = {name: values[0] for name, values in timings.items()}
+    rest = {name: values[1:] for name, values in timings.items()}
+    print(f"{label}:")
+    for name in sorted(timings):
+        steady = sum(rest[name]) / len(rest[name]) if rest[name] else float("nan")
+        print(f"  {name:<8} first {first[name]:7.3f}s   steady mean {steady:7.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cold vs warm analyzer overhead')
+    parser.add_argument('--tasks', type=int, default=10, help='Tasks per mode (default: 10)')
+    parser.add_argument('--files', type=int, default=20,
+                        help='Python files in the generated repository (default: 20)')
+    args = parser.parse_args()
+
+    repo_dir = make_repository(args.files)
+    scratch = tempfile.mkdtemp(prefix="bench_analyzers_")
+    try:
+        code_url = f"file://{repo_dir}"
+        cold = run_tasks(code_url, args.tasks, False, scratch)
+        warm = run_tasks(code_url, args.tasks, True, scratch)
+    finally:
+        shutil.rmtree(repo_dir, ignore_errors=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{args.tasks} tasks on a {args.files}-file repository")
+    report("Cold launches", cold)
+    report("Warm analyzers", warm)
+    cold_mean = sum(cold["total"][1:]) / max(1, len(cold["total"]) - 1)
+    warm_mean = sum(warm["total"][1:]) / max(1, len(warm["total"]) - 1)
+    print(f"Steady-state per-task saving: {cold_mean - warm_mean:.3f}s "
+          f"({cold_mean / warm_mean:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
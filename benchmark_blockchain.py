@@ -0,0 +1,164 @@
+"""
+Memory and throughput benchmark for the blockchain ledger.
+
+Builds a chain of review records, then measures append throughput,
+full-chain validation throughput and the memory held per block. The
+pre-slots dict-backed block is measured alongside for comparison, and
+the parallel verifier is timed with 1, 2, 4, ... up to ``--max-workers``
+processes to show how it scales.
+
+    python benchmark_blockchain.py --blocks 1000000
+    python benchmark_blockchain.py --blocks 1000000 --no-memory --skip-legacy --max-workers 16
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from p2p_network.blockchain.blockchain import Block, Blockchain
+from p2p_network.blockchain.verifier import verify_chain_parallel
+
+
+class LegacyBlock:
+    """The original dict-backed block, re-serialized on every hash"""
+    def __init__(self, index, timestamp, data, previous_hash):
+        self.index = index
+        self.timestamp = timestamp
+        self.data = data
+        self.previous_hash = previous_hash
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        block_string = json.dumps({
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "data": self.data,
+            "previous_hash": self.previous_hash
+        }, sort_keys=True).encode()
+
+        return hashlib.sha256(block_string).hexdigest()
+
+
+def make_record(i):
+    return {
+        "review_id": f"review-{i}",
+        "commit_id": f"{i:040x}",
+        "reviewer": f"worker-{i % 16}",
+        "status": "COMPLETED",
+        "timestamp": 1700000000.0 + i,
+        "results": {
+            "language": "python",
+            "analysis_type": "pylint",
+            "issue_count": i % 50
+        }
+    }
+
+
+def build_chain(block_cls, count):
+    chain = [block_cls(0, time.time(), {"message": "Genesis Block"}, "0")]
+    for i in range(1, count):
+        previous = chain[-1]
+        chain.append(block_cls(i, time.time(), make_record(i), previous.hash))
+    return chain
+
+
+def validate_chain(chain):
+    for i in range(1, len(chain)):
+        if chain[i].hash != chain[i].calculate_hash():
+            return False
+        if chain[i].previous_hash != chain[i - 1].hash:
+            return False
+    return True
+
+
+def run(label, block_cls, count, measure_memory):
+    gc.collect()
+    if measure_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    chain = build_chain(block_cls, count)
+    build_time = time.perf_counter() - start
+
+    memory = None
+    if measure_memory:
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    valid = validate_chain(chain)
+    validate_time = time.perf_counter() - start
+
+    print(f"{label}:")
+    print(f"  append:   {count / build_time:,.0f} blocks/s ({build_time:.2f}s)")
+    print(f"  validate: {count / validate_time:,.0f} blocks/s ({validate_time:.2f}s, valid={valid})")
+    if memory is not None:
+        print(f"  memory:   {memory / count:,.0f} bytes/block ({memory / 2**20:,.1f} MiB total)")
+
+    del chain
+    gc.collect()
+
+
+def worker_counts(max_workers):
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max_workers]
+
+
+def run_parallel_verify(chain, max_workers):
+    blocks = len(chain.chain)
+    baseline = None
+    print("verify_chain_parallel scaling:")
+    for workers in worker_counts(max_workers):
+        start = time.perf_counter()
+        bad_index = verify_chain_parallel(chain.chain, workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  {workers:>3} workers: {blocks / elapsed:,.0f} blocks/s "
+              f"({elapsed:.2f}s, speedup {baseline / elapsed:.2f}x, valid={bad_index is None})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark blockchain memory and throughput')
+    parser.add_argument('--blocks', type=int, default=1_000_000,
+                        help='Number of blocks to build (default: 1000000)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip tracemalloc memory measurement (faster)')
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Only benchmark the current Block implementation')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help='Most verifier processes in the scaling run (default: CPU count)')
+    args = parser.parse_args()
+
+    measure_memory = not args.no_memory
+    run("Block (slots, cached canonical payload)", Block, args.blocks, measure_memory)
+    if not args.skip_legacy:
+        run("LegacyBlock (dict, re-serialized)", LegacyBlock, args.blocks, measure_memory)
+
+    # End-to-end through the public Blockchain API
+    chain = Blockchain()
+    start = time.perf_counter()
+    for i in range(1, args.blocks):
+        chain.add_block(make_record(i))
+    elapsed = time.perf_counter() - start
+    print(f"Blockchain.add_block: {args.blocks / elapsed:,.0f} blocks/s")
+
+    start = time.perf_counter()
+    valid = chain.is_chain_valid()
+    elapsed = time.perf_counter() - start
+    print(f"Blockchain.is_chain_valid: {args.blocks / elapsed:,.0f} blocks/s (valid={valid})")
+
+    run_parallel_verify(chain, args.max_workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,88 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from datetime import datetime
 import time
+import json
 import logging
 
+from .blob_store import blob_store
 from .blockchain import blockchain
+from .ledger_io import check_compression, iter_export
+from .ledger_writer import ledger_writer
+from .storage import LedgerStore
+from .verifier import verify_chain_parallel
 
 blockchain_api = Blueprint('blockchain_api', __name__)
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 1000
+SYNC_BATCH_SIZE = 500
+
+
+def wait_requested(default: bool = False) -> bool:
+    """Whether the caller asked (``?wait=true``) to block until its record is sealed"""
+    value = request.args.get('wait')
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _int_arg(name, default=None):
+    """An integer query arg; unlike ``type=int``, a malformed value is an error"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+
+def _parse_block_window():
+    """Read ``from``/``since``/``limit`` query args into a (start, limit) pair"""
+    since = _int_arg('since')
+    start = _int_arg('from', 0)
+    limit = _int_arg('limit')
+    
+    if since is not None:
+        start = since + 1
+    if start < 0:
+        raise ValueError('from must be a non-negative block index')
+    if limit is not None and limit <= 0:
+        raise ValueError('limit must be a positive integer')
+        
+    return start, limit
+
+
+def _parse_time_arg(name, default):
+    """Accept either epoch seconds or an ISO 8601 timestamp"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise ValueError(f'{name} must be epoch seconds or an ISO 8601 timestamp')
+
+
+def _stream_blocks_ndjson(start, limit):
+    for block in blockchain.iter_blocks(start, limit):
+        yield json.dumps(block.to_dict()) + '\n'
+
+
+def _stream_sync_batches(start, limit, batch_size):
+    batch = []
+    for block in blockchain.iter_blocks(start, limit):
+        batch.append(LedgerStore.encode_block(block))
+        if len(batch) >= batch_size:
+            yield b''.join(batch)
+            batch = []
+    if batch:
+        yield b''.join(batch)
+
 @blockchain_api.route('/record', methods=['POST'])
 def add_review_record():
     try:
@@ -20,10 +96,21 @@ def add_review_record():
                     'message': f'Missing required field: {field}'
                 }), 400
         
+        if blockchain.read_only:
+            return jsonify({
+                'status': 'error',
+                'message': 'This supernode is a read-only ledger replica'
+            }), 409
+            
         if 'timestamp' not in data:
             data['timestamp'] = time.time()
             
-        new_block = blockchain.add_block(data)
+        new_block = ledger_writer.append(data, wait=wait_requested(default=True))
+        if new_block is None:
+            return jsonify({
+                'status': 'success',
+                'message': 'Review record queued for the blockchain'
+            }), 202
         
         return jsonify({
             'status': 'success',
@@ -65,14 +152,105 @@ def get_review_history(review_id):
         }), 500
 
 
+@blockchain_api.route('/commit/<commit_id>', methods=['GET'])
+def get_commit_history(commit_id):
+    try:
+        blocks = blockchain.get_blocks_by_commit_id(commit_id)
+        
+        if not blocks:
+            return jsonify({
+                'status': 'error',
+                'message': f'No records found for commit ID: {commit_id}'
+            }), 404
+            
+        return jsonify({
+            'status': 'success',
+            'commit_id': commit_id,
+            'history': blocks
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error retrieving commit history: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/metrics', methods=['GET'])
+def get_ledger_metrics():
+    try:
+        return jsonify({
+            'status': 'success',
+            'chain_length': len(blockchain.chain),
+            'history_filter': blockchain.get_history_filter_stats()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error retrieving ledger metrics: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/results/<digest>', methods=['GET'])
+def get_results_blob(digest):
+    try:
+        if 'deflate' in request.headers.get('Accept-Encoding', ''):
+            # Stored bytes are already zlib, so serve them without recompressing
+            body = blob_store.get_compressed(digest)
+            headers = {'Content-Encoding': 'deflate'}
+        else:
+            body = blob_store.get_bytes(digest)
+            headers = {}
+            
+        if body is None:
+            return jsonify({
+                'status': 'error',
+                'message': f'No results found for digest: {digest}'
+            }), 404
+            
+        return Response(body, mimetype='application/json', headers=headers)
+        
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error retrieving results blob: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
 @blockchain_api.route('/validate', methods=['GET'])
 def validate_chain():
+    mode = request.args.get('mode', 'full')
+    workers = request.args.get('workers', default=1, type=int)
+    
+    if mode not in ('full', 'checkpoint') or workers < 1:
+        return jsonify({
+            'status': 'error',
+            'message': 'mode must be "full" or "checkpoint" and workers a positive integer'
+        }), 400
+        
     try:
-        is_valid = blockchain.is_chain_valid()
+        start = blockchain.checkpoint_start() if mode == 'checkpoint' else 1
+        if workers > 1:
+            first_invalid = verify_chain_parallel(blockchain.chain, workers=workers, start=start)
+        else:
+            first_invalid = blockchain.first_invalid_index(start)
         
         return jsonify({
             'status': 'success',
-            'is_valid': is_valid,
+            'is_valid': first_invalid is None,
+            'first_invalid_index': first_invalid,
+            'mode': mode,
+            'verified_from': start,
+            'workers': workers,
             'chain_length': len(blockchain.chain)
         }), 200
         
@@ -84,14 +262,177 @@ def validate_chain():
         }), 500
 
 
+@blockchain_api.route('/checkpoints', methods=['GET'])
+def get_checkpoints():
+    try:
+        latest = blockchain.latest_checkpoint()
+        
+        return jsonify({
+            'status': 'success',
+            'checkpoints': [checkpoint.to_dict() for checkpoint in blockchain.checkpoints],
+            'latest_trusted': latest.to_dict() if latest else None
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error retrieving checkpoints: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/checkpoints', methods=['POST'])
+def create_checkpoint():
+    try:
+        checkpoint = blockchain.create_checkpoint()
+        
+        return jsonify({
+            'status': 'success',
+            'checkpoint': checkpoint.to_dict()
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"Error creating checkpoint: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/range', methods=['GET'])
+def get_blocks_in_time_range():
+    try:
+        start_time = _parse_time_arg('start', float('-inf'))
+        end_time = _parse_time_arg('end', float('inf'))
+        cursor = _int_arg('from')
+        limit = min(_int_arg('limit', MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError('limit must be a positive integer')
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+        
+    try:
+        first, stop = blockchain.index_range_for_time(start_time, end_time)
+        page_start = max(first, cursor) if cursor is not None else first
+        page_stop = min(stop, page_start + limit)
+        blocks = blockchain.get_blocks_range(page_start, max(page_stop - page_start, 0))
+        
+        return jsonify({
+            'status': 'success',
+            'start': start_time if start_time != float('-inf') else None,
+            'end': end_time if end_time != float('inf') else None,
+            'total_in_range': max(stop - first, 0),
+            'block_count': len(blocks),
+            'next_from': page_stop if page_stop < stop else None,
+            'blocks': blocks
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error retrieving blocks by time range: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/sync', methods=['GET'])
+def sync_blocks():
+    """Stream blocks after ``since`` to a replica in the compact storage line format"""
+    try:
+        since = _int_arg('since', -1)
+        limit = _int_arg('limit')
+        batch_size = max(1, _int_arg('batch', SYNC_BATCH_SIZE))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+        
+    try:
+        response = Response(
+            stream_with_context(_stream_sync_batches(max(since + 1, 0), limit, batch_size)),
+            mimetype='application/x-ledger-lines'
+        )
+        response.headers['X-Chain-Length'] = str(len(blockchain.chain))
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error streaming sync batches: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@blockchain_api.route('/export', methods=['GET'])
+def export_ledger():
+    """Stream the chain in the compact binary export format"""
+    compression = request.args.get('compression', 'zlib')
+    try:
+        check_compression(compression)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+        
+    try:
+        chunks = iter_export(blockchain.iter_blocks(), compression)
+        first_chunk = next(chunks)
+        
+        def stream():
+            yield first_chunk
+            yield from chunks
+            
+        return Response(
+            stream_with_context(stream()),
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': 'attachment; filename=ledger.p2pl'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error exporting ledger: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
 @blockchain_api.route('/blocks', methods=['GET'])
 def get_all_blocks():
     try:
-        blocks = blockchain.get_all_blocks()
+        start, limit = _parse_block_window()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+        
+    try:
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(_stream_blocks_ndjson(start, limit)),
+                mimetype='application/x-ndjson'
+            )
+        
+        chain_length = len(blockchain.chain)
+        if start == 0 and limit is None:
+            blocks = blockchain.get_all_blocks()
+        else:
+            if limit is not None:
+                limit = min(limit, MAX_PAGE_SIZE)
+            blocks = blockchain.get_blocks_range(start, limit)
+            
+        next_from = start + len(blocks)
         
         return jsonify({
             'status': 'success',
             'block_count': len(blocks),
+            'chain_length': chain_length,
+            'next_from': next_from if next_from < chain_length else None,
             'blocks': blocks
         }), 200
         
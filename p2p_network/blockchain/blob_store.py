@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from .blockchain import blockchain
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed store for analysis results kept off the chain.
+
+    Objects are serialized canonically, addressed by the SHA-256 of those
+    bytes and stored zlib-compressed under ``<root>/<first 2 hex>/<digest>``.
+    Identical results are stored once. Without a ``root`` the compressed
+    objects are kept in memory, like an in-memory chain.
+    """
+
+    def __init__(self, root: Optional[str], compression_level: int = 6):
+        self.root = root
+        self.compression_level = compression_level
+        self._memory: Dict[str, bytes] = {}
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        return os.path.join(self.root or "", digest[:2], digest)
+
+    def put(self, obj: Any) -> Tuple[str, int]:
+        """Store an object; returns its digest and uncompressed size"""
+        data = json.dumps(obj, sort_keys=True).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.root:
+            self._path(digest)
+            if digest not in self._memory:
+                self._memory[digest] = zlib.compress(data, self.compression_level)
+            return digest, len(data)
+
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, self.compression_level))
+            # Concurrent writers of the same digest write identical bytes
+            os.replace(tmp_path, path)
+
+        return digest, len(data)
+
+    def get_compressed(self, digest: str) -> Optional[bytes]:
+        """Stored zlib bytes, suitable for serving as Content-Encoding: deflate"""
+        path = self._path(digest)
+        if not self.root:
+            return self._memory.get(digest)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def get_bytes(self, digest: str) -> Optional[bytes]:
+        compressed = self.get_compressed(digest)
+        if compressed is None:
+            return None
+        data = zlib.decompress(compressed)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Blob {digest} is corrupt")
+        return data
+
+    def get(self, digest: str) -> Optional[Any]:
+        data = self.get_bytes(digest)
+        return json.loads(data) if data is not None else None
+
+
+def _default_blob_dir() -> Optional[str]:
+    """LEDGER_BLOB_DIR, else next to the persistent ledger; None keeps blobs in memory"""
+    if os.environ.get("LEDGER_BLOB_DIR"):
+        return os.environ["LEDGER_BLOB_DIR"]
+    if blockchain.store:
+        return os.path.join(blockchain.store.directory, "blobs")
+    return None
+
+
+blob_store = BlobStore(_default_blob_dir())
@@ -1,26 +1,84 @@
+import bisect
 import hashlib
+import logging
+import os
+import threading
 import time
 import json
-from typing import List, Dict, Any
+from array import array
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from .bloom import ScalableBloomFilter
+from .storage import Checkpoint, LedgerStore, EMPTY_STATE_DIGEST, fold_state_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_INTERVAL = 1000
+# Block data fields indexed by the history Bloom filter
+HISTORY_FIELDS = ("review_id", "commit_id")
 
 
 class Block:
+    """A single ledger entry.
+
+    The data payload is kept only as its canonical JSON bytes, which is
+    both the compact in-memory form and the exact input to the hash, so
+    hashing and validation never re-serialize the payload. ``data`` is
+    decoded on access; assign a new dict to change it.
+    """
+    __slots__ = ("index", "timestamp", "previous_hash", "hash", "payload")
+    
     def __init__(self, index: int, timestamp: float, data: Dict[str, Any], previous_hash: str):
         self.index = index
         self.timestamp = timestamp
-        self.data = data
+        self.payload = encode_payload(data)
         self.previous_hash = previous_hash
         self.hash = self.calculate_hash()
+    
+    @classmethod
+    def from_payload(cls, index: int, timestamp: float, payload: bytes,
+                     previous_hash: str, block_hash: str) -> 'Block':
+        """Rebuild a block from stored canonical bytes without decoding them"""
+        block = cls.__new__(cls)
+        block.index = index
+        block.timestamp = timestamp
+        block.payload = payload
+        block.previous_hash = previous_hash
+        block.hash = block_hash
+        return block
+    
+    @classmethod
+    def from_dict(cls, block_dict: Dict[str, Any]) -> 'Block':
+        """Rebuild a block from ``to_dict`` output, keeping its recorded hash"""
+        return cls.from_payload(
+            block_dict["index"],
+            block_dict["timestamp"],
+            encode_payload(block_dict["data"]),
+            block_dict["previous_hash"],
+            block_dict["hash"]
+        )
+    
+    @property
+    def data(self) -> Dict[str, Any]:
+        return json.loads(self.payload)
+    
+    @data.setter
+    def data(self, value: Dict[str, Any]):
+        self.payload = encode_payload(value)
+    
+    def canonical_bytes(self) -> bytes:
+        # Byte-for-byte equal to json.dumps of the full block dict with
+        # sort_keys=True, so hashes match blocks sealed before payload caching
+        return b"".join((
+            b'{"data": ', self.payload,
+            b', "index": ', json.dumps(self.index).encode(),
+            b', "previous_hash": ', json.dumps(self.previous_hash).encode(),
+            b', "timestamp": ', json.dumps(self.timestamp).encode(),
+            b'}'
+        ))
         
     def calculate_hash(self) -> str:
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "previous_hash": self.previous_hash
-        }, sort_keys=True).encode()
-        
-        return hashlib.sha256(block_string).hexdigest()
+        return hashlib.sha256(self.canonical_bytes()).hexdigest()
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -32,42 +90,208 @@ class Block:
         }
 
 
+def encode_payload(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, sort_keys=True).encode()
+
+
 class Blockchain:
-    def __init__(self):
+    """Hash-linked ledger with periodic checkpoints.
+
+    Without ``storage_dir`` the chain lives only in memory. With it, every
+    sealed group of blocks is appended and fsynced to a ``LedgerStore``
+    and the chain is reloaded from there on restart. Every
+    ``checkpoint_interval`` blocks a checkpoint records the index, tip hash
+    and aggregate state digest (HMAC-signed when ``checkpoint_key`` is set)
+    so validation and reloads only re-hash blocks after the latest trusted
+    checkpoint. With ``cold_storage`` the blocks covered by each new
+    checkpoint are moved out of the hot file into gzip segments.
+    
+    A ``read_only`` chain is a replica: it starts without a genesis block
+    of its own and only grows through ``append_replicated``.
+    """
+    def __init__(self, storage_dir: Optional[str] = None,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+                 checkpoint_key: Optional[str] = None,
+                 cold_storage: bool = False,
+                 read_only: bool = False):
         self.chain: List[Block] = []
-        self.create_genesis_block()
+        # Block timestamps in chain order; non-decreasing, so range queries can bisect
+        self.timestamps = array('d')
+        # review_id/commit_id membership, so lookups that miss skip the scan
+        self.history_filter = ScalableBloomFilter()
+        self.lookup_stats = {"lookups": 0, "filtered_misses": 0, "false_positives": 0}
+        # Serializes appends so concurrent writers can't reuse an index
+        self.lock = threading.RLock()
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_key = checkpoint_key.encode() if checkpoint_key else None
+        self.cold_storage = cold_storage
+        self.read_only = read_only
+        self.checkpoints: List[Checkpoint] = []
+        self.state_digest = EMPTY_STATE_DIGEST
+        self.store = LedgerStore(storage_dir) if storage_dir else None
+        
+        if self.store and self.store.has_blocks():
+            self._load_from_store()
+        elif not read_only:
+            self.create_genesis_block()
         
     def create_genesis_block(self):
         genesis_block = Block(0, time.time(), {"message": "Genesis Block"}, "0")
-        self.chain.append(genesis_block)
+        self._commit([genesis_block])
         
     def get_latest_block(self) -> Block:
         return self.chain[-1]
     
     def add_block(self, data: Dict[str, Any]) -> Block:
-        previous_block = self.get_latest_block()
-        new_index = previous_block.index + 1
-        new_timestamp = time.time()
-        new_hash = previous_block.hash
+        return self.add_blocks([data])[0]
+    
+    def add_blocks(self, records: List[Dict[str, Any]]) -> List[Block]:
+        """Seal several records as consecutive blocks with one store write"""
+        if self.read_only:
+            raise RuntimeError("Cannot add blocks to a read-only replica")
+            
+        with self.lock:
+            new_blocks = []
+            previous_block = self.get_latest_block()
+            for data in records:
+                # Never step back in time, even if the wall clock does
+                new_timestamp = max(time.time(), previous_block.timestamp)
+                new_block = Block(previous_block.index + 1, new_timestamp, data, previous_block.hash)
+                new_blocks.append(new_block)
+                previous_block = new_block
+                
+            self._commit(new_blocks)
+            return new_blocks
+    
+    def append_replicated(self, blocks: List[Block]) -> int:
+        """Append blocks sealed elsewhere after checking indexes, hashes and links.
+
+        The whole batch is checked before anything is committed, so a bad
+        block leaves the chain at its previous tip.
+        """
+        with self.lock:
+            previous_block = self.chain[-1] if self.chain else None
+            for block in blocks:
+                expected_index = previous_block.index + 1 if previous_block else 0
+                if block.index != expected_index:
+                    raise ValueError(f"Expected block {expected_index}, got block {block.index}")
+                if previous_block and block.previous_hash != previous_block.hash:
+                    raise ValueError(f"Block {block.index} does not link to block {previous_block.index}")
+                if block.hash != block.calculate_hash():
+                    raise ValueError(f"Block {block.index} hash does not match its contents")
+                previous_block = block
+                
+            self._commit(blocks)
+            return len(blocks)
+    
+    def _commit(self, blocks: List[Block]):
+        if self.store:
+            self.store.append_blocks(blocks)
+            
+        for block in blocks:
+            self.chain.append(block)
+            self.timestamps.append(block.timestamp)
+            self._index_history(block)
+            self.state_digest = fold_state_digest(self.state_digest, block.hash)
+            if self.checkpoint_interval and block.index and block.index % self.checkpoint_interval == 0:
+                self.create_checkpoint()
+    
+    def _index_history(self, block: Block):
+        if block.index == 0:
+            return
+        data = block.data
+        for field in HISTORY_FIELDS:
+            if data.get(field) is not None:
+                self.history_filter.add(f"{field}:{data[field]}")
+    
+    def create_checkpoint(self) -> Checkpoint:
+        """Record a checkpoint at the current tip"""
+        with self.lock:
+            tip = self.get_latest_block()
+            checkpoint = Checkpoint(
+                index=tip.index,
+                tip_hash=tip.hash,
+                state_digest=self.state_digest,
+                created_at=time.time()
+            )
+            checkpoint.sign(self.checkpoint_key)
+            self.checkpoints.append(checkpoint)
+            
+            if self.store:
+                self.store.append_checkpoint(checkpoint)
+                if self.cold_storage:
+                    self.store.archive(checkpoint.index)
+                    
+            logger.info(f"Checkpoint at block {checkpoint.index}")
+            return checkpoint
+    
+    def latest_checkpoint(self) -> Optional[Checkpoint]:
+        """The most recent checkpoint that still matches the chain and its signing key"""
+        for checkpoint in reversed(self.checkpoints):
+            if checkpoint.index >= len(self.chain):
+                continue
+            if not checkpoint.is_trusted(self.checkpoint_key):
+                continue
+            if self.chain[checkpoint.index].hash == checkpoint.tip_hash:
+                return checkpoint
+        return None
+    
+    def _load_from_store(self):
+        self.chain = list(self.store.load_blocks())
+        self.timestamps = array('d', (block.timestamp for block in self.chain))
+        for block in self.chain:
+            self._index_history(block)
+        self.checkpoints = self.store.load_checkpoints()
+        
+        start = self.checkpoint_start()
+        bad_index = self.first_invalid_index(start)
+        if bad_index is not None:
+            raise ValueError(f"Ledger in {self.store.directory} is invalid at block {bad_index}")
         
-        new_block = Block(new_index, new_timestamp, data, new_hash)
-        self.chain.append(new_block)
-        return new_block
+        checkpoint = self.latest_checkpoint()
+        if checkpoint:
+            self.state_digest = checkpoint.state_digest
+            replay_from = checkpoint.index + 1
+        else:
+            self.state_digest = EMPTY_STATE_DIGEST
+            replay_from = 0
+        for block in self.chain[replay_from:]:
+            self.state_digest = fold_state_digest(self.state_digest, block.hash)
+        
+        logger.info(
+            f"Loaded {len(self.chain)} blocks from {self.store.directory}, "
+            f"verified from block {start}"
+        )
+    
+    def is_chain_valid(self, from_checkpoint: bool = False) -> bool:
+        """Validate the chain, optionally only from the latest trusted checkpoint"""
+        start = self.checkpoint_start() if from_checkpoint else 1
+        return self.first_invalid_index(start) is None
     
-    def is_chain_valid(self) -> bool:
-        for i in range(1, len(self.chain)):
+    def checkpoint_start(self) -> int:
+        """First index that still needs re-hashing given the latest trusted checkpoint.
+
+        The checkpoint block itself is re-hashed so its payload is covered
+        by the trusted tip hash, not just its stored hash field.
+        """
+        checkpoint = self.latest_checkpoint()
+        return max(checkpoint.index, 1) if checkpoint else 1
+    
+    def first_invalid_index(self, start: int = 1) -> Optional[int]:
+        """Return the index of the first block failing validation, or None"""
+        for i in range(max(start, 1), len(self.chain)):
             current_block = self.chain[i]
             previous_block = self.chain[i-1]
             
             # Check if the hash is still valid
             if current_block.hash != current_block.calculate_hash():
-                return False
+                return i
                 
             # Check if this block points to the correct previous hash
             if current_block.previous_hash != previous_block.hash:
-                return False
+                return i
                 
-        return True
+        return None
     
     def get_block_by_index(self, index: int) -> Dict[str, Any]:
         if 0 <= index < len(self.chain):
@@ -75,18 +299,69 @@ class Blockchain:
         return None
     
     def get_blocks_by_review_id(self, review_id: str) -> List[Dict[str, Any]]:
+        return self._get_blocks_by_field("review_id", review_id)
+    
+    def get_blocks_by_commit_id(self, commit_id: str) -> List[Dict[str, Any]]:
+        return self._get_blocks_by_field("commit_id", commit_id)
+    
+    def _get_blocks_by_field(self, field: str, value: str) -> List[Dict[str, Any]]:
+        self.lookup_stats["lookups"] += 1
+        if f"{field}:{value}" not in self.history_filter:
+            self.lookup_stats["filtered_misses"] += 1
+            return []
+        
         matching_blocks = []
+        # Cheap byte match first so only candidate blocks get decoded
+        needle = json.dumps(field).encode() + b': ' + json.dumps(value).encode()
         
         for block in self.chain:
-            if block.index > 0:
-                if block.data.get("review_id") == review_id:
+            if block.index > 0 and needle in block.payload:
+                if block.data.get(field) == value:
                     matching_blocks.append(block.to_dict())
-                    
+        
+        if not matching_blocks:
+            self.lookup_stats["false_positives"] += 1
         return matching_blocks
     
+    def get_history_filter_stats(self) -> Dict[str, Any]:
+        stats = dict(self.history_filter.get_stats())
+        stats.update(self.lookup_stats)
+        scanned_misses = self.lookup_stats["false_positives"]
+        negatives = self.lookup_stats["filtered_misses"] + scanned_misses
+        stats["observed_false_positive_rate"] = scanned_misses / negatives if negatives else 0.0
+        return stats
+    
     def get_all_blocks(self) -> List[Dict[str, Any]]:
         """Get all blocks in the chain as dictionaries"""
         return [block.to_dict() for block in self.chain]
+    
+    def get_blocks_range(self, start: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get up to ``limit`` blocks as dictionaries, starting at index ``start``"""
+        return [block.to_dict() for block in self.iter_blocks(start, limit)]
+    
+    def index_range_for_time(self, start: float, end: float) -> Tuple[int, int]:
+        """Return the ``[first, stop)`` index range of blocks with ``start <= timestamp < end``"""
+        first = bisect.bisect_left(self.timestamps, start)
+        stop = bisect.bisect_left(self.timestamps, end, lo=first)
+        return first, stop
+    
+    def iter_blocks(self, start: int = 0, limit: Optional[int] = None) -> Iterator[Block]:
+        """Yield blocks from index ``start`` without copying the chain.
+
+        The end of the range is fixed when iteration starts, so blocks
+        appended while a consumer is reading are left for its next call.
+        """
+        end = len(self.chain)
+        if limit is not None:
+            end = min(end, start + limit)
+        for index in range(max(start, 0), end):
+            yield self.chain[index]
 
 
-blockchain = Blockchain()
+blockchain = Blockchain(
+    storage_dir=os.environ.get("LEDGER_DIR"),
+    checkpoint_interval=int(os.environ.get("LEDGER_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL)),
+    checkpoint_key=os.environ.get("LEDGER_CHECKPOINT_KEY"),
+    cold_storage=os.environ.get("LEDGER_COLD_STORAGE", "").lower() in ("1", "true", "yes"),
+    read_only=bool(os.environ.get("LEDGER_REPLICA_OF"))
+)
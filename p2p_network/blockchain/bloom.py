@@ -0,0 +1,91 @@
+import hashlib
+import math
+from typing import Dict, List
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter sized for a target false-positive rate"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by stacking filters with tightening error rates.
+
+    When the newest filter reaches capacity a larger one is added with a
+    smaller error rate, so the compound false-positive rate stays below
+    ``error_rate`` however many keys are added.
+    """
+
+    def __init__(self, initial_capacity: int = 4096, error_rate: float = 0.001,
+                 growth: int = 2, tightening: float = 0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[BloomFilter] = []
+        self._add_filter()
+
+    def _add_filter(self):
+        n = len(self.filters)
+        self.filters.append(BloomFilter(
+            self.initial_capacity * self.growth ** n,
+            self.error_rate * (1 - self.tightening) * self.tightening ** n
+        ))
+
+    def add(self, key: str):
+        if self.filters[-1].is_full():
+            self._add_filter()
+        self.filters[-1].add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    def false_positive_rate(self) -> float:
+        """Estimated probability that an absent key is reported present"""
+        miss = 1.0
+        for bloom in self.filters:
+            miss *= 1 - bloom.false_positive_rate()
+        return 1 - miss
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "items": len(self),
+            "filters": len(self.filters),
+            "size_bytes": sum(len(bloom.bits) for bloom in self.filters),
+            "estimated_false_positive_rate": self.false_positive_rate()
+        }
@@ -0,0 +1,290 @@
+"""
+Compact binary export/import for the ledger.
+
+File layout: an 8-byte magic, one compression byte, then a (possibly
+compressed) stream of length-prefixed block records terminated by a
+zero length. Each record is::
+
+    index (u64) | timestamp (f64) | hash (32 raw bytes) |
+    previous hash length (u8) | previous hash | canonical payload bytes
+
+Export and import both stream block by block, so memory use does not
+depend on the ledger size. Imports re-hash every block and check its
+link before it is written.
+
+    python -m p2p_network.blockchain.ledger_io export --ledger-dir ledger/ -o ledger.p2pl
+    python -m p2p_network.blockchain.ledger_io export --url http://localhost:5000 -o ledger.p2pl
+    python -m p2p_network.blockchain.ledger_io import -i ledger.p2pl --ledger-dir restored/
+"""
+import argparse
+import logging
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+from .blockchain import Block, Blockchain
+from .storage import LedgerStore
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"P2PLEDG1"
+COMPRESSION_CODES = {"none": 0, "zlib": 1, "zstd": 2}
+COMPRESSION_NAMES = {code: name for name, code in COMPRESSION_CODES.items()}
+
+_LENGTH = struct.Struct(">I")
+_HEADER = struct.Struct(">Qd32sB")
+CHUNK_SIZE = 1 << 16
+IMPORT_BATCH_SIZE = 1000
+
+
+def encode_record(block: Block) -> bytes:
+    previous_hash = block.previous_hash.encode()
+    record = _HEADER.pack(block.index, block.timestamp, bytes.fromhex(block.hash),
+                          len(previous_hash)) + previous_hash + block.payload
+    return _LENGTH.pack(len(record)) + record
+
+
+def decode_record(record: bytes) -> Block:
+    index, timestamp, raw_hash, prev_length = _HEADER.unpack_from(record)
+    offset = _HEADER.size
+    previous_hash = record[offset:offset + prev_length].decode()
+    payload = record[offset + prev_length:]
+    return Block.from_payload(index, timestamp, payload, previous_hash, raw_hash.hex())
+
+
+def check_compression(compression: str):
+    """Raise ValueError unless exports can be written with ``compression`` here"""
+    if compression not in COMPRESSION_CODES:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+
+
+def _compressor(compression: str):
+    check_compression(compression)
+    if compression == "zlib":
+        return zlib.compressobj(6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def _decompressor(code: int):
+    name = COMPRESSION_NAMES.get(code)
+    if name == "zlib":
+        return zlib.decompressobj()
+    if name == "zstd":
+        if zstandard is None:
+            raise ValueError("File is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown compression code: {code}")
+
+
+def iter_export(blocks: Iterable[Block], compression: str = "zlib") -> Iterator[bytes]:
+    """Yield the export file as chunks of roughly CHUNK_SIZE bytes"""
+    compressor = _compressor(compression)
+    yield MAGIC + bytes([COMPRESSION_CODES[compression]])
+
+    pending: List[bytes] = []
+    pending_size = 0
+    for block in blocks:
+        record = encode_record(block)
+        pending.append(record)
+        pending_size += len(record)
+        if pending_size >= CHUNK_SIZE:
+            chunk = b"".join(pending)
+            pending, pending_size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+
+    pending.append(_LENGTH.pack(0))
+    tail = b"".join(pending)
+    if compressor:
+        tail = compressor.compress(tail) + compressor.flush()
+    yield tail
+
+
+def export_blocks(blocks: Iterable[Block], output: BinaryIO, compression: str = "zlib") -> int:
+    count = 0
+
+    def counted():
+        nonlocal count
+        for block in blocks:
+            count += 1
+            yield block
+
+    for chunk in iter_export(counted(), compression):
+        output.write(chunk)
+    return count
+
+
+def _iter_plain_chunks(source: BinaryIO) -> Iterator[bytes]:
+    header = source.read(len(MAGIC) + 1)
+    if len(header) < len(MAGIC) + 1 or header[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a ledger export file")
+    decompressor = _decompressor(header[-1])
+
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+
+
+def read_blocks(source: BinaryIO) -> Iterator[Block]:
+    """Parse blocks from an export stream without verifying them"""
+    buffer = bytearray()
+    for chunk in _iter_plain_chunks(source):
+        buffer += chunk
+        offset = 0
+        while len(buffer) - offset >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buffer, offset)
+            if length == 0:
+                return
+            if len(buffer) - offset - _LENGTH.size < length:
+                break
+            start = offset + _LENGTH.size
+            yield decode_record(bytes(buffer[start:start + length]))
+            offset = start + length
+        del buffer[:offset]
+
+    raise ValueError("Ledger export is truncated")
+
+
+def verify_blocks(blocks: Iterable[Block], previous: Optional[Block] = None) -> Iterator[Block]:
+    """Pass blocks through, raising ValueError at the first bad hash or link"""
+    for block in blocks:
+        expected_index = previous.index + 1 if previous else 0
+        if block.index != expected_index:
+            raise ValueError(f"Expected block {expected_index}, got block {block.index}")
+        if previous and block.previous_hash != previous.hash:
+            raise ValueError(f"Block {block.index} does not link to block {previous.index}")
+        if block.hash != block.calculate_hash():
+            raise ValueError(f"Block {block.index} hash does not match its contents")
+        previous = block
+        yield block
+
+
+def _batched(blocks: Iterable[Block], size: int) -> Iterator[List[Block]]:
+    batch = []
+    for block in blocks:
+        batch.append(block)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_to_store(source: BinaryIO, directory: str) -> int:
+    """Verify an export and write it into a new or empty ledger directory.
+
+    Blocks are written to a temporary directory next to ``directory`` that
+    is renamed into place only once the whole export has verified, so a
+    failed import leaves nothing behind and can simply be retried.
+    """
+    if os.path.isdir(directory) and os.listdir(directory):
+        raise ValueError(f"Ledger directory {directory} is not empty")
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".ledger-import-", dir=parent)
+    try:
+        store = LedgerStore(staging)
+        try:
+            count = 0
+            for batch in _batched(verify_blocks(read_blocks(source)), IMPORT_BATCH_SIZE):
+                store.append_blocks(batch)
+                count += len(batch)
+        finally:
+            store.close()
+        if os.path.isdir(directory):
+            # Fails, rather than merging, if something was written there meanwhile
+            os.rmdir(directory)
+        os.rename(staging, directory)
+        return count
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def import_into_chain(source: BinaryIO, chain: Blockchain) -> int:
+    """Append an export's blocks to an in-memory chain, continuing from its tip"""
+    count = 0
+    for batch in _batched(read_blocks(source), IMPORT_BATCH_SIZE):
+        count += chain.append_replicated(batch)
+    return count
+
+
+def _fetch_blocks(supernode_url: str) -> Iterator[Block]:
+    import requests
+
+    response = requests.get(f"{supernode_url}/blockchain/sync", stream=True, timeout=30)
+    response.raise_for_status()
+    with response:
+        for line in response.iter_lines():
+            if line:
+                yield LedgerStore.decode_block(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Export or import a ledger in the compact binary format')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='Write a ledger to an export file')
+    source = export_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ledger-dir', type=str, help='Ledger storage directory (LEDGER_DIR)')
+    source.add_argument('--url', type=str, help='Supernode URL to stream blocks from')
+    export_parser.add_argument('-o', '--output', type=str, required=True, help='Export file to write')
+    export_parser.add_argument('--compression', choices=sorted(COMPRESSION_CODES), default='zlib',
+                               help='Body compression (default: zlib)')
+
+    import_parser = commands.add_parser('import', help='Verify an export file into a ledger directory')
+    import_parser.add_argument('-i', '--input', type=str, required=True, help='Export file to read')
+    import_parser.add_argument('--ledger-dir', type=str, required=True,
+                               help='Empty ledger storage directory to create')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        if args.ledger_dir:
+            store = LedgerStore(args.ledger_dir)
+            blocks = store.load_blocks()
+        else:
+            store = None
+            blocks = _fetch_blocks(args.url)
+        try:
+            with open(args.output, 'wb') as output:
+                count = export_blocks(blocks, output, args.compression)
+        finally:
+            if store:
+                store.close()
+        print(f"Exported {count} blocks to {args.output}")
+        return 0
+
+    try:
+        with open(args.input, 'rb') as source:
+            count = import_to_store(source, args.ledger_dir)
+    except ValueError as e:
+        print(f"Import failed: {e}")
+        return 1
+    print(f"Imported and verified {count} blocks into {args.ledger_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
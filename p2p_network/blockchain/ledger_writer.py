@@ -0,0 +1,123 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Dict, List, Optional, Tuple
+
+from .blockchain import Block, Blockchain, blockchain
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LedgerWriter:
+    """Single-writer pipeline that seals ledger records off the request path.
+
+    Handlers enqueue records and return immediately. One writer thread
+    drains whatever has queued up and seals it as a group, so a burst of
+    requests costs one lock acquisition instead of one per record.
+    """
+
+    def __init__(self, chain: Blockchain, max_batch: int = 256):
+        self.chain = chain
+        self.max_batch = max_batch
+        self.queue: Queue = Queue()
+        self.writer_thread: Optional[threading.Thread] = None
+        self.start_lock = threading.Lock()
+        self.sealed_count = 0
+        self.batch_count = 0
+
+    def start(self):
+        with self.start_lock:
+            if self.writer_thread and self.writer_thread.is_alive():
+                return
+            self.writer_thread = threading.Thread(
+                target=self._writer_loop,
+                name="ledger-writer",
+                daemon=True
+            )
+            self.writer_thread.start()
+
+    def stop(self, timeout: Optional[float] = 10):
+        """Seal everything already queued, then stop the writer thread"""
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.queue.put(_STOP)
+            self.writer_thread.join(timeout=timeout)
+
+    def submit(self, record: Dict[str, Any]) -> 'Future[Block]':
+        """Queue a record; the returned future resolves to its sealed block"""
+        self.start()
+        future: 'Future[Block]' = Future()
+        self.queue.put((record, future))
+        return future
+
+    def append(self, record: Dict[str, Any], wait: bool = False,
+               timeout: Optional[float] = 30) -> Optional[Block]:
+        """Queue a record, optionally blocking until it has been sealed"""
+        future = self.submit(record)
+        if wait:
+            return future.result(timeout=timeout)
+        return None
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    def _next_batch(self) -> Tuple[List[Tuple[Dict[str, Any], Future]], bool]:
+        item = self.queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        while len(batch) < self.max_batch:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _writer_loop(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+
+            try:
+                blocks = self.chain.add_blocks([record for record, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Ledger writer failed to seal a record: {e}")
+                    batch[0][1].set_exception(e)
+                else:
+                    # Don't let one bad record take the rest of its group down
+                    logger.warning(f"Ledger writer failed to seal {len(batch)} records ({e}); "
+                                   f"sealing them one at a time")
+                    self._seal_individually(batch)
+                continue
+
+            self.sealed_count += len(blocks)
+            self.batch_count += 1
+            for (_, future), block in zip(batch, blocks):
+                future.set_result(block)
+            logger.debug(f"Sealed {len(blocks)} records up to block {blocks[-1].index}")
+
+    def _seal_individually(self, batch: List[Tuple[Dict[str, Any], Future]]):
+        for record, future in batch:
+            try:
+                block = self.chain.add_blocks([record])[0]
+            except Exception as e:
+                logger.error(f"Ledger writer failed to seal a record: {e}")
+                future.set_exception(e)
+                continue
+            self.sealed_count += 1
+            self.batch_count += 1
+            future.set_result(block)
+
+
+ledger_writer = LedgerWriter(blockchain)
+atexit.register(ledger_writer.stop)
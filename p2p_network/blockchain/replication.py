@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from ..common.network_utils import NetworkClient
+from .blockchain import Blockchain
+from .storage import LedgerStore
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerFollower:
+    """Keeps a read replica in step with a primary supernode's ledger.
+
+    Each round asks the primary's ``/blockchain/sync`` for the blocks after
+    the local tip, checks hashes and links batch by batch, and appends
+    them. A batch that fails the checks is dropped and retried next round.
+    """
+
+    def __init__(self, chain: Blockchain, primary_url: str,
+                 poll_interval: float = 2.0, batch_size: int = 500):
+        self.chain = chain
+        self.primary_url = primary_url.rstrip('/')
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.network_client = NetworkClient(timeout=30)
+        self.is_running = False
+        self.follow_thread: Optional[threading.Thread] = None
+        self.primary_length = 0
+        self.last_sync = None
+
+    @property
+    def lag(self) -> int:
+        """Blocks the primary reported that this replica has not applied yet"""
+        return max(0, self.primary_length - len(self.chain.chain))
+
+    def start(self):
+        self.is_running = True
+        self.follow_thread = threading.Thread(
+            target=self._follow_loop,
+            name="ledger-follower",
+            daemon=True
+        )
+        self.follow_thread.start()
+        logger.info(f"Following ledger at {self.primary_url}")
+
+    def stop(self):
+        self.is_running = False
+        if self.follow_thread:
+            self.follow_thread.join(timeout=self.poll_interval + 2)
+
+    def sync_once(self) -> int:
+        """Pull and apply everything after the local tip; returns blocks applied"""
+        since = len(self.chain.chain) - 1
+        response = self.network_client.get(
+            f"{self.primary_url}/blockchain/sync",
+            params={"since": since, "batch": self.batch_size},
+            stream=True
+        )
+        if response is None:
+            logger.warning(f"Ledger sync from {self.primary_url} failed")
+            return 0
+
+        applied = 0
+        with response:
+            self.primary_length = int(response.headers.get('X-Chain-Length', 0))
+            batch = []
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                batch.append(LedgerStore.decode_block(line))
+                if len(batch) >= self.batch_size:
+                    applied += self.chain.append_replicated(batch)
+                    batch = []
+            if batch:
+                applied += self.chain.append_replicated(batch)
+
+        self.last_sync = time.time()
+        if applied:
+            logger.info(f"Replicated {applied} blocks, tip is now {len(self.chain.chain) - 1}")
+        return applied
+
+    def _follow_loop(self):
+        while self.is_running:
+            try:
+                self.sync_once()
+            except Exception as e:
+                logger.error(f"Ledger replication error: {e}")
+
+            time.sleep(self.poll_interval)
+
+    def get_status(self):
+        return {
+            "primary": self.primary_url,
+            "replica_length": len(self.chain.chain),
+            "primary_length": self.primary_length,
+            "lag": self.lag,
+            "last_sync": self.last_sync
+        }
@@ -0,0 +1,184 @@
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOCKS_FILE = "blocks.ndjson"
+CHECKPOINTS_FILE = "checkpoints.ndjson"
+COLD_DIR = "cold"
+
+# Aggregate digest before any block has been folded in
+EMPTY_STATE_DIGEST = "0" * 64
+
+
+def fold_state_digest(state_digest: str, block_hash: str) -> str:
+    """Fold one block hash into the running aggregate digest of the chain"""
+    return hashlib.sha256(f"{state_digest}{block_hash}".encode()).hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    index: int
+    tip_hash: str
+    state_digest: str
+    created_at: float
+    signature: Optional[str] = None
+
+    def signing_bytes(self) -> bytes:
+        return json.dumps({
+            "index": self.index,
+            "tip_hash": self.tip_hash,
+            "state_digest": self.state_digest,
+            "created_at": self.created_at
+        }, sort_keys=True).encode()
+
+    def sign(self, key: Optional[bytes]):
+        if key:
+            self.signature = hmac.new(key, self.signing_bytes(), hashlib.sha256).hexdigest()
+
+    def is_trusted(self, key: Optional[bytes]) -> bool:
+        """Unsigned checkpoints are only trusted when no signing key is configured"""
+        if not key:
+            return True
+        if not self.signature:
+            return False
+        expected = hmac.new(key, self.signing_bytes(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, self.signature)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Checkpoint':
+        return cls(**data)
+
+
+class LedgerStore:
+    """Append-only on-disk ledger.
+
+    Blocks are stored one per line as a JSON header, a tab, and the block's
+    canonical payload bytes, so they can be reloaded without decoding or
+    re-serializing the payload. Segments covered by a checkpoint can be
+    moved into gzip files under ``cold/``.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, COLD_DIR), exist_ok=True)
+        self.blocks_path = os.path.join(directory, BLOCKS_FILE)
+        self.checkpoints_path = os.path.join(directory, CHECKPOINTS_FILE)
+        self.blocks_file = open(self.blocks_path, "ab")
+
+    def close(self):
+        self.blocks_file.close()
+
+    @staticmethod
+    def encode_block(block) -> bytes:
+        header = json.dumps({
+            "index": block.index,
+            "timestamp": block.timestamp,
+            "previous_hash": block.previous_hash,
+            "hash": block.hash
+        }, separators=(",", ":")).encode()
+        return header + b"\t" + block.payload + b"\n"
+
+    @staticmethod
+    def decode_block(line: bytes):
+        from .blockchain import Block
+
+        header, payload = line.rstrip(b"\n").split(b"\t", 1)
+        fields = json.loads(header)
+        return Block.from_payload(
+            fields["index"],
+            fields["timestamp"],
+            payload,
+            fields["previous_hash"],
+            fields["hash"]
+        )
+
+    def has_blocks(self) -> bool:
+        return bool(self._cold_segments()) or os.path.getsize(self.blocks_path) > 0
+
+    def append_blocks(self, blocks: Iterable) -> None:
+        """Write a group of blocks and fsync once for the whole group"""
+        self.blocks_file.write(b"".join(self.encode_block(block) for block in blocks))
+        self.blocks_file.flush()
+        os.fsync(self.blocks_file.fileno())
+
+    def load_blocks(self) -> Iterator:
+        # An archive interrupted before the hot file was rewritten leaves
+        # blocks in both places, so anything at or below the last index is skipped
+        last_index = -1
+        for line in self._iter_lines():
+            block = self.decode_block(line)
+            if block.index > last_index:
+                last_index = block.index
+                yield block
+
+    def _iter_lines(self) -> Iterator[bytes]:
+        for segment in self._cold_segments():
+            with gzip.open(segment, "rb") as f:
+                yield from f
+        with open(self.blocks_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    def append_checkpoint(self, checkpoint: Checkpoint) -> None:
+        with open(self.checkpoints_path, "a") as f:
+            f.write(json.dumps(checkpoint.to_dict()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_checkpoints(self) -> List[Checkpoint]:
+        if not os.path.exists(self.checkpoints_path):
+            return []
+        with open(self.checkpoints_path) as f:
+            return [Checkpoint.from_dict(json.loads(line)) for line in f if line.strip()]
+
+    def archive(self, up_to_index: int) -> Optional[str]:
+        """Move hot blocks with index <= ``up_to_index`` into a cold gzip segment"""
+        first = last = None
+        partial_path = os.path.join(self.directory, COLD_DIR, "segment.partial.gz")
+        remaining_path = self.blocks_path + ".tmp"
+
+        self.blocks_file.close()
+        with open(self.blocks_path, "rb") as hot, \
+                open(remaining_path, "wb") as remaining, \
+                gzip.open(partial_path, "wb") as segment:
+            for line in hot:
+                if not line.strip():
+                    continue
+                index = json.loads(line.split(b"\t", 1)[0])["index"]
+                if index <= up_to_index:
+                    segment.write(line)
+                    first = index if first is None else first
+                    last = index
+                else:
+                    remaining.write(line)
+
+        segment_path = None
+        if first is not None:
+            segment_path = os.path.join(
+                self.directory, COLD_DIR, f"segment-{first:012d}-{last:012d}.ndjson.gz"
+            )
+            os.replace(partial_path, segment_path)
+            os.replace(remaining_path, self.blocks_path)
+            logger.info(f"Archived blocks {first}-{last} to {segment_path}")
+        else:
+            os.remove(partial_path)
+            os.remove(remaining_path)
+
+        self.blocks_file = open(self.blocks_path, "ab")
+        return segment_path
+
+    def _cold_segments(self) -> List[str]:
+        # Zero-padded indexes make lexical order match chain order
+        return sorted(glob.glob(os.path.join(self.directory, COLD_DIR, "segment-*.ndjson.gz")))
@@ -0,0 +1,171 @@
+"""
+Parallel full-chain verification.
+
+The chain is split into contiguous index ranges. Each range is re-hashed
+in a worker process, which also checks the previous-hash links inside
+the range; the links at range boundaries are checked by the caller. The
+lowest failing index across all ranges is reported.
+
+Where processes can be forked, workers inherit the chain and are only
+sent their index ranges, so the parent does no per-block work besides
+the boundary links. Elsewhere each range is pickled to its worker.
+
+Run as a CLI against a live supernode or an NDJSON block dump:
+
+    python -m p2p_network.blockchain.verifier --url http://localhost:5000 --workers 16
+    python -m p2p_network.blockchain.verifier --file blocks.ndjson
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .blockchain import Block
+
+logger = logging.getLogger(__name__)
+
+# Ranges per worker; more than one keeps workers busy when ranges differ in cost
+RANGES_PER_WORKER = 4
+
+BlockRecord = Tuple[int, float, bytes, str, str]
+
+# The chain forked workers read their ranges from; set while a pool starts
+_inherited_chain: Optional[Sequence[Block]] = None
+_inherit_lock = threading.Lock()
+
+
+def _to_record(block: Block) -> BlockRecord:
+    return (block.index, block.timestamp, block.payload, block.previous_hash, block.hash)
+
+
+def _verify_blocks(blocks: Iterable[Block]) -> Optional[int]:
+    """Re-hash a contiguous range and check the links inside it"""
+    previous_hash = None
+    for block in blocks:
+        if block.hash != block.calculate_hash():
+            return block.index
+        if previous_hash is not None and block.previous_hash != previous_hash:
+            return block.index
+        previous_hash = block.hash
+    return None
+
+
+def _verify_records(records: List[BlockRecord]) -> Optional[int]:
+    return _verify_blocks(Block.from_payload(*record) for record in records)
+
+
+def _verify_inherited_range(lo: int, hi: int) -> Optional[int]:
+    chain = _inherited_chain
+    return _verify_blocks(chain[i] for i in range(lo, hi))
+
+
+def split_ranges(length: int, start: int, parts: int) -> List[Tuple[int, int]]:
+    """Split ``[start, length)`` into at most ``parts`` balanced ranges"""
+    total = length - start
+    if total <= 0:
+        return []
+    parts = max(1, min(parts, total))
+    size, extra = divmod(total, parts)
+    ranges = []
+    lo = start
+    for i in range(parts):
+        hi = lo + size + (1 if i < extra else 0)
+        ranges.append((lo, hi))
+        lo = hi
+    return ranges
+
+
+def verify_chain_parallel(chain: Sequence[Block], workers: Optional[int] = None,
+                          start: int = 1) -> Optional[int]:
+    """Return the index of the first invalid block, or None if the chain is valid"""
+    workers = workers or os.cpu_count() or 1
+    start = max(start, 1)
+    length = len(chain)
+    ranges = split_ranges(length, start, workers * RANGES_PER_WORKER)
+    if not ranges:
+        return None
+
+    # Boundary links are cheap; check them here so ranges stay independent
+    bad_indexes = []
+    for lo, _ in ranges:
+        if chain[lo].previous_hash != chain[lo - 1].hash:
+            bad_indexes.append(lo)
+            break
+
+    global _inherited_chain
+    can_fork = "fork" in multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context("fork" if can_fork else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        if can_fork:
+            # Forked workers start on the first submit and keep this chain
+            with _inherit_lock:
+                _inherited_chain = chain
+                try:
+                    futures = [pool.submit(_verify_inherited_range, lo, hi) for lo, hi in ranges]
+                finally:
+                    _inherited_chain = None
+        else:
+            futures = [
+                pool.submit(_verify_records, [_to_record(chain[i]) for i in range(lo, hi)])
+                for lo, hi in ranges
+            ]
+        for future in futures:
+            bad_index = future.result()
+            if bad_index is not None:
+                bad_indexes.append(bad_index)
+                break
+
+    return min(bad_indexes) if bad_indexes else None
+
+
+def _load_blocks(lines: Iterable[str]) -> List[Block]:
+    return [Block.from_dict(json.loads(line)) for line in lines if line.strip()]
+
+
+def _fetch_blocks(supernode_url: str) -> List[Block]:
+    import requests
+
+    response = requests.get(
+        f"{supernode_url}/blockchain/blocks",
+        params={"format": "ndjson"},
+        stream=True,
+        timeout=30
+    )
+    response.raise_for_status()
+    return _load_blocks(response.iter_lines(decode_unicode=True))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Verify a blockchain across a process pool')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url', type=str, help='Supernode URL to fetch blocks from')
+    source.add_argument('--file', type=str, help='NDJSON file of blocks (one to_dict per line)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of verifier processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        chain = _fetch_blocks(args.url)
+    else:
+        with open(args.file) as f:
+            chain = _load_blocks(f)
+
+    started = time.perf_counter()
+    bad_index = verify_chain_parallel(chain, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    if bad_index is None:
+        print(f"Chain valid: {len(chain)} blocks verified in {elapsed:.2f}s with {args.workers} workers")
+        return 0
+    print(f"Chain INVALID: first bad block at index {bad_index} ({elapsed:.2f}s)")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
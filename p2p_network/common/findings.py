@@ -0,0 +1,79 @@
+import heapq
+from collections import Counter
+from itertools import count
+from typing import Any, Dict, Iterable, List, Tuple
+
+MAX_ISSUES = 10
+
+# Lower is more severe; pylint message types plus flake8/mypy equivalents
+SEVERITY_RANK = {
+    "fatal": 0,
+    "error": 1,
+    "warning": 2,
+    "refactor": 3,
+    "convention": 4,
+    "info": 5,
+    "note": 5,
+}
+
+
+def severity_of(issue: Dict[str, Any]) -> str:
+    return issue.get("severity") or issue.get("type") or "info"
+
+
+def severity_rank(issue: Dict[str, Any]) -> int:
+    return SEVERITY_RANK.get(severity_of(issue), len(SEVERITY_RANK))
+
+
+class TopIssues:
+    """The ``limit`` most severe issues seen, ties broken by arrival order"""
+
+    def __init__(self, limit: int = MAX_ISSUES):
+        self.limit = limit
+        # Min-heap on (-rank, -seq): the root is the issue to drop next
+        self._heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._seq = count()
+
+    def add(self, issue: Dict[str, Any]):
+        entry = (-severity_rank(issue), -next(self._seq), issue)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[Dict[str, Any]]:
+        return [issue for _, _, issue in sorted(self._heap, reverse=True)]
+
+
+def merge_severity(findings: Iterable[Dict[str, Any]], key: str = "severity") -> Dict[str, int]:
+    total = Counter()
+    for item in findings:
+        total.update(item.get(key, {}))
+    return dict(total)
+
+
+def merge_tool_results(tool: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine one analyzer's results for disjoint sets of files.
+
+    Used for the shards of a task, on the worker and on the supernode.
+    Any shard error makes the merged result an error.
+    """
+    for result in results:
+        if "error" in result:
+            return dict(result)
+
+    top = TopIssues(MAX_ISSUES)
+    for result in results:
+        for issue in result.get("issues", []):
+            top.add(issue)
+    merged = {
+        "tool": tool,
+        "issue_count": sum(result.get("issue_count", 0) for result in results),
+        "severity_counts": merge_severity(results, "severity_counts"),
+        "issues": top.items()
+    }
+    if any("file_findings" in result for result in results):
+        merged["file_findings"] = {}
+        for result in results:
+            merged["file_findings"].update(result.get("file_findings", {}))
+    return merged
@@ -1,8 +1,16 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field, fields
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import json
 
+RESOURCE_REPORT_VERSION = 1
+
+
+def repo_key(code_url: str) -> str:
+    """Short stable id for a repository URL, as listed in ``ResourceReport.cached_repos``"""
+    return hashlib.sha256(code_url.encode()).hexdigest()[:24]
+
 
 @dataclass
 class NodeRegistration:
@@ -30,6 +38,12 @@ class TaskAssignment:
     analysis_type: str
     deadline: str
     assigned_node: str = ""
+    # Set when the supernode split the task across workers
+    shard_index: Optional[int] = None
+    shard_count: Optional[int] = None
+    # Set for leased assignments: the task is reclaimed unless the worker
+    # acknowledges starting it within this many seconds
+    lease_seconds: Optional[float] = None
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -60,12 +74,48 @@ class ResultSubmission:
         return cls(**data)
 
 
+@dataclass
+class ResourceReport:
+    """Worker resource telemetry carried in heartbeats.
+
+    Anything the worker couldn't measure is left out of the payload. New
+    fields may be added within a version, and readers skip keys they don't
+    know; ``version`` only changes when existing fields change meaning.
+    """
+    version: int = RESOURCE_REPORT_VERSION
+    cpu_count: Optional[int] = None
+    cpu_utilization: Optional[float] = None
+    # Fraction of total memory, and absolute bytes
+    memory_available: Optional[float] = None
+    memory_free_bytes: Optional[int] = None
+    # Free space on the clone cache's filesystem
+    disk_free_bytes: Optional[int] = None
+    # repo_key() of each repository in the clone cache, most recently used first
+    cached_repos: List[str] = field(default_factory=list)
+    # Files analyzed per second, by analyzer
+    throughput: Dict[str, float] = field(default_factory=dict)
+    # Findings cache hits, misses, evictions and hit_rate since the worker started
+    findings_cache: Dict[str, float] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in asdict(self).items() if value not in (None, [], {})}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ResourceReport':
+        if data.get("version") != RESOURCE_REPORT_VERSION:
+            raise ValueError(f"Unsupported resource report version: {data.get('version')}")
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
 @dataclass
 class Heartbeat:
     node_id: str
     timestamp: str
     status: str = "active"
     current_load: float = 0.0
+    # ResourceReport.to_dict(), from workers that measure their resources
+    resources: Optional[Dict[str, Any]] = None
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -1,3 +1,5 @@
+import gzip
+import json
 import requests
 import time
 import logging
@@ -15,14 +17,20 @@ class NetworkClient:
         self.session = requests.Session()
     
     def post(self, url: str, json_data: Dict[str, Any], 
-             headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+             headers: Optional[Dict[str, str]] = None,
+             compress: bool = False) -> Optional[requests.Response]:
         headers = headers or {'Content-Type': 'application/json'}
+        body = None
+        if compress:
+            body = gzip.compress(json.dumps(json_data).encode(), compresslevel=6)
+            headers = {**headers, 'Content-Encoding': 'gzip'}
         
         for attempt in range(self.max_retries):
             try:
                 response = self.session.post(
                     url,
-                    json=json_data,
+                    json=json_data if body is None else None,
+                    data=body,
                     headers=headers,
                     timeout=self.timeout
                 )
@@ -47,7 +55,8 @@ class NetworkClient:
         return None
     
     def get(self, url: str, params: Optional[Dict[str, str]] = None,
-            headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+            headers: Optional[Dict[str, str]] = None,
+            stream: bool = False) -> Optional[requests.Response]:
         headers = headers or {}
         
         for attempt in range(self.max_retries):
@@ -56,7 +65,8 @@ class NetworkClient:
                     url,
                     params=params,
                     headers=headers,
-                    timeout=self.timeout
+                    timeout=self.timeout,
+                    stream=stream
                 )
                 response.raise_for_status()
                 return response
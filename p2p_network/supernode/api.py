@@ -1,13 +1,20 @@
 from flask import Flask, request, jsonify
 from datetime import datetime
+import json
 import logging
+import os
+import threading
+import zlib
 
 from ..common.message_formats import (
     NodeRegistration, TaskAssignment, 
     ResultSubmission, Heartbeat
 )
 from .supernode import SuperNode
-from ..blockchain.api import blockchain_api
+from ..blockchain.api import blockchain_api, wait_requested
+from ..blockchain.blob_store import blob_store
+from ..blockchain.ledger_writer import ledger_writer
+from ..blockchain.replication import LedgerFollower
 
 
 app = Flask(__name__)
@@ -18,6 +25,61 @@ app.register_blueprint(blockchain_api, url_prefix='/blockchain')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Largest decompressed request body accepted, against compression bombs
+MAX_DECOMPRESSED_BYTES = 64 * 1024 ** 2
+
+ledger_follower = None
+if os.environ.get("LEDGER_REPLICA_OF"):
+    from ..blockchain.blockchain import blockchain as _ledger
+    ledger_follower = LedgerFollower(_ledger, os.environ["LEDGER_REPLICA_OF"])
+    ledger_follower.start()
+
+
+def request_json():
+    """The request's JSON body, inflating gzip/deflate Content-Encoding"""
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    if encoding == 'identity':
+        return request.json
+    if encoding not in ('gzip', 'deflate'):
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    
+    # wbits=47 accepts both gzip and zlib framing
+    inflater = zlib.decompressobj(wbits=47)
+    body = inflater.decompress(request.get_data(), MAX_DECOMPRESSED_BYTES)
+    if inflater.unconsumed_tail:
+        raise ValueError("Request body too large")
+    return json.loads(body)
+
+
+def replica_response():
+    """409 response when this supernode's ledger is a read-only replica, else None.
+
+    Endpoints that write to the ledger check this up front, as ledger
+    writes on a replica would only fail later in the writer thread.
+    """
+    from ..blockchain.blockchain import blockchain
+    if blockchain.read_only:
+        return jsonify({
+            'status': 'error',
+            'message': 'This supernode is a read-only ledger replica'
+        }), 409
+    return None
+
+
+def result_record(node_id, review_id, review_results):
+    """Ledger record for completed results; the full results go to the blob store"""
+    # Full results live off-chain; the block only carries their digest
+    results_digest, results_size = blob_store.put(review_results)
+    return {
+        "review_id": review_id,
+        "commit_id": review_results.get("commit_id") or "unknown",
+        "reviewer": node_id,
+        "status": "COMPLETED",
+        "timestamp": datetime.now().timestamp(),
+        "results_digest": results_digest,
+        "results_size": results_size
+    }
+
 
 @app.route('/register', methods=['POST'])
 def register_node():
@@ -45,6 +107,7 @@ def get_tasks():
     try:
         node_id = request.args.get('node_id')
         max_tasks = int(request.args.get('max_tasks', 3)) 
+        lease_seconds = request.args.get('lease', type=float)
         
         if not node_id:
             return jsonify({
@@ -52,7 +115,7 @@ def get_tasks():
                 'message': 'node_id parameter required'
             }), 400
             
-        tasks = supernode.get_available_tasks(node_id, max_tasks)
+        tasks = supernode.get_available_tasks(node_id, max_tasks, lease_seconds)
         task_dicts = [task.to_dict() for task in tasks]
         
         return jsonify({
@@ -68,6 +131,48 @@ def get_tasks():
         }), 400
     
     
+@app.route('/tasks/start', methods=['POST'])
+def start_task():
+    try:
+        data = request.json
+        if supernode.start_task(data['node_id'], data['task_id']):
+            return jsonify({
+                'status': 'success',
+                'message': 'Task started'
+            }), 200
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': 'Task is not held by this node'
+            }), 409
+            
+    except Exception as e:
+        logger.error(f"Start task error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+
+@app.route('/tasks/release', methods=['POST'])
+def release_tasks():
+    try:
+        data = request.json
+        released = supernode.release_tasks(data['node_id'], data.get('task_ids', []))
+        
+        return jsonify({
+            'status': 'success',
+            'released': released
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Release tasks error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+
 @app.route('/heartbeat', methods=['POST'])
 def heartbeat():
     try:
@@ -94,40 +199,154 @@ def heartbeat():
         }), 400
 
 
+SUBMISSION_ERRORS = {
+    "unknown": "Unknown task",
+    "rejected": "Task is assigned to another node"
+}
+LEDGER_ERROR = "Failed to record results on the ledger"
+
+# Accepted results whose ledger record failed, by submitted task id, as
+# (review_id, results); the worker resubmits them, and the resubmission is
+# recorded again rather than answered as a duplicate
+unrecorded_results = {}
+unrecorded_lock = threading.Lock()
+
+
+def recover_submission(submission):
+    """Outcome for results of a task the supernode doesn't know, e.g. after a restart.
+
+    Tasks only live in memory, but their creation is on the ledger: results
+    for a task created there and not yet completed are still recorded.
+    """
+    try:
+        from ..blockchain.blockchain import blockchain
+        records = [block["data"] for block in blockchain.get_blocks_by_review_id(submission.task_id)]
+    except Exception as ledger_error:
+        logger.error(f"Error looking up task {submission.task_id} on the ledger: {ledger_error}")
+        return {'status': 'unknown'}
+    
+    if any(record.get("status") == "COMPLETED" for record in records):
+        return {'status': 'duplicate'}
+    created = next((record for record in records if record.get("status") == "CREATED"), None)
+    if created is None:
+        return {'status': 'unknown'}
+    if not supernode.restore_completed_task(submission, created.get("task_details", {})):
+        return {'status': 'duplicate'}
+    return {'status': 'accepted', 'parent_task_id': None, 'gathered': None}
+
+
+def queue_result_record(status, submission, review_id, review_results):
+    """Queue the ledger record of accepted results and return its future.
+
+    None, with ``status`` set to a retryable error, if the record can't be
+    built or queued. Records that fail, now or once the writer seals them,
+    are kept in ``unrecorded_results`` for the worker's retry.
+    """
+    def unrecorded(error):
+        logger.error(f"Error adding to blockchain for task {review_id}: {error}")
+        with unrecorded_lock:
+            unrecorded_results[submission.task_id] = (review_id, review_results)
+    
+    def on_sealed(future):
+        if future.exception() is not None:
+            unrecorded(future.exception())
+    
+    try:
+        blockchain_record = result_record(submission.node_id, review_id, review_results)
+        future = ledger_writer.submit(blockchain_record)
+    except Exception as blockchain_error:
+        unrecorded(blockchain_error)
+        status.update(status='error', message=LEDGER_ERROR, retry=True)
+        return None
+    status['results_digest'] = blockchain_record['results_digest']
+    future.add_done_callback(on_sealed)
+    logger.info(f"Queued result for blockchain for task {review_id}")
+    return future
+
+
+def process_submissions(submissions):
+    """Apply result submissions and queue ledger records for the accepted ones.
+
+    Returns a status per submission, and (status, future) pairs for the
+    queued ledger records. Replays of recorded results succeed as duplicates;
+    a status with ``retry`` set failed on the ledger and can be resubmitted.
+    """
+    statuses, pending_blocks = [], []
+    # One pass over the task table for all of them
+    outcomes = supernode.submit_results_batch(submissions)
+    
+    for submission, outcome in zip(submissions, outcomes):
+        status = {'task_id': submission.task_id, 'status': 'success'}
+        statuses.append(status)
+        if outcome['status'] == 'unknown':
+            outcome = recover_submission(submission)
+        if outcome['status'] == 'duplicate':
+            with unrecorded_lock:
+                unrecorded = unrecorded_results.pop(submission.task_id, None)
+            if unrecorded is None:
+                status['duplicate'] = True
+                continue
+            # Accepted before, but its ledger record failed: record it now
+            review_id, review_results = unrecorded
+        elif outcome['status'] != 'accepted':
+            status.update(status='error', message=SUBMISSION_ERRORS.get(outcome['status'], 'Failed to submit results'))
+            continue
+        else:
+            review_id, review_results = submission.task_id, submission.results
+            if outcome['parent_task_id']:
+                # A shard: only the submission completing its parent task is
+                # recorded, with the gathered results of every shard
+                parent = outcome['gathered']
+                status['gathered'] = parent is not None
+                if parent is None:
+                    continue
+                review_id, review_results = parent.task_id, parent.results
+                status['parent_task_id'] = parent.task_id
+        
+        future = queue_result_record(status, submission, review_id, review_results)
+        if future is not None:
+            pending_blocks.append((status, future))
+    
+    return statuses, pending_blocks
+
+
+def await_blocks(pending_blocks):
+    """Wait for queued ledger records to be sealed and add their blocks to the statuses"""
+    for status, future in pending_blocks:
+        try:
+            block = future.result(timeout=30)
+            status['block_index'] = block.index
+            status['block_hash'] = block.hash
+        except Exception as blockchain_error:
+            logger.error(f"Error adding to blockchain: {blockchain_error}")
+            status.update(status='error', message=LEDGER_ERROR, retry=True)
+
+
 @app.route('/results', methods=['POST'])
 def submit_results():
+    rejected = replica_response()
+    if rejected:
+        return rejected
     try:
-        data = request.json
+        data = request_json()
         submission = ResultSubmission.from_dict(data)
-        success = supernode.submit_results(submission)
+        statuses, pending_blocks = process_submissions([submission])
+        if wait_requested():
+            await_blocks(pending_blocks)
         
-        if success:
-            blockchain_record = {
-                "review_id": submission.task_id,
-                "commit_id": submission.results.get("commit_id", "unknown"),
-                "reviewer": submission.node_id,
-                "status": "COMPLETED",
-                "timestamp": datetime.now().timestamp(),
-                "results": submission.results
-            }
-            
-            try:
-                from ..blockchain.blockchain import blockchain
-                blockchain.add_block(blockchain_record)
-                logger.info(f"Added result to blockchain for task {submission.task_id}")
-            except Exception as blockchain_error:
-                logger.error(f"Error adding to blockchain: {blockchain_error}")
-        
-        if success:
-            return jsonify({
-                'status': 'success',
-                'message': 'Results submitted successfully'
-            }), 200
-        else:
+        status = statuses[0]
+        if status['status'] != 'success':
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to submit results'
             }), 400
+        
+        response = {
+            'status': 'success',
+            'message': 'Results submitted successfully'
+        }
+        response.update((key, value) for key, value in status.items() if key not in ('task_id', 'status'))
+        return jsonify(response), 200
             
     except Exception as e:
         logger.error(f"Submit results error: {str(e)}")
@@ -137,6 +356,47 @@ def submit_results():
         }), 400
 
 
+@app.route('/results/batch', methods=['POST'])
+def submit_results_batch():
+    rejected = replica_response()
+    if rejected:
+        return rejected
+    try:
+        data = request_json()
+        items = data['submissions']
+        statuses = [None] * len(items)
+        
+        submissions = []
+        for position, item in enumerate(items):
+            try:
+                submissions.append((position, ResultSubmission.from_dict(item)))
+            except TypeError as e:
+                statuses[position] = {
+                    'task_id': item.get('task_id') if isinstance(item, dict) else None,
+                    'status': 'error',
+                    'message': f'Invalid submission: {e}'
+                }
+        
+        processed, pending_blocks = process_submissions([submission for _, submission in submissions])
+        for (position, _), status in zip(submissions, processed):
+            statuses[position] = status
+        if wait_requested():
+            # Records were queued together, so they're sealed in as few blocks as possible
+            await_blocks(pending_blocks)
+        
+        return jsonify({
+            'status': 'success',
+            'results': statuses
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Submit results batch error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+
 @app.route('/status', methods=['GET'])
 def get_status():
     try:
@@ -151,7 +411,11 @@ def get_status():
         try:
             from ..blockchain.blockchain import blockchain
             blockchain_status["blocks"] = len(blockchain.chain)
-            blockchain_status["is_valid"] = blockchain.is_chain_valid()
+            blockchain_status["pending_records"] = ledger_writer.pending()
+            blockchain_status["history_filter_fpr"] = blockchain.history_filter.false_positive_rate()
+            if ledger_follower:
+                blockchain_status["replication"] = ledger_follower.get_status()
+            blockchain_status["is_valid"] = blockchain.is_chain_valid(from_checkpoint=True)
         except Exception as blockchain_error:
             logger.error(f"Error getting blockchain status: {blockchain_error}")
             blockchain_status["enabled"] = False
@@ -174,6 +438,9 @@ def get_status():
 
 @app.route('/create_task', methods=['POST'])
 def create_task():
+    rejected = replica_response()
+    if rejected:
+        return rejected
     try:
         data = request.json
         required_fields = ['code_url', 'analysis_type', 'deadline']
@@ -185,14 +452,27 @@ def create_task():
                     'message': f'Missing required field: {field}'
                 }), 400
         
+        shards = int(data.get('shards', 1))
+        if shards < 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'shards must be at least 1'
+            }), 400
+        
         task = supernode.create_task(
             code_url=data['code_url'],
             analysis_type=data['analysis_type'],
-            deadline=data['deadline']
+            deadline=data['deadline'],
+            shards=shards
         )
         
+        response = {
+            'status': 'success',
+            'task_id': task.task_id,
+            'message': 'Task created successfully'
+        }
+        
         try:
-            from ..blockchain.blockchain import blockchain
             blockchain_record = {
                 "review_id": task.task_id,
                 "commit_id": data.get("commit_id", "unknown"),
@@ -202,19 +482,19 @@ def create_task():
                 "task_details": {
                     "code_url": data['code_url'],
                     "analysis_type": data['analysis_type'],
-                    "deadline": data['deadline']
+                    "deadline": data['deadline'],
+                    "shards": shards
                 }
             }
-            blockchain.add_block(blockchain_record)
-            logger.info(f"Added task creation to blockchain for {task.task_id}")
+            block = ledger_writer.append(blockchain_record, wait=wait_requested())
+            if block is not None:
+                response['block_index'] = block.index
+                response['block_hash'] = block.hash
+            logger.info(f"Queued task creation for blockchain for {task.task_id}")
         except Exception as blockchain_error:
             logger.error(f"Error adding to blockchain: {blockchain_error}")
         
-        return jsonify({
-            'status': 'success',
-            'task_id': task.task_id,
-            'message': 'Task created successfully'
-        }), 201
+        return jsonify(response), 201
         
     except Exception as e:
         logger.error(f"Create task error: {str(e)}")
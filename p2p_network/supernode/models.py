@@ -4,6 +4,8 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import time
 
+from ..common.message_formats import ResourceReport, repo_key
+
 
 @dataclass
 class NodeInfo:
@@ -15,15 +17,24 @@ class NodeInfo:
     status: str = "active"
     current_load: float = 0.0
     completed_tasks: int = 0
+    # Latest telemetry from the node's heartbeats, if it sends any
+    resources: Optional[ResourceReport] = None
     
     def is_healthy(self) -> bool:
         current_time = time.time()
         return (current_time - self.last_heartbeat) < 90
     
-    def update_heartbeat(self, timestamp: float, load: float = 0.0):
+    def update_heartbeat(self, timestamp: float, load: float = 0.0,
+                         resources: Optional[ResourceReport] = None):
         self.last_heartbeat = timestamp
         self.current_load = load
+        if resources is not None:
+            self.resources = resources
         self.status = "active" if self.is_healthy() else "inactive"
+    
+    def has_repo(self, code_url: str) -> bool:
+        """Whether the node reported the repository in its clone cache"""
+        return self.resources is not None and repo_key(code_url) in self.resources.cached_repos
 
 
 @dataclass
@@ -37,11 +48,31 @@ class Task:
     created_at: float = field(default_factory=time.time)
     completed_at: Optional[float] = None
     results: Optional[Dict] = None
+    # Shard tasks point at their parent; a parent collects shard results by index
+    parent_task_id: Optional[str] = None
+    shard_index: Optional[int] = None
+    shard_count: Optional[int] = None
+    shard_results: Dict[int, Dict] = field(default_factory=dict)
+    # Deadline for the assigned node to start the task, for leased assignments
+    lease_expires: Optional[float] = None
+    started_at: Optional[float] = None
     
-    def assign_to_node(self, node_id: str):
+    def assign_to_node(self, node_id: str, lease_seconds: Optional[float] = None):
         """Assign task to a specific node"""
         self.assigned_node = node_id
         self.status = "assigned"
+        self.lease_expires = time.time() + lease_seconds if lease_seconds else None
+    
+    def mark_started(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self.lease_expires = None
+    
+    def release(self):
+        """Return an assigned task to the pending state"""
+        self.assigned_node = None
+        self.status = "pending"
+        self.lease_expires = None
     
     def mark_completed(self, results: Dict):
         """Mark task as completed with results"""
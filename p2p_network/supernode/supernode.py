@@ -1,20 +1,31 @@
 import logging
 from queue import Queue, PriorityQueue
 from threading import Lock
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 import time
 import uuid
 
 from ..common.message_formats import (
     NodeRegistration, TaskAssignment, 
-    ResultSubmission, Heartbeat
+    ResultSubmission, Heartbeat, ResourceReport
 )
+from ..common.findings import merge_tool_results
 from .models import NodeInfo, Task
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Nodes below either only get tasks whose repository they already have cached
+MIN_DISK_FREE_BYTES = 512 * 1024 ** 2
+MIN_MEMORY_AVAILABLE = 0.05
+# Seconds a new task is held back for a node that has its repository cached
+CACHE_AFFINITY_WAIT = 15
+CACHE_AFFINITY_BONUS = 30.0
+ANALYZERS = {"all": ["pylint", "flake8", "mypy"]}
+MAX_LEASE_SECONDS = 600
+
 
 class SuperNode:
     def __init__(self):
@@ -22,6 +33,9 @@ class SuperNode:
         self.task_queue: PriorityQueue = PriorityQueue()
         self.pending_tasks: Dict[str, Task] = {}
         self.completed_tasks: Dict[str, Task] = {}
+        # Shard task id -> parent task its submission completed, until taken
+        self.gathered_tasks: Dict[str, Task] = {}
+        self.reclaimed_leases = 0
         self.node_lock = Lock()
         self.task_lock = Lock()
         
@@ -41,9 +55,16 @@ class SuperNode:
         with self.node_lock:
             if heartbeat.node_id in self.registered_nodes:
                 node = self.registered_nodes[heartbeat.node_id]
+                resources = None
+                if heartbeat.resources:
+                    try:
+                        resources = ResourceReport.from_dict(heartbeat.resources)
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Ignoring resources from {heartbeat.node_id}: {e}")
                 node.update_heartbeat(
                     timestamp=time.time(),
-                    load=heartbeat.current_load
+                    load=heartbeat.current_load,
+                    resources=resources
                 )
                 logger.debug(f"Heartbeat from {heartbeat.node_id}")
                 return True
@@ -52,7 +73,7 @@ class SuperNode:
                 return False
     
     def create_task(self, code_url: str, analysis_type: str, 
-                   deadline: str) -> Task:
+                   deadline: str, shards: int = 1) -> Task:
         task_id = str(uuid.uuid4())
         task = Task(
             task_id=task_id,
@@ -61,14 +82,45 @@ class SuperNode:
             deadline=deadline
         )
         
+        # A sharded task is not queued itself; its shards are, and it
+        # completes once every shard's results have been gathered
+        shard_tasks = []
+        if shards > 1:
+            task.status = "sharded"
+            task.shard_count = shards
+            shard_tasks = [
+                Task(
+                    task_id=f"{task_id}.{index}",
+                    code_url=code_url,
+                    analysis_type=analysis_type,
+                    deadline=deadline,
+                    parent_task_id=task_id,
+                    shard_index=index,
+                    shard_count=shards
+                )
+                for index in range(shards)
+            ]
+        
         with self.task_lock:
             self.pending_tasks[task_id] = task
-            self.task_queue.put((deadline, task_id))
+            if shard_tasks:
+                for shard_task in shard_tasks:
+                    self.pending_tasks[shard_task.task_id] = shard_task
+                    self.task_queue.put((deadline, shard_task.task_id))
+            else:
+                self.task_queue.put((deadline, task_id))
             
-        logger.info(f"Created task: {task_id}")
+        logger.info(f"Created task: {task_id}" + (f" in {shards} shards" if shard_tasks else ""))
         return task
     
-    def get_available_tasks(self, node_id: str, max_tasks: int = 3) -> List[TaskAssignment]:
+    def get_available_tasks(self, node_id: str, max_tasks: int = 3,
+                            lease_seconds: Optional[float] = None) -> List[TaskAssignment]:
+        """Assign up to ``max_tasks`` queued tasks to a node.
+
+        With ``lease_seconds`` the assignments are leases: a task the node
+        hasn't acknowledged starting (``start_task``) by then goes back to
+        the queue. Workers use leases to fetch tasks ahead of free slots.
+        """
         with self.node_lock:
             if node_id not in self.registered_nodes:
                 logger.warning(f"Unknown node requesting tasks: {node_id}")
@@ -79,28 +131,43 @@ class SuperNode:
                 logger.warning(f"Unhealthy node requesting tasks: {node_id}")
                 return []
         
+        if lease_seconds:
+            lease_seconds = min(lease_seconds, MAX_LEASE_SECONDS)
+        
         available_tasks = []
         with self.task_lock:
+            self._reclaim_expired_leases()
             temp_queue = []
-            if node.current_load >= 1.0:
+            # A saturated node may still prefetch: it only asks for as many
+            # leased tasks as it can start within the lease
+            if node.current_load >= 1.0 and not lease_seconds:
                 logger.debug(f"Node {node_id} is busy (load: {node.current_load})")
                 return []
             
+            assigned_parents = set()
             while not self.task_queue.empty() and len(available_tasks) < max_tasks:
                 deadline, task_id = self.task_queue.get()
                 task = self.pending_tasks.get(task_id)
                 
                 if task and task.status == "pending":
-                    if self._can_node_handle_task(node, task):
-                        task.assign_to_node(node_id)
+                    if task.parent_task_id and task.parent_task_id in assigned_parents:
+                        # Leave sibling shards for other workers to pick up
+                        temp_queue.append((deadline, task_id))
+                    elif self._can_node_handle_task(node, task):
+                        task.assign_to_node(node_id, lease_seconds)
                         task_assignment = TaskAssignment(
                             task_id=task.task_id,
                             code_url=task.code_url,
                             analysis_type=task.analysis_type,
                             deadline=task.deadline,
-                            assigned_node=node_id
+                            assigned_node=node_id,
+                            shard_index=task.shard_index,
+                            shard_count=task.shard_count,
+                            lease_seconds=lease_seconds or None
                         )
                         available_tasks.append(task_assignment)
+                        if task.parent_task_id:
+                            assigned_parents.add(task.parent_task_id)
                         logger.info(f"Assigned task {task.task_id} to node {node_id}")
                     else:
                         temp_queue.append((deadline, task_id))
@@ -110,33 +177,160 @@ class SuperNode:
                 
         return available_tasks
 
-    def submit_results(self, submission: ResultSubmission) -> bool:
+    def start_task(self, node_id: str, task_id: str) -> bool:
+        """Acknowledge that a node is starting a task; False if it doesn't hold the task"""
         with self.task_lock:
-            if submission.task_id not in self.pending_tasks:
-                logger.warning(f"Results for unknown task: {submission.task_id}")
+            self._reclaim_expired_leases()
+            task = self.pending_tasks.get(task_id)
+            if task is None or task.assigned_node != node_id:
+                logger.warning(f"Start of task {task_id} by {node_id}, which doesn't hold it")
                 return False
-                
-            task = self.pending_tasks[submission.task_id]
-            if task.assigned_node != submission.node_id:
-                logger.warning(f"Results from wrong node for task: {submission.task_id}")
+            if task.status == "assigned":
+                task.mark_started()
+            return True
+    
+    def release_tasks(self, node_id: str, task_ids: List[str]) -> List[str]:
+        """Requeue tasks a node is giving back, e.g. when it shuts down; returns those released"""
+        released = []
+        with self.task_lock:
+            for task_id in task_ids:
+                task = self.pending_tasks.get(task_id)
+                if task is None or task.assigned_node != node_id or task.status not in ("assigned", "running"):
+                    continue
+                task.release()
+                self.task_queue.put((task.deadline, task.task_id))
+                released.append(task_id)
+        
+        if released:
+            logger.info(f"Node {node_id} released tasks: {', '.join(released)}")
+        return released
+    
+    def _reclaim_expired_leases(self):
+        """Requeue leased tasks whose node didn't start them in time (task_lock held)"""
+        now = time.time()
+        for task in self.pending_tasks.values():
+            if task.status == "assigned" and task.lease_expires and task.lease_expires < now:
+                logger.info(f"Lease on task {task.task_id} held by {task.assigned_node} expired")
+                task.release()
+                self.task_queue.put((task.deadline, task.task_id))
+                self.reclaimed_leases += 1
+    
+    def submit_results_batch(self, submissions: List[ResultSubmission]) -> List[Dict[str, Any]]:
+        """Apply many result submissions under one acquisition of the task lock.
+        
+        Returns an outcome per submission, in order: its status
+        ("accepted", "duplicate" for a replay of accepted results,
+        "unknown" or "rejected"), the parent task id for shards, and the
+        parent task itself when that submission completed it.
+        """
+        outcomes = []
+        with self.task_lock:
+            for submission in submissions:
+                status = self._apply_submission(submission)
+                task = self.completed_tasks.get(submission.task_id) if status == "accepted" else None
+                outcomes.append({
+                    "status": status,
+                    "parent_task_id": task.parent_task_id if task else None,
+                    "gathered": self.gathered_tasks.pop(submission.task_id, None)
+                })
+        
+        for submission, outcome in zip(submissions, outcomes):
+            if outcome["status"] == "accepted":
+                logger.info(f"Completed task: {submission.task_id}")
+        return outcomes
+    
+    def _apply_submission(self, submission: ResultSubmission) -> str:
+        """Record a task's results (task_lock held)"""
+        if submission.task_id not in self.pending_tasks:
+            completed = self.completed_tasks.get(submission.task_id)
+            if completed and completed.assigned_node == submission.node_id:
+                # A worker resubmitting after losing the response; already recorded
+                logger.info(f"Duplicate results for task: {submission.task_id}")
+                return "duplicate"
+            logger.warning(f"Results for unknown task: {submission.task_id}")
+            return "unknown"
+            
+        task = self.pending_tasks[submission.task_id]
+        if task.assigned_node != submission.node_id:
+            logger.warning(f"Results from wrong node for task: {submission.task_id}")
+            return "rejected"
+            
+        #move task to completed
+        task.mark_completed(submission.results)
+        self.completed_tasks[submission.task_id] = task
+        del self.pending_tasks[submission.task_id]
+        
+        if task.parent_task_id:
+            self._gather_shard(task)
+        
+        self._count_completed(submission.node_id)
+        return "accepted"
+    
+    def _count_completed(self, node_id: str):
+        #update node statistics
+        with self.node_lock:
+            if node_id in self.registered_nodes:
+                node = self.registered_nodes[node_id]
+                node.completed_tasks += 1
+    
+    def restore_completed_task(self, submission: ResultSubmission, details: Dict[str, Any]) -> bool:
+        """Complete a task this supernode has no record of, from its creation details.
+        
+        Tasks are only held in memory, so after a restart results can
+        arrive for tasks created before it. False if the task is known by now.
+        """
+        with self.task_lock:
+            if submission.task_id in self.pending_tasks or submission.task_id in self.completed_tasks:
                 return False
-                
-            #move task to completed
+            task = Task(
+                task_id=submission.task_id,
+                code_url=details.get("code_url", ""),
+                analysis_type=details.get("analysis_type", ""),
+                deadline=details.get("deadline", ""),
+                assigned_node=submission.node_id
+            )
             task.mark_completed(submission.results)
-            self.completed_tasks[submission.task_id] = task
-            del self.pending_tasks[submission.task_id]
-            
-            #update node statistics
-            with self.node_lock:
-                if submission.node_id in self.registered_nodes:
-                    node = self.registered_nodes[submission.node_id]
-                    node.completed_tasks += 1
-                    
-        logger.info(f"Completed task: {submission.task_id}")
+            self.completed_tasks[task.task_id] = task
+            self._count_completed(submission.node_id)
+        
+        logger.info(f"Completed task from before a restart: {submission.task_id}")
         return True
     
+    def _gather_shard(self, shard_task: Task):
+        """Record a shard's results; complete the parent when all are in (task_lock held)"""
+        parent = self.pending_tasks.get(shard_task.parent_task_id)
+        if parent is None:
+            return
+        parent.shard_results[shard_task.shard_index] = shard_task.results
+        if len(parent.shard_results) < parent.shard_count:
+            return
+        
+        parent.mark_completed(gather_shard_results(parent))
+        self.completed_tasks[parent.task_id] = parent
+        del self.pending_tasks[parent.task_id]
+        self.gathered_tasks[shard_task.task_id] = parent
+        logger.info(f"Gathered {parent.shard_count} shards of task {parent.task_id}")
+    
     def _can_node_handle_task(self, node: NodeInfo, task: Task) -> bool:
-        return True 
+        resources = node.resources
+        if resources is None:
+            return True
+        
+        cached = node.has_repo(task.code_url)
+        if not cached:
+            if resources.disk_free_bytes is not None and resources.disk_free_bytes < MIN_DISK_FREE_BYTES:
+                return False
+            if resources.memory_available is not None and resources.memory_available < MIN_MEMORY_AVAILABLE:
+                return False
+            if time.time() - task.created_at < CACHE_AFFINITY_WAIT:
+                # Hold a fresh task back for a node that can skip the clone
+                preferred = self._select_best_node_for_task(task)
+                if preferred is not None and preferred != node.node_id:
+                    with self.node_lock:
+                        preferred_node = self.registered_nodes.get(preferred)
+                    if preferred_node is not None and preferred_node.has_repo(task.code_url):
+                        return False
+        return True
     
     def get_node_status(self) -> Dict:
         with self.node_lock:
@@ -148,7 +342,8 @@ class SuperNode:
                     'current_load': node.current_load,
                     'completed_tasks': node.completed_tasks,
                     'capabilities': node.capabilities,
-                    'healthy': node.is_healthy()
+                    'healthy': node.is_healthy(),
+                    'resources': node.resources.to_dict() if node.resources else None
                 }
             return status
     
@@ -157,7 +352,9 @@ class SuperNode:
             return {
                 'pending': len(self.pending_tasks),
                 'completed': len(self.completed_tasks),
-                'queue_size': self.task_queue.qsize()
+                'queue_size': self.task_queue.qsize(),
+                'leased': sum(1 for task in self.pending_tasks.values() if task.lease_expires),
+                'reclaimed_leases': self.reclaimed_leases
             }
         
     def _select_best_node_for_task(self, task: Task) -> Optional[str]:
@@ -183,5 +380,55 @@ class SuperNode:
         if node.completed_tasks > 0:
             score += min(node.completed_tasks, 10) * 2
         
+        resources = node.resources
+        if resources is not None:
+            if node.has_repo(task.code_url):
+                score += CACHE_AFFINITY_BONUS
+            if resources.cpu_utilization is not None:
+                score -= resources.cpu_utilization * 20
+            # Faster analyzers for this task type, in files per second
+            rates = [resources.throughput[tool]
+                     for tool in ANALYZERS.get(task.analysis_type, [task.analysis_type])
+                     if tool in resources.throughput]
+            if rates:
+                score += min(sum(rates) / len(rates), 20)
         
         return score
+
+
+def gather_shard_results(parent: Task) -> Dict[str, Any]:
+    """Merge the per-shard results of a task into one result for the whole repository"""
+    shards = [parent.shard_results[index] for index in range(parent.shard_count)]
+    
+    findings: Dict[str, Any] = {}
+    for tool in dict.fromkeys(tool for shard in shards for tool in shard.get("findings", {})):
+        tool_results = [shard["findings"][tool] for shard in shards
+                        if tool in shard.get("findings", {})]
+        if all(isinstance(result, dict) for result in tool_results):
+            findings[tool] = merge_tool_results(tool, tool_results)
+        else:
+            findings[tool] = tool_results[0]
+    
+    errors = [shard["error"] for shard in shards if "error" in shard]
+    commit_ids = {shard.get("commit_id") for shard in shards}
+    if len(commit_ids) > 1:
+        # Each shard's file split came from a different checkout
+        errors.append("Shards analyzed different commits")
+    
+    results = {
+        "task_id": parent.task_id,
+        "analysis_type": parent.analysis_type,
+        "code_url": parent.code_url,
+        "status": "completed" if all(
+            shard.get("status") == "completed" for shard in shards
+        ) and not errors else "failed",
+        "language": next((shard.get("language") for shard in shards if shard.get("language")), None),
+        "commit_id": next(iter(commit_ids)) if len(commit_ids) == 1 else None,
+        "findings": findings,
+        "execution_time": max(shard.get("execution_time", 0) for shard in shards),
+        "timestamp": datetime.now().isoformat(),
+        "shards": parent.shard_count
+    }
+    if errors:
+        results["error"] = "; ".join(errors)
+    return results
@@ -1,13 +1,423 @@
 # test_blockchain.py
+import hashlib
+import io
 import json
 import time
 import sys
 import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zlib
+from concurrent.futures import Future
 from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Keep results blobs written through the supernode API out of any shared directory
+os.environ.setdefault("LEDGER_BLOB_DIR", tempfile.mkdtemp())
+
+from p2p_network.blockchain.blockchain import blockchain, Block, Blockchain
+from p2p_network.blockchain.api import blockchain_api
+from p2p_network.blockchain.blob_store import BlobStore
+from p2p_network.blockchain.bloom import ScalableBloomFilter
+from p2p_network.blockchain.ledger_io import export_blocks, import_into_chain, import_to_store
+from p2p_network.blockchain.ledger_writer import LedgerWriter
+from p2p_network.blockchain.replication import LedgerFollower
+from p2p_network.blockchain.storage import LedgerStore
+from p2p_network.blockchain.verifier import split_ranges, verify_chain_parallel
+
+
+class TestBlock(unittest.TestCase):
+    def test_hash_matches_full_block_serialization(self):
+        data = {"review_id": "review-1", "results": {"b": [1, 2], "a": "x"}}
+        block = Block(1, 1700000000.25, data, "0" * 64)
+        
+        expected = hashlib.sha256(json.dumps({
+            "index": 1,
+            "timestamp": 1700000000.25,
+            "data": data,
+            "previous_hash": "0" * 64
+        }, sort_keys=True).encode()).hexdigest()
+        
+        self.assertEqual(block.hash, expected)
+        self.assertEqual(block.data, data)
+    
+    def test_tampered_data_invalidates_chain(self):
+        chain = Blockchain()
+        chain.add_block({"review_id": "review-1", "status": "CREATED"})
+        chain.add_block({"review_id": "review-1", "status": "COMPLETED"})
+        self.assertTrue(chain.is_chain_valid())
+        
+        chain.chain[1].data = {"review_id": "review-1", "status": "REJECTED"}
+        self.assertFalse(chain.is_chain_valid())
+
+
+
+class TestParallelVerifier(unittest.TestCase):
+    def setUp(self):
+        self.chain = Blockchain()
+        for i in range(40):
+            self.chain.add_block({"review_id": f"review-{i}", "status": "CREATED"})
+    
+    def test_split_ranges_covers_chain(self):
+        ranges = split_ranges(41, 1, 6)
+        
+        self.assertEqual(ranges[0][0], 1)
+        self.assertEqual(ranges[-1][1], 41)
+        for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(hi, lo)
+    
+    def test_reports_first_bad_index(self):
+        self.assertIsNone(verify_chain_parallel(self.chain.chain, workers=2))
+        
+        self.chain.chain[30].data = {"review_id": "forged"}
+        self.chain.chain[17].data = {"review_id": "forged"}
+        self.assertEqual(verify_chain_parallel(self.chain.chain, workers=2), 17)
+        self.assertEqual(self.chain.first_invalid_index(), 17)
+
+
+
+class TestLedgerWriter(unittest.TestCase):
+    def setUp(self):
+        self.chain = Blockchain()
+        self.writer = LedgerWriter(self.chain)
+        self.addCleanup(self.writer.stop)
+    
+    def test_wait_returns_sealed_block(self):
+        block = self.writer.append({"review_id": "review-1"}, wait=True)
+        
+        self.assertEqual(block.index, 1)
+        self.assertEqual(self.chain.get_latest_block().hash, block.hash)
+    
+    def test_concurrent_writers_keep_index_sequence(self):
+        futures = []
+        futures_lock = threading.Lock()
+        
+        def submit_records(thread_id):
+            for i in range(50):
+                future = self.writer.submit({"review_id": f"review-{thread_id}-{i}"})
+                with futures_lock:
+                    futures.append(future)
+        
+        threads = [threading.Thread(target=submit_records, args=(t,)) for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for future in futures:
+            future.result(timeout=10)
+        
+        self.assertEqual(len(self.chain.chain), 201)
+        self.assertEqual([b.index for b in self.chain.chain], list(range(201)))
+        self.assertTrue(self.chain.is_chain_valid())
+    
+    def test_bad_record_fails_alone(self):
+        futures = []
+        # Queued before the writer starts, so all three land in one group
+        for record in ({"review_id": "ok-1"}, {"review_id": object()}, {"review_id": "ok-2"}):
+            future = Future()
+            self.writer.queue.put((record, future))
+            futures.append(future)
+        self.writer.start()
+        
+        self.assertEqual(futures[0].result(timeout=10).data, {"review_id": "ok-1"})
+        with self.assertRaises(TypeError):
+            futures[1].result(timeout=10)
+        self.assertEqual(futures[2].result(timeout=10).index, 2)
+        self.assertTrue(self.chain.is_chain_valid())
+
+
+
+class TestCheckpointedStorage(unittest.TestCase):
+    def setUp(self):
+        self.ledger_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.ledger_dir)
+    
+    def open_chain(self, **kwargs):
+        kwargs.setdefault('checkpoint_interval', 10)
+        kwargs.setdefault('checkpoint_key', 'secret')
+        chain = Blockchain(storage_dir=self.ledger_dir, **kwargs)
+        self.addCleanup(chain.store.close)
+        return chain
+    
+    def test_reload_restores_chain_and_checkpoints(self):
+        chain = self.open_chain()
+        chain.add_blocks([{"review_id": f"review-{i}"} for i in range(25)])
+        
+        reloaded = self.open_chain()
+        
+        self.assertEqual([b.hash for b in reloaded.chain], [b.hash for b in chain.chain])
+        self.assertEqual(reloaded.state_digest, chain.state_digest)
+        self.assertEqual(reloaded.latest_checkpoint().index, 20)
+        self.assertEqual(reloaded.checkpoint_start(), 20)
+    
+    def test_reload_rejects_tampering_after_checkpoint(self):
+        chain = self.open_chain()
+        chain.add_blocks([{"review_id": f"review-{i}"} for i in range(25)])
+        chain.store.close()
+        
+        blocks_path = os.path.join(self.ledger_dir, 'blocks.ndjson')
+        with open(blocks_path, 'rb') as f:
+            content = f.read()
+        with open(blocks_path, 'wb') as f:
+            f.write(content.replace(b'"review-22"', b'"forged-22"'))
+            
+        with self.assertRaises(ValueError):
+            Blockchain(storage_dir=self.ledger_dir, checkpoint_interval=10, checkpoint_key='secret')
+    
+    def test_wrong_key_falls_back_to_genesis(self):
+        chain = self.open_chain()
+        chain.add_blocks([{"review_id": f"review-{i}"} for i in range(15)])
+        
+        reloaded = self.open_chain(checkpoint_key='other-secret')
+        
+        self.assertIsNone(reloaded.latest_checkpoint())
+        self.assertEqual(reloaded.checkpoint_start(), 1)
+    
+    def test_cold_storage_archives_checkpointed_blocks(self):
+        chain = self.open_chain(cold_storage=True)
+        chain.add_blocks([{"review_id": f"review-{i}"} for i in range(25)])
+        
+        self.assertEqual(len(os.listdir(os.path.join(self.ledger_dir, 'cold'))), 2)
+        reloaded = self.open_chain()
+        self.assertEqual(len(reloaded.chain), 26)
+        self.assertTrue(reloaded.is_chain_valid())
+
+
+
+class TestHistoryFilter(unittest.TestCase):
+    def test_scalable_filter_has_no_false_negatives(self):
+        bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"review-{i}")
+        
+        self.assertGreater(len(bloom.filters), 1)
+        self.assertTrue(all(f"review-{i}" in bloom for i in range(1000)))
+        self.assertLess(bloom.false_positive_rate(), 0.01)
+        false_hits = sum(f"missing-{i}" in bloom for i in range(10000))
+        self.assertLess(false_hits, 200)
+    
+    def test_misses_skip_the_chain_scan(self):
+        chain = Blockchain()
+        chain.add_block({"review_id": "review-1", "commit_id": "abc123"})
+        
+        self.assertEqual(len(chain.get_blocks_by_review_id("review-1")), 1)
+        self.assertEqual(len(chain.get_blocks_by_commit_id("abc123")), 1)
+        self.assertEqual(chain.get_blocks_by_review_id("review-2"), [])
+        
+        stats = chain.get_history_filter_stats()
+        self.assertEqual(stats["lookups"], 3)
+        self.assertEqual(stats["filtered_misses"] + stats["false_positives"], 1)
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.blob_dir)
+        self.store = BlobStore(self.blob_dir)
+    
+    def test_put_is_content_addressed_and_deduplicated(self):
+        results = {"pylint": {"issue_count": 3, "issues": ["a", "b", "c"]}}
+        
+        digest, size = self.store.put(results)
+        same_digest, _ = self.store.put({"pylint": {"issues": ["a", "b", "c"], "issue_count": 3}})
+        
+        self.assertEqual(digest, same_digest)
+        self.assertEqual(size, len(json.dumps(results, sort_keys=True)))
+        self.assertEqual(self.store.get(digest), results)
+        self.assertEqual(len(os.listdir(os.path.join(self.blob_dir, digest[:2]))), 1)
+    
+    def test_rejects_path_like_digest(self):
+        with self.assertRaises(ValueError):
+            self.store.get('../../etc/passwd')
+    
+    def test_in_memory_store(self):
+        store = BlobStore(None)
+        digest, _ = store.put({"flake8": {"issue_count": 1}})
+        
+        self.assertEqual(store.get(digest), {"flake8": {"issue_count": 1}})
+        self.assertIsNone(store.get("0" * 64))
+        with self.assertRaises(ValueError):
+            store.get('../../etc/passwd')
+
+
+
+class TestLedgerExport(unittest.TestCase):
+    def setUp(self):
+        self.chain = Blockchain()
+        self.chain.add_blocks([{"review_id": f"review-{i}", "notes": "x" * i} for i in range(300)])
+    
+    def export(self, compression):
+        output = io.BytesIO()
+        self.assertEqual(export_blocks(self.chain.iter_blocks(), output, compression), 301)
+        output.seek(0)
+        return output
+    
+    def test_round_trip_into_chain(self):
+        for compression in ('none', 'zlib'):
+            replica = Blockchain(read_only=True)
+            self.assertEqual(import_into_chain(self.export(compression), replica), 301)
+            self.assertEqual([b.hash for b in replica.chain], [b.hash for b in self.chain.chain])
+    
+    def test_import_to_store_verifies_blocks(self):
+        parent = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, parent)
+        ledger_dir = os.path.join(parent, "ledger")
+        valid = self.export('zlib')
+        
+        self.chain.chain[150].data = {"review_id": "forged"}
+        with self.assertRaises(ValueError):
+            import_to_store(self.export('zlib'), ledger_dir)
+        # Nothing from the failed import is left behind, so a retry succeeds
+        self.assertEqual(os.listdir(parent), [])
+        
+        self.assertEqual(import_to_store(valid, ledger_dir), 301)
+        store = LedgerStore(ledger_dir)
+        self.addCleanup(store.close)
+        self.assertEqual(len(list(store.load_blocks())), 301)
+    
+    def test_truncated_export_is_rejected(self):
+        data = self.export('none').getvalue()
+        with self.assertRaises(ValueError):
+            import_into_chain(io.BytesIO(data[:-10]), Blockchain(read_only=True))
+
+
+class TestBlockchainApi(unittest.TestCase):
+    def setUp(self):
+        self.chain = Blockchain()
+        for i in range(5):
+            self.chain.add_block({"review_id": f"review-{i}", "status": "CREATED"})
+        
+        writer = LedgerWriter(self.chain)
+        self.addCleanup(writer.stop)
+        blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, blob_dir)
+        self.blob_store = BlobStore(blob_dir)
+        patched = (('blockchain', self.chain), ('ledger_writer', writer), ('blob_store', self.blob_store))
+        for name, value in patched:
+            patcher = patch(f'p2p_network.blockchain.api.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        app = Flask(__name__)
+        app.register_blueprint(blockchain_api, url_prefix='/blockchain')
+        self.client = app.test_client()
+    
+    def test_blocks_pagination(self):
+        data = self.client.get('/blockchain/blocks?from=2&limit=2').get_json()
+        
+        self.assertEqual([b['index'] for b in data['blocks']], [2, 3])
+        self.assertEqual(data['chain_length'], 6)
+        self.assertEqual(data['next_from'], 4)
+        
+        data = self.client.get('/blockchain/blocks?from=4&limit=10').get_json()
+        self.assertEqual([b['index'] for b in data['blocks']], [4, 5])
+        self.assertIsNone(data['next_from'])
+    
+    def test_malformed_integer_args_are_rejected(self):
+        for url in ('/blockchain/blocks?from=abc', '/blockchain/blocks?limit=2x',
+                    '/blockchain/range?from=x', '/blockchain/range?limit=ten',
+                    '/blockchain/sync?since=one', '/blockchain/sync?batch=1.5'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('must be an integer', response.get_json()['message'])
+    
+    def test_export_rejects_unavailable_compression(self):
+        self.assertEqual(self.client.get('/blockchain/export?compression=lzma').status_code, 400)
+        with patch('p2p_network.blockchain.ledger_io.zstandard', None):
+            response = self.client.get('/blockchain/export?compression=zstd')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('zstandard', response.get_json()['message'])
+    
+    def test_blocks_since_ndjson(self):
+        response = self.client.get('/blockchain/blocks?since=3&format=ndjson')
+        
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)['index'] for line in lines], [4, 5])
+    
+    def test_validate_with_workers(self):
+        data = self.client.get('/blockchain/validate?mode=full&workers=2').get_json()
+        
+        self.assertTrue(data['is_valid'])
+        self.assertIsNone(data['first_invalid_index'])
+    
+    def test_record_without_wait_is_queued(self):
+        record = {"review_id": "review-9", "commit_id": "abc", "reviewer": "dev", "status": "CREATED"}
+        
+        response = self.client.post('/blockchain/record?wait=false', json=record)
+        self.assertEqual(response.status_code, 202)
+        
+        response = self.client.post('/blockchain/record', json=record)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['block_index'], 7)
+    
+    def test_follower_replicates_from_sync_stream(self):
+        replica = Blockchain(read_only=True)
+        follower = LedgerFollower(replica, 'http://primary:5000', batch_size=4)
+        
+        def fake_get(url, params=None, stream=False):
+            response = self.client.get('/blockchain/sync', query_string=params)
+            wrapped = MagicMock()
+            wrapped.headers = response.headers
+            wrapped.iter_lines.return_value = response.get_data().splitlines()
+            return wrapped
+        
+        with patch.object(follower.network_client, 'get', side_effect=fake_get):
+            self.assertEqual(follower.sync_once(), 6)
+            self.chain.add_block({"review_id": "review-late"})
+            self.assertEqual(follower.sync_once(), 1)
+        
+        self.assertEqual([b.hash for b in replica.chain], [b.hash for b in self.chain.chain])
+        self.assertEqual(follower.lag, 0)
+        with self.assertRaises(RuntimeError):
+            replica.add_block({"review_id": "review-local"})
+    
+    def test_replica_rejects_forged_block(self):
+        replica = Blockchain(read_only=True)
+        replica.append_replicated(self.chain.chain[:3])
+        
+        line = LedgerStore.encode_block(self.chain.chain[3]).replace(b'review-2', b'forged-2')
+        with self.assertRaises(ValueError):
+            replica.append_replicated([LedgerStore.decode_block(line)])
+        self.assertEqual(len(replica.chain), 3)
+    
+    def test_time_range_query(self):
+        base = int(time.time()) + 1000
+        with patch('p2p_network.blockchain.blockchain.time') as mock_time:
+            mock_time.time.side_effect = [base, base + 10, base + 20, base + 30]
+            for i in range(4):
+                self.chain.add_block({"review_id": f"timed-{i}"})
+        
+        window = f"start={base + 5}&end={base + 30}"
+        data = self.client.get(f'/blockchain/range?{window}&limit=1').get_json()
+        self.assertEqual(data['total_in_range'], 2)
+        self.assertEqual([b['data']['review_id'] for b in data['blocks']], ['timed-1'])
+        
+        data = self.client.get(f"/blockchain/range?{window}&from={data['next_from']}").get_json()
+        self.assertEqual([b['data']['review_id'] for b in data['blocks']], ['timed-2'])
+        self.assertIsNone(data['next_from'])
+    
+    def test_results_blob_endpoint(self):
+        digest, _ = self.blob_store.put({"flake8": {"issue_count": 1}})
+        
+        response = self.client.get(f'/blockchain/results/{digest}')
+        self.assertEqual(response.get_json(), {"flake8": {"issue_count": 1}})
+        
+        response = self.client.get(f'/blockchain/results/{digest}', headers={'Accept-Encoding': 'deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(json.loads(zlib.decompress(response.get_data())), {"flake8": {"issue_count": 1}})
+        
+        self.assertEqual(self.client.get(f'/blockchain/results/{"0" * 64}').status_code, 404)
+    
+    def test_blocks_rejects_bad_window(self):
+        response = self.client.get('/blockchain/blocks?limit=0')
+        self.assertEqual(response.status_code, 400)
 
-from p2p_network.blockchain.blockchain import blockchain
 
 def main():
     for i in range(1, 4):
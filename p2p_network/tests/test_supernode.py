@@ -2,15 +2,22 @@
 Tests for supernode implementation
 """
 import unittest
+import gzip
 import json
+import zlib
+from concurrent.futures import Future
+from unittest.mock import patch
 import sys
 import os
+import tempfile
 from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# Keep results blobs written through the supernode API out of any shared directory
+os.environ.setdefault("LEDGER_BLOB_DIR", tempfile.mkdtemp())
 
 from p2p_network.common.message_formats import (
-    NodeRegistration, Heartbeat, ResultSubmission
+    NodeRegistration, Heartbeat, ResultSubmission, ResourceReport, repo_key
 )
 from p2p_network.supernode.supernode import SuperNode
 
@@ -96,6 +103,243 @@ class TestSuperNode(unittest.TestCase):
         self.assertEqual(assigned_task.status, "assigned")
         self.assertEqual(assigned_task.assigned_node, "test-node-3")
 
+    def test_sharded_task_fans_out_and_gathers(self):
+        for node_id in ("node-a", "node-b"):
+            self.supernode.register_node(NodeRegistration(
+                node_id=node_id,
+                ip_address="127.0.0.1",
+                port=8080,
+                capabilities=["python"],
+                timestamp=datetime.now().isoformat()
+            ))
+        task = self.supernode.create_task(
+            code_url="https://example.com/code.git",
+            analysis_type="flake8",
+            deadline=(datetime.now() + timedelta(hours=1)).isoformat(),
+            shards=2
+        )
+        
+        first = self.supernode.get_available_tasks("node-a")
+        second = self.supernode.get_available_tasks("node-b")
+        
+        # One shard per worker, not both to the first one asking
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertEqual({first[0].shard_index, second[0].shard_index}, {0, 1})
+        
+        outcomes = []
+        for node_id, assignment, count in (("node-a", first[0], 3), ("node-b", second[0], 4)):
+            outcomes += self.supernode.submit_results_batch([ResultSubmission(
+                task_id=assignment.task_id,
+                results={
+                    "status": "completed",
+                    "commit_id": "abc",
+                    "findings": {"flake8": {
+                        "issue_count": count,
+                        "severity_counts": {"error": count},
+                        "issues": [{"message": node_id, "severity": "error"}]
+                    }}
+                },
+                node_id=node_id,
+                timestamp=datetime.now().isoformat()
+            )])
+        
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["accepted", "accepted"])
+        self.assertEqual({outcome["parent_task_id"] for outcome in outcomes}, {task.task_id})
+        # Only the submission completing the parent hands it back
+        self.assertIsNone(outcomes[0]["gathered"])
+        parent = outcomes[1]["gathered"]
+        self.assertIs(parent, self.supernode.completed_tasks[task.task_id])
+        self.assertEqual(parent.status, "completed")
+        self.assertEqual(parent.results["findings"]["flake8"]["issue_count"], 7)
+        self.assertEqual(parent.results["findings"]["flake8"]["severity_counts"], {"error": 7})
+        self.assertEqual(parent.results["commit_id"], "abc")
+        self.assertEqual(self.supernode.gathered_tasks, {})
+    
+    def test_heartbeat_resources_steer_tasks_to_cached_workers(self):
+        code_url = "https://example.com/code.git"
+        reports = {
+            "cold-node": ResourceReport(cpu_count=4, cpu_utilization=0.1, disk_free_bytes=10 ** 10),
+            "warm-node": ResourceReport(cpu_count=4, cpu_utilization=0.1, disk_free_bytes=10 ** 10,
+                                        cached_repos=[repo_key(code_url)], throughput={"pylint": 40.0}),
+        }
+        for node_id, report in reports.items():
+            self.supernode.register_node(NodeRegistration(
+                node_id=node_id, ip_address="127.0.0.1", port=8080,
+                capabilities=["python"], timestamp=datetime.now().isoformat()
+            ))
+            self.supernode.handle_heartbeat(Heartbeat(
+                node_id=node_id, timestamp=datetime.now().isoformat(),
+                current_load=0.0, resources=report.to_dict()
+            ))
+        
+        warm = self.supernode.registered_nodes["warm-node"]
+        self.assertEqual(warm.resources.throughput, {"pylint": 40.0})
+        self.assertEqual(self.supernode.get_node_status()["warm-node"]["resources"]["version"], 1)
+        
+        deadline = (datetime.now() + timedelta(hours=1)).isoformat()
+        task = self.supernode.create_task(code_url=code_url, analysis_type="pylint", deadline=deadline)
+        self.assertEqual(self.supernode.get_available_tasks("cold-node"), [])
+        self.assertEqual([t.task_id for t in self.supernode.get_available_tasks("warm-node")], [task.task_id])
+        
+        # Once the hold expires any node takes it
+        task = self.supernode.create_task(code_url=code_url, analysis_type="pylint", deadline=deadline)
+        self.supernode.pending_tasks[task.task_id].created_at -= 60
+        self.assertEqual([t.task_id for t in self.supernode.get_available_tasks("cold-node")], [task.task_id])
+        
+        # Reports of an unknown version are ignored
+        self.supernode.handle_heartbeat(Heartbeat(
+            node_id="cold-node", timestamp=datetime.now().isoformat(),
+            resources={"version": 99, "cpu_count": 64}
+        ))
+        self.assertEqual(self.supernode.registered_nodes["cold-node"].resources.cpu_count, 4)
+
+    
+    def test_leased_tasks_are_reclaimed_unless_started(self):
+        for node_id in ("node-a", "node-b"):
+            self.supernode.register_node(NodeRegistration(
+                node_id=node_id, ip_address="127.0.0.1", port=8080,
+                capabilities=["python"], timestamp=datetime.now().isoformat()
+            ))
+        deadline = (datetime.now() + timedelta(hours=1)).isoformat()
+        started = self.supernode.create_task("https://example.com/a.git", "pylint", deadline)
+        idle = self.supernode.create_task("https://example.com/b.git", "pylint", deadline)
+        
+        leased = self.supernode.get_available_tasks("node-a", max_tasks=2, lease_seconds=30)
+        self.assertEqual([t.lease_seconds for t in leased], [30, 30])
+        self.assertTrue(self.supernode.start_task("node-a", started.task_id))
+        self.assertFalse(self.supernode.start_task("node-b", idle.task_id))
+        self.assertEqual(self.supernode.get_available_tasks("node-b", lease_seconds=30), [])
+        
+        for task in (started, idle):
+            if self.supernode.pending_tasks[task.task_id].lease_expires:
+                self.supernode.pending_tasks[task.task_id].lease_expires -= 60
+        
+        reassigned = self.supernode.get_available_tasks("node-b", lease_seconds=30)
+        self.assertEqual([t.task_id for t in reassigned], [idle.task_id])
+        self.assertFalse(self.supernode.start_task("node-a", idle.task_id))
+        self.assertEqual(self.supernode.pending_tasks[started.task_id].status, "running")
+        self.assertEqual(self.supernode.get_task_status()["reclaimed_leases"], 1)
+        
+        # A node shutting down hands back what it holds, started or not
+        released = self.supernode.release_tasks("node-a", [started.task_id, idle.task_id])
+        self.assertEqual(released, [started.task_id])
+        self.assertEqual(self.supernode.pending_tasks[started.task_id].status, "pending")
+        self.assertEqual([t.task_id for t in self.supernode.get_available_tasks("node-a")], [started.task_id])
+
+
+
+class TestResultsBatchApi(unittest.TestCase):
+    def setUp(self):
+        from p2p_network.supernode import api
+        self.api = api
+        self.client = api.app.test_client()
+        self.supernode = api.supernode
+    
+    def test_compressed_batch_reports_status_per_item(self):
+        self.supernode.register_node(NodeRegistration(
+            node_id="batch-node", ip_address="127.0.0.1", port=8080,
+            capabilities=["python"], timestamp=datetime.now().isoformat()
+        ))
+        deadline = (datetime.now() + timedelta(hours=1)).isoformat()
+        tasks = [self.supernode.create_task(f"https://example.com/{i}.git", "pylint", deadline) for i in range(2)]
+        for task in tasks:
+            self.supernode.pending_tasks[task.task_id].assign_to_node("batch-node")
+        
+        submissions = [
+            ResultSubmission(task_id=task.task_id, results={"status": "completed", "commit_id": "abc"},
+                             node_id="batch-node", timestamp=datetime.now().isoformat()).to_dict()
+            for task in tasks
+        ]
+        submissions.append(dict(submissions[0], task_id="unknown-task"))
+        submissions.append({"task_id": "malformed"})
+        body = gzip.compress(json.dumps({"submissions": submissions}).encode())
+        
+        response = self.client.post('/results/batch', data=body, headers={
+            'Content-Type': 'application/json', 'Content-Encoding': 'gzip'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        statuses = response.get_json()["results"]
+        self.assertEqual([item["status"] for item in statuses], ["success", "success", "error", "error"])
+        self.assertEqual([item["task_id"] for item in statuses],
+                         [tasks[0].task_id, tasks[1].task_id, "unknown-task", "malformed"])
+        self.assertIn("results_digest", statuses[0])
+        for task in tasks:
+            self.assertIn(task.task_id, self.supernode.completed_tasks)
+        
+        replay = self.client.post('/results/batch', json={"submissions": submissions[:1]})
+        self.assertEqual(replay.get_json()["results"][0]["duplicate"], True)
+        
+        bomb = zlib.compress(b" " * (self.api.MAX_DECOMPRESSED_BYTES + 1))
+        response = self.client.post('/results/batch', data=bomb, headers={'Content-Encoding': 'deflate'})
+        self.assertEqual(response.status_code, 400)
+
+    
+    def test_results_for_tasks_created_before_a_restart_are_recorded_once(self):
+        response = self.client.post('/create_task?wait=true', json={
+            "code_url": "https://example.com/restart.git",
+            "analysis_type": "pylint",
+            "deadline": (datetime.now() + timedelta(hours=1)).isoformat()
+        })
+        task_id = response.get_json()["task_id"]
+        submission = ResultSubmission(task_id=task_id, results={"status": "completed"},
+                                      node_id="old-node", timestamp=datetime.now().isoformat())
+        
+        with patch.object(self.api, 'supernode', SuperNode()) as restarted:
+            first = self.client.post('/results?wait=true', json=submission.to_dict())
+            second = self.client.post('/results', json=submission.to_dict())
+            unknown = self.client.post('/results', json=dict(submission.to_dict(), task_id="never-created"))
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("block_index", first.get_json())
+        self.assertTrue(second.get_json()["duplicate"])
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(restarted.completed_tasks[task_id].code_url, "https://example.com/restart.git")
+
+    
+    def test_results_failing_on_the_ledger_are_recorded_on_resubmission(self):
+        self.supernode.register_node(NodeRegistration(
+            node_id="ledger-node", ip_address="127.0.0.1", port=8080,
+            capabilities=["python"], timestamp=datetime.now().isoformat()
+        ))
+        deadline = (datetime.now() + timedelta(hours=1)).isoformat()
+        task = self.supernode.create_task("https://example.com/ledger.git", "pylint", deadline)
+        self.supernode.pending_tasks[task.task_id].assign_to_node("ledger-node")
+        submission = ResultSubmission(task_id=task.task_id, results={"status": "completed"},
+                                      node_id="ledger-node", timestamp=datetime.now().isoformat()).to_dict()
+        failed = Future()
+        failed.set_exception(RuntimeError("disk full"))
+        
+        with patch.object(self.api.ledger_writer, 'submit', return_value=failed):
+            first = self.client.post('/results/batch?wait=true', json={"submissions": [submission]})
+        retried = self.client.post('/results/batch?wait=true', json={"submissions": [submission]})
+        replayed = self.client.post('/results/batch?wait=true', json={"submissions": [submission]})
+        
+        status = first.get_json()["results"][0]
+        self.assertEqual(status["status"], "error")
+        self.assertTrue(status["retry"])
+        # The resubmission is recorded rather than taken for a duplicate
+        self.assertIn("block_index", retried.get_json()["results"][0])
+        self.assertTrue(replayed.get_json()["results"][0]["duplicate"])
+    
+    def test_replica_rejects_ledger_writes(self):
+        from p2p_network.blockchain.blockchain import blockchain
+        submission = ResultSubmission(task_id="t", results={}, node_id="n", timestamp="").to_dict()
+        
+        with patch.object(blockchain, 'read_only', True):
+            responses = [
+                self.client.post('/create_task', json={
+                    "code_url": "https://example.com/r.git", "analysis_type": "pylint", "deadline": "2030-01-01"
+                }),
+                self.client.post('/results', json=submission),
+                self.client.post('/results/batch', json={"submissions": [submission]}),
+            ]
+        
+        self.assertEqual([response.status_code for response in responses], [409, 409, 409])
+        self.assertFalse(any(task.code_url == "https://example.com/r.git"
+                             for task in self.supernode.pending_tasks.values()))
+
 
 if __name__ == '__main__':
     unittest.main()
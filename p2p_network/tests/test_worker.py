@@ -1,15 +1,59 @@
 import unittest
+import io
+import json
 import threading
 import time
 import sys
 import os
+import shutil
+import signal
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# Keep result journals and caches of the workers created here out of the shared defaults
+_WORK_DIR = tempfile.mkdtemp()
+for _name in ("WORKER_OUTBOX_DIR", "WORKER_REPO_CACHE_DIR", "WORKER_ANALYSIS_STATE_DIR",
+              "WORKER_FINDINGS_CACHE_DIR"):
+    os.environ.setdefault(_name, os.path.join(_WORK_DIR, _name.lower()))
 
 from p2p_network.worker.worker_node import WorkerNode
 from p2p_network.worker.task_executor import TaskExecutor
-from p2p_network.common.message_formats import TaskAssignment
+from p2p_network.worker.repo_cache import RepoCache
+from p2p_network.worker.incremental import AnalysisStateStore, list_files, python_dependents
+from p2p_network.worker.findings_cache import FindingsCache, blob_hashes
+from p2p_network.worker.analyzer_daemons import LintServer
+from p2p_network.worker.output_parsing import IssueCollector, iter_json_array, parse_flake8
+from p2p_network.worker.sharding import plan_shards
+from p2p_network.worker.prefetch import PrefetchBuffer
+from p2p_network.worker.result_batcher import ResultBatcher
+from p2p_network.worker.result_outbox import ResultOutbox
+from p2p_network.worker import sandbox
+from p2p_network.worker.sandbox import ResourceLimitExceeded, ResourceLimits, Sandbox
+from p2p_network.worker.resource_monitor import (
+    AdaptiveConcurrency, AnalyzerThroughput, ResourceMonitor, ResourceSample
+)
+from p2p_network.common.message_formats import TaskAssignment, ResultSubmission, ResourceReport, repo_key
+
+
+def make_git_fixture(files):
+    """Create a local git repository with one commit; returns its file:// URL"""
+    repo_dir = tempfile.mkdtemp()
+    for name, content in files.items():
+        with open(os.path.join(repo_dir, name), 'w') as f:
+            f.write(content)
+    commit_git_fixture(repo_dir, "initial")
+    return repo_dir
+
+
+def commit_git_fixture(repo_dir, message):
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    if not os.path.isdir(os.path.join(repo_dir, '.git')):
+        subprocess.run(['git', 'init', '-q', repo_dir], check=True)
+    subprocess.run(git + ['-C', repo_dir, 'add', '-A'], check=True)
+    subprocess.run(git + ['-C', repo_dir, 'commit', '-q', '-m', message], check=True)
 
 
 class TestWorkerNode(unittest.TestCase):
@@ -22,6 +66,9 @@ class TestWorkerNode(unittest.TestCase):
         )
         self.mock_supernode_url = "http://localhost:5000"
     
+    def tearDown(self):
+        self.worker.stop(drain=False)
+    
     def test_initialization(self):
         self.assertEqual(self.worker.node_id, "test-worker-1")
         self.assertEqual(self.worker.ip_address, "localhost")
@@ -62,11 +109,220 @@ class TestWorkerNode(unittest.TestCase):
         self.assertFalse(status["is_running"])
         self.assertIsNone(status["current_task"])
         self.assertEqual(status["load"], 0.0)
+    
+    @patch('p2p_network.worker.worker_node.run_analysis_task')
+    def test_execute_task_reports_real_analysis(self, mock_run_analysis):
+        mock_run_analysis.return_value = {
+            "task_id": "task-1",
+            "status": "completed",
+            "language": "python",
+            "analysis_type": "pylint",
+            "results": {"pylint": {"tool": "pylint", "issue_count": 2, "issues": []}},
+            "findings_cache": {"hits": 3, "misses": 1, "evictions": 0}
+        }
+        self.worker.analysis_pool = ThreadPoolExecutor(max_workers=1)
+        self.worker.supernode_url = self.mock_supernode_url
+        self.worker.network_client = Mock()
+        self.worker.network_client.post.return_value = Mock(status_code=200)
+        
+        task = TaskAssignment(
+            task_id="task-1",
+            code_url="https://github.com/test/repo.git",
+            analysis_type="pylint",
+            deadline="2025-12-31T23:59:59Z",
+            assigned_node="test-worker-1"
+        )
+        self.worker.current_tasks[task.task_id] = task
+        self.worker._execute_task(task)
+        
+        self.worker.result_batcher.flush()
+        
+        mock_run_analysis.assert_called_once_with("task-1", task.code_url, "pylint", None, None)
+        url, body = self.worker.network_client.post.call_args[0]
+        self.assertTrue(url.endswith("/results/batch?wait=true"))
+        submitted = body["submissions"][0]["results"]
+        self.assertEqual(submitted["findings"]["pylint"]["issue_count"], 2)
+        self.assertEqual(submitted["status"], "completed")
+        self.assertGreaterEqual(submitted["execution_time"], 0)
+        self.assertNotIn("task-1", self.worker.current_tasks)
+        # Cache counters from the analysis process are summed on the worker, not submitted
+        self.assertNotIn("findings_cache", submitted)
+        self.assertEqual(self.worker.get_status()["findings_cache"],
+                         {"hits": 3, "misses": 1, "evictions": 0, "hit_rate": 0.75})
+        self.assertEqual(self.worker._resource_report().findings_cache["hit_rate"], 0.75)
+
+
+class TestDrain(unittest.TestCase):
+    def setUp(self):
+        self.worker = WorkerNode(node_id="drain", ip_address="localhost", port=8081, capabilities=["python"])
+        self.addCleanup(self.worker.stop, False)
+        self.worker.is_running = True
+        self.worker.supernode_url = "http://localhost:5000"
+        self.worker.network_client = Mock()
+        self.worker.network_client.post.return_value = Mock(status_code=200)
+    
+    def task(self, task_id):
+        return TaskAssignment(task_id=task_id, code_url="file:///repo", analysis_type="pylint",
+                              deadline="2025-12-31T23:59:59Z", lease_seconds=60)
+    
+    def released(self):
+        return [c[0][1]["task_ids"] for c in self.worker.network_client.post.call_args_list
+                if c[0][0].endswith("/tasks/release")]
+    
+    def test_drain_hands_back_prefetched_tasks_and_waits_for_running_ones(self):
+        self.worker.prefetch.add([self.task("queued")], 60)
+        self.worker.current_tasks["running"] = self.task("running")
+        finish = threading.Timer(0.3, self.worker.current_tasks.pop, ("running",))
+        finish.start()
+        
+        self.worker.drain(timeout=5)
+        
+        self.assertEqual(self.released(), [["queued"]])
+        self.assertEqual(self.worker.current_tasks, {})
+        self.worker._dispatch_prefetched()
+        self.worker.prefetch.add([self.task("late")], 60)
+        self.worker._dispatch_prefetched()
+        self.assertEqual(self.worker.current_tasks, {})
+    
+    def test_tasks_from_a_poll_in_flight_are_handed_back(self):
+        def poll_response(*args, **kwargs):
+            # Drain starts while the poll request is still out
+            self.worker.drain(timeout=0)
+            return Mock(status_code=200, json=Mock(return_value={"tasks": [self.task("in-flight").to_dict()]}))
+        self.worker.network_client.get.side_effect = poll_response
+        
+        self.worker._poll_for_tasks()
+        
+        self.assertEqual(self.released(), [["in-flight"]])
+        self.assertEqual(len(self.worker.prefetch), 0)
+    
+    def test_tasks_still_running_at_the_deadline_are_handed_back(self):
+        self.worker.current_tasks["stuck"] = self.task("stuck")
+        
+        self.worker.drain(timeout=0.2)
+        
+        self.assertEqual(self.released(), [["stuck"]])
+
+
+class TestResultBatcher(unittest.TestCase):
+    def test_results_finishing_together_share_a_request(self):
+        batches = []
+        batcher = ResultBatcher(lambda batch: batches.append([s.task_id for s in batch]),
+                                window=0.5, max_batch=3)
+        batcher.start()
+        for i in range(4):
+            batcher.submit(ResultSubmission(task_id=f"t{i}", results={}, node_id="w", timestamp=""))
+        batcher.close()
+        
+        self.assertEqual(batches, [["t0", "t1", "t2"], ["t3"]])
+        batcher.submit(ResultSubmission(task_id="late", results={}, node_id="w", timestamp=""))
+        self.assertEqual(batches[-1], ["late"])
+
+
+class TestResultOutbox(unittest.TestCase):
+    def setUp(self):
+        self.outbox_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.outbox_dir, True)
+        self.path = os.path.join(self.outbox_dir, "results.ndjson")
+    
+    def submission(self, task_id):
+        return ResultSubmission(task_id=task_id, results={"status": "completed"}, node_id="w", timestamp="")
+    
+    def test_undelivered_results_survive_a_restart(self):
+        outbox = ResultOutbox(self.path)
+        for task_id in ("t1", "t2", "t3"):
+            outbox.put(self.submission(task_id))
+        outbox.mark_delivered(["t2", "unknown"])
+        self.assertEqual([s.task_id for s in outbox.undelivered(older_than=60)], [])
+        outbox.close()
+        with open(self.path, "a") as f:
+            f.write('{"op": "put", "submi')
+        
+        reopened = ResultOutbox(self.path)
+        self.assertEqual([s.task_id for s in reopened.undelivered()], ["t1", "t3"])
+        reopened.put(self.submission("t4"))
+        reopened.mark_delivered(["t1"])
+        reopened._compact()
+        reopened.close()
+        
+        self.assertEqual([s.task_id for s in ResultOutbox(self.path).undelivered()], ["t3", "t4"])
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+    
+    def test_second_instance_cannot_share_a_journal(self):
+        outbox = ResultOutbox(self.path)
+        outbox.put(self.submission("t1"))
+        
+        with self.assertRaises(RuntimeError):
+            ResultOutbox(self.path)
+        # The failed instance didn't touch the journal or release the lock
+        self.assertEqual([s.task_id for s in outbox.undelivered()], ["t1"])
+        with self.assertRaises(RuntimeError):
+            ResultOutbox(self.path)
+        
+        outbox.close()
+        reopened = ResultOutbox(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual([s.task_id for s in reopened.undelivered()], ["t1"])
+    
+    def test_worker_resends_results_the_supernode_missed(self):
+        worker = WorkerNode(node_id="outbox", ip_address="localhost", port=8081, capabilities=["python"])
+        self.addCleanup(worker.stop, False)
+        worker.outbox.close()
+        worker.outbox = ResultOutbox(self.path)
+        worker.supernode_url = "http://localhost:5000"
+        worker.network_client = Mock()
+        worker.network_client.post.return_value = None
+        worker.outbox.put(self.submission("t1"))
+        
+        self.assertFalse(worker._send_results([self.submission("t1")]))
+        self.assertEqual(len(worker.outbox), 1)
+        
+        worker.network_client.post.return_value = Mock(status_code=200, json=Mock(return_value={
+            "status": "success", "results": [{"task_id": "t1", "status": "success", "duplicate": True}]
+        }))
+        self.assertTrue(worker._drain_outbox(older_than=0))
+        self.assertEqual(len(worker.outbox), 0)
+    
+    def test_results_stay_in_outbox_until_sealed(self):
+        worker = WorkerNode(node_id="outbox", ip_address="localhost", port=8081, capabilities=["python"])
+        self.addCleanup(worker.stop, False)
+        worker.outbox.close()
+        worker.outbox = ResultOutbox(self.path)
+        worker.supernode_url = "http://localhost:5000"
+        worker.network_client = Mock()
+        submissions = [self.submission(task_id) for task_id in ("sealed", "ledger", "shard", "rejected")]
+        for submission in submissions:
+            worker.outbox.put(submission)
+        worker.network_client.post.return_value = Mock(status_code=200, json=Mock(return_value={
+            "status": "success", "results": [
+                {"task_id": "sealed", "status": "success", "block_index": 3},
+                # The supernode's ledger writer failed the record
+                {"task_id": "ledger", "status": "error", "message": "ledger", "retry": True},
+                {"task_id": "shard", "status": "success", "gathered": False},
+                {"task_id": "rejected", "status": "error", "message": "Unknown task"},
+            ]
+        }))
+        
+        self.assertTrue(worker._send_results(submissions))
+        
+        self.assertTrue(worker.network_client.post.call_args[0][0].endswith("?wait=true"))
+        self.assertEqual(sorted(s.task_id for s in worker.outbox.undelivered()), ["ledger", "shard"])
 
 
 class TestTaskExecutor(unittest.TestCase):
     def setUp(self):
-        self.executor = TaskExecutor()
+        self.work_dir = tempfile.mkdtemp()
+        self.executor = TaskExecutor(
+            repo_cache=RepoCache(os.path.join(self.work_dir, "repos")),
+            analysis_state=AnalysisStateStore(os.path.join(self.work_dir, "state")),
+            findings_cache=FindingsCache(os.path.join(self.work_dir, "findings")),
+            warm_analyzers=False
+        )
+    
+    def tearDown(self):
+        self.executor.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
     
     def test_detect_language(self):
         with patch('os.walk') as mock_walk:
@@ -98,6 +354,564 @@ class TestTaskExecutor(unittest.TestCase):
             self.assertEqual(result['language'], 'python')
             self.assertEqual(result['analysis_type'], 'pylint')
             self.assertIn('results', result)
+    
+    def test_all_runs_analyzers_concurrently_within_budget(self):
+        def slow_analyzer(name):
+            def run(code_path):
+                time.sleep(0.3)
+                return {"tool": name, "issue_count": 0, "issues": []}
+            return run
+        
+        for budget, max_wall_time in ((3, 0.6), (1, None)):
+            executor = TaskExecutor(
+                repo_cache=Mock(),
+                analyzer_slots=threading.BoundedSemaphore(budget)
+            )
+            executor.supported_languages["python"]["analyzers"] = {
+                name: slow_analyzer(name) for name in ("pylint", "flake8", "mypy")
+            }
+            
+            started = time.time()
+            results = executor._run_analysis("/tmp/repo", "python", "all")
+            wall_time = time.time() - started
+            
+            self.assertEqual(set(results), {"pylint", "flake8", "mypy"})
+            self.assertTrue(all(r["duration"] >= 0.3 for r in results.values()))
+            if max_wall_time:
+                self.assertLess(wall_time, max_wall_time)
+            else:
+                self.assertGreaterEqual(wall_time, 0.9)
+
+
+
+class TestFindingsCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+    
+    def test_evicts_least_recently_used_entries(self):
+        cache = FindingsCache(self.cache_dir, max_bytes=10 ** 6)
+        keys = [cache.key(f"blob{i}", "pylint", "2.17", "cfg") for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, {"count": i, "issues": []})
+            os.utime(cache._path(key), (i, i))
+        cache.get(keys[0])
+        
+        cache.max_bytes = cache.disk_usage() - 1
+        cache.evict()
+        
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[0])["count"], 0)
+        self.assertEqual(cache.stats["evictions"], 1)
+    
+    def test_blob_hashes_handle_non_utf8_file_names(self):
+        repo_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_dir, True)
+        with open(os.path.join(os.fsencode(repo_dir), b"caf\xe9.py"), 'w') as f:
+            f.write("x = 1\n")
+        commit_git_fixture(repo_dir, "latin-1 name")
+        files = list_files(repo_dir, [".py"])
+        
+        hashes = blob_hashes(repo_dir, files)
+        
+        self.assertEqual(list(hashes), files)
+        tree = subprocess.run(['git', 'ls-tree', '-z', 'HEAD'], cwd=repo_dir, check=True, capture_output=True)
+        self.assertIn(hashes[files[0]].encode(), tree.stdout)
+
+
+class TestOutputParsing(unittest.TestCase):
+    def test_json_array_is_decoded_incrementally(self):
+        issues = [{"path": f"m{i}.py", "type": "convention", "message": "x, ]"} for i in range(50)]
+        stream = io.StringIO(json.dumps(issues, indent=4))
+        
+        self.assertEqual(list(iter_json_array(stream, chunk_size=7)), issues)
+        self.assertEqual(list(iter_json_array(io.StringIO(""))), [])
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO('[{"path": "a.py"'), chunk_size=4))
+    
+    def test_collector_keeps_most_severe_issues_within_bound(self):
+        lines = "".join(f"a.py:{i}:1: E501 line too long\n" for i in range(1000))
+        lines += "a.py:1001:1: W291 trailing whitespace\nb.py:1:1: F401 'os' imported but unused\n"
+        collector = IssueCollector(limit=3)
+        
+        parse_flake8(io.StringIO(lines), collector)
+        result = collector.result("flake8")
+        
+        self.assertEqual(result["issue_count"], 1002)
+        self.assertEqual(result["severity_counts"], {"error": 1001, "warning": 1})
+        self.assertEqual(len(result["file_findings"]["a.py"]["issues"]), 3)
+        self.assertEqual([issue["line"] for issue in result["issues"]], ["0", "1", "2"])
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.proc_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.proc_root, True)
+    
+    def write_proc(self, busy, idle, available_kb, running):
+        files = {
+            "stat": f"cpu  {busy} 0 0 {idle} 0 0 0 0 0 0\ncpu0 {busy} 0 0 {idle} 0 0 0 0 0 0\n",
+            "meminfo": f"MemTotal:       1000 kB\nMemFree:         100 kB\nMemAvailable:    {available_kb} kB\n",
+            "loadavg": f"0.50 0.40 0.30 {running}/345 6789\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.proc_root, name), "w") as f:
+                f.write(content)
+    
+    def test_monitor_reads_cpu_deltas_memory_and_run_queue(self):
+        monitor = ResourceMonitor(self.proc_root)
+        monitor.cpu_count = 2
+        self.write_proc(busy=100, idle=100, available_kb=500, running=5)
+        monitor.sample()
+        self.write_proc(busy=190, idle=110, available_kb=250, running=5)
+        
+        sample = monitor.sample()
+        
+        self.assertAlmostEqual(sample.cpu_utilization, 0.9)
+        self.assertAlmostEqual(sample.memory_available, 0.25)
+        self.assertAlmostEqual(sample.run_queue, 2.0)
+        self.assertIsNone(ResourceMonitor(os.path.join(self.proc_root, "missing")).sample())
+    
+    def test_limit_grows_when_saturated_and_backs_off_under_pressure(self):
+        concurrency = AdaptiveConcurrency(initial=2, max_limit=4)
+        idle = ResourceSample(cpu_utilization=0.3, memory_available=0.8, run_queue=0.2, cpu_count=4)
+        
+        self.assertEqual(concurrency.update(idle, active_tasks=1), 2)
+        self.assertEqual(concurrency.update(idle, active_tasks=2), 3)
+        self.assertEqual(concurrency.update(idle, active_tasks=3), 4)
+        self.assertEqual(concurrency.update(idle, active_tasks=4), 4)
+        
+        low_memory = ResourceSample(cpu_utilization=0.3, memory_available=0.05, run_queue=0.2, cpu_count=4)
+        self.assertEqual(concurrency.update(low_memory, active_tasks=4), 2)
+        busy = ResourceSample(cpu_utilization=0.99, memory_available=0.8, run_queue=0.2, cpu_count=4)
+        self.assertEqual(concurrency.update(busy, active_tasks=2), 1)
+        self.assertEqual(concurrency.update(None, active_tasks=1), 1)
+        
+        # Reported load reflects the CPU even with a free slot
+        self.assertEqual(concurrency.load(active_tasks=0), 1.0)
+    
+    def test_worker_polls_up_to_the_adaptive_limit(self):
+        worker = WorkerNode(node_id="adaptive", ip_address="localhost", port=8081,
+                            capabilities=["python"], max_concurrent_tasks=2, max_concurrency=6)
+        worker.supernode_url = "http://localhost:5000"
+        self.addCleanup(worker.stop, False)
+        worker.network_client = Mock()
+        worker.network_client.get.return_value = {"status": "success", "tasks": []}
+        worker.concurrency.limit = 5
+        worker.current_tasks = {"t1": Mock()}
+        
+        worker._poll_for_tasks()
+        
+        self.assertEqual(worker.concurrency.max_limit, 6)
+        params = worker.network_client.get.call_args[1]["params"]
+        # Free slots plus one task prefetched
+        self.assertEqual(params["max_tasks"], 5)
+
+    def test_warm_analyzers_bound_analysis_processes_to_cpu_budget(self):
+        worker = WorkerNode(node_id="warm", ip_address="localhost", port=8081, capabilities=["python"],
+                            cpu_budget=2, max_concurrency=8, warm_analyzers=True)
+        self.addCleanup(worker.stop, False)
+        cold = WorkerNode(node_id="cold", ip_address="localhost", port=8082, capabilities=["python"],
+                          cpu_budget=2, max_concurrency=8)
+        self.addCleanup(cold.stop, False)
+
+        # Each analysis process holds its own analyzer servers in warm mode
+        self.assertEqual(worker.analysis_workers, 2)
+        self.assertEqual(cold.analysis_workers, 8)
+
+    def test_heartbeat_reports_resources_and_cached_repos(self):
+        worker = WorkerNode(node_id="telemetry", ip_address="localhost", port=8081, capabilities=["python"])
+        self.addCleanup(worker.stop, False)
+        worker.repo_cache = RepoCache(self.proc_root)
+        os.makedirs(worker.repo_cache.mirror_path("file:///repo.git"))
+        worker.resource_sample = ResourceSample(cpu_utilization=0.5, memory_available=0.4, run_queue=0.1,
+                                                cpu_count=2, memory_available_bytes=4096)
+        
+        report = ResourceReport.from_dict(worker._resource_report().to_dict())
+        
+        self.assertEqual(report.cpu_count, 2)
+        self.assertEqual(report.memory_free_bytes, 4096)
+        self.assertGreater(report.disk_free_bytes, 0)
+        self.assertEqual(report.cached_repos, [repo_key("file:///repo.git")])
+    
+    def test_throughput_counts_only_analyzed_files(self):
+        throughput = AnalyzerThroughput(smoothing=0.5)
+        throughput.record({
+            "pylint": {"files_analyzed": 20, "cache_misses": 10, "duration": 2.0},
+            "flake8": {"files_analyzed": 30, "duration": 1.0},
+            "mypy": {"error": "Analysis timeout", "duration": 60.0},
+        })
+        throughput.record({"pylint": {"files_analyzed": 0, "duration": 0.1}})
+        throughput.record({"pylint": {"files_analyzed": 15, "duration": 1.0}})
+        
+        self.assertEqual(throughput.rates(), {"pylint": 10.0, "flake8": 30.0})
+
+
+class TestPrefetch(unittest.TestCase):
+    def make_task(self, task_id, lease_seconds=60):
+        return TaskAssignment(task_id=task_id, code_url="file:///repo", analysis_type="pylint",
+                              deadline="2025-12-31T23:59:59Z", lease_seconds=lease_seconds)
+    
+    def test_depth_covers_a_round_trip_and_expired_leases_are_dropped(self):
+        buffer = PrefetchBuffer(max_depth=8, min_lease=60)
+        self.assertEqual(buffer.depth(4), 1)
+        buffer.record_task_duration(2.0)
+        buffer.record_rtt(1.5)
+        self.assertEqual(buffer.depth(4), 3)
+        self.assertEqual(buffer.lease_seconds(4), 60)
+        buffer.record_rtt(100)
+        self.assertEqual(buffer.depth(4), 8)
+        
+        buffer.add([self.make_task("gone", lease_seconds=-1), self.make_task("kept")], 60)
+        self.assertEqual(buffer.pop().task_id, "kept")
+        self.assertIsNone(buffer.pop())
+    
+    def test_worker_starts_prefetched_task_when_a_slot_frees(self):
+        worker = WorkerNode(node_id="prefetch", ip_address="localhost", port=8081, capabilities=["python"],
+                            max_concurrent_tasks=1, adaptive_concurrency=False)
+        self.addCleanup(worker.stop, False)
+        worker.is_running = True
+        worker.supernode_url = "http://localhost:5000"
+        worker.network_client = Mock()
+        worker.network_client.post.return_value = Mock(status_code=200)
+        started = []
+        worker.executor = Mock()
+        worker.executor.submit.side_effect = lambda func, task: started.append(task.task_id)
+        worker.prefetch.add([self.make_task("t1"), self.make_task("t2")], 60)
+        
+        worker._dispatch_prefetched()
+        self.assertEqual(started, ["t1"])
+        self.assertEqual(worker.get_status()["prefetched_tasks"], ["t2"])
+        
+        with patch('p2p_network.worker.worker_node.run_analysis_task'):
+            worker.analysis_pool = ThreadPoolExecutor(max_workers=1)
+            worker._execute_task(worker.current_tasks["t1"])
+        
+        self.assertEqual(started, ["t1", "t2"])
+        self.assertTrue(worker.poll_wakeup.is_set())
+        acks = [c for c in worker.network_client.post.call_args_list if c[0][0].endswith("/tasks/start")]
+        self.assertEqual(acks[0][0][1], {"node_id": "prefetch", "task_id": "t1"})
+
+
+class TestPythonDependents(unittest.TestCase):
+    def test_relative_imports_are_resolved(self):
+        files = {
+            "pkg/__init__.py": "",
+            "pkg/utils.py": "def f(): pass\n",
+            "pkg/a.py": "from .utils import f\n",
+            "pkg/b.py": "from . import utils\n",
+            "pkg/c.py": "from pkg.utils import f\n",
+            "pkg/sub/__init__.py": "",
+            "pkg/sub/d.py": "from ..utils import (\n    f,\n)\n",
+            "other/e.py": "from .utils import f\n",
+        }
+        code_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, code_path, True)
+        for path, source in files.items():
+            os.makedirs(os.path.join(code_path, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(code_path, path), 'w') as f:
+                f.write(source)
+        
+        dependents = python_dependents(code_path, {"pkg/utils.py"}, list(files))
+        
+        self.assertEqual(dependents, {"pkg/a.py", "pkg/b.py", "pkg/c.py", "pkg/sub/d.py"})
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo_dir, True)
+        self.sizes = {"big.py": 900, "mid.py": 500, "a.py": 400, "b.py": 300, "c.py": 200}
+        for name, size in self.sizes.items():
+            with open(os.path.join(self.repo_dir, name), 'w') as f:
+                f.write("#" * (size - 1) + "\n")
+    
+    def test_plan_balances_shards_by_size(self):
+        shards = plan_shards(self.repo_dir, sorted(self.sizes), 2)
+        
+        self.assertEqual(sorted(sum(shards, [])), sorted(self.sizes))
+        totals = sorted(sum(self.sizes[name] for name in shard) for shard in shards)
+        self.assertEqual(totals, [1100, 1200])
+        self.assertEqual(shards, plan_shards(self.repo_dir, list(reversed(sorted(self.sizes))), 2))
+        self.assertEqual(len(plan_shards(self.repo_dir, ["a.py"], 3)), 3)
+    
+    def test_large_file_lists_are_analyzed_in_parallel_shards(self):
+        files = [f"m{i}.py" for i in range(32)]
+        calls = []
+        
+        def analyzer(code_path, shard):
+            calls.append(shard)
+            time.sleep(0.2)
+            return {"tool": "flake8", "issue_count": len(shard), "severity_counts": {},
+                    "issues": [], "file_findings": {}}
+        
+        executor = TaskExecutor(repo_cache=Mock(), warm_analyzers=False,
+                                analyzer_slots=threading.BoundedSemaphore(4), max_shards=4)
+        with executor.analyzer_slots:
+            started = time.time()
+            result = executor._run_sharded("flake8", analyzer, self.repo_dir, files)
+            wall_time = time.time() - started
+        
+        self.assertEqual(result["shards"], 4)
+        self.assertEqual(result["issue_count"], 32)
+        self.assertEqual(sorted(sum(calls, [])), sorted(files))
+        self.assertLess(wall_time, 0.6)
+        # All extra slots were handed back
+        self.assertEqual(len([executor.analyzer_slots.acquire(False) for _ in range(4)]), 4)
+
+
+class TestLintServer(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir = make_git_fixture({"main.py": "import os\n"})
+        self.addCleanup(shutil.rmtree, self.repo_dir, True)
+        self.server = LintServer("flake8", max_jobs=2)
+        self.addCleanup(self.server.stop)
+        self.output = os.path.join(self.repo_dir, ".flake8.out")
+    
+    def run_server(self, args):
+        self.server.run(args, self.repo_dir, timeout=60, output=self.output)
+        with open(self.output) as f:
+            return f.read()
+    
+    def test_matches_cold_run_and_recycles(self):
+        cold = subprocess.run(["flake8", "--format=default", "main.py"],
+                              cwd=self.repo_dir, capture_output=True, text=True)
+        
+        for _ in range(3):
+            self.assertEqual(self.run_server(["--format=default", "main.py"]), cold.stdout)
+        
+        self.assertEqual(self.server.stats["jobs"], 3)
+        self.assertEqual(self.server.stats["recycled"], 1)
+    
+    def test_restarts_dead_server(self):
+        self.run_server(["main.py"])
+        self.server._process.kill()
+        self.server._process.join()
+        
+        self.assertIn("F401", self.run_server(["main.py"]))
+        self.assertEqual(self.server.stats["restarts"], 1)
+
+
+class TestSandbox(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+    
+    def run_python(self, code, **limits):
+        executor = TaskExecutor(repo_cache=Mock(), warm_analyzers=False,
+                                sandbox=Sandbox(ResourceLimits(**limits)))
+        output = []
+        returncode, stderr = executor._stream_tool(
+            sys.executable, ["-c", code], self.work_dir, lambda stream: output.append(stream.read()), timeout=30
+        )
+        return returncode, "".join(output), executor.sandbox
+    
+    def test_analyzer_runs_with_limits_and_scratch_dir(self):
+        code = ("import os, resource, tempfile; "
+                "print(resource.getrlimit(resource.RLIMIT_NOFILE)[0], tempfile.gettempdir(), os.getsid(0) == os.getpid())")
+        returncode, output, _ = self.run_python(code, open_files=64)
+        
+        nofile, tmpdir, own_session = output.split()
+        self.assertEqual(returncode, 0)
+        self.assertEqual(nofile, "64")
+        self.assertIn("p2p_scratch_", tmpdir)
+        self.assertFalse(os.path.exists(tmpdir))
+        self.assertEqual(own_session, "True")
+    
+    def test_run_applies_limits_after_spawn_and_times_out(self):
+        code = "import resource; print(resource.getrlimit(resource.RLIMIT_NOFILE)[0])"
+        result = sandbox.run([sys.executable, "-c", code], ResourceLimits(open_files=64), timeout=30,
+                             stdout=subprocess.PIPE, text=True)
+        self.assertEqual(result.stdout.strip(), "64")
+        
+        with self.assertRaises(subprocess.TimeoutExpired):
+            sandbox.run([sys.executable, "-c", "import time; time.sleep(30)"], None, timeout=0.5)
+    
+    def test_memory_limit_is_reported(self):
+        with self.assertRaises(ResourceLimitExceeded) as raised:
+            self.run_python("x = bytearray(512 * 1024 ** 2)", address_space=256 * 1024 ** 2)
+        self.assertEqual(raised.exception.limit, "address_space")
+    
+    def test_scratch_quota_kills_analyzer(self):
+        code = ("import tempfile, time\n"
+                "with tempfile.NamedTemporaryFile(delete=False) as f:\n"
+                "    f.write(b'x' * 4 * 1024 ** 2); f.flush(); time.sleep(20)")
+        started = time.time()
+        with self.assertRaises(ResourceLimitExceeded) as raised:
+            self.run_python(code, scratch_bytes=1024 ** 2)
+        self.assertEqual(raised.exception.limit, "scratch_quota")
+        self.assertLess(time.time() - started, 10)
+    
+    def test_violations_are_classified(self):
+        sandbox = Sandbox(ResourceLimits())
+        self.assertEqual(sandbox.violation(-signal.SIGXCPU, ""), "cpu_time")
+        self.assertEqual(sandbox.violation(-signal.SIGXFSZ, ""), "file_size")
+        self.assertEqual(sandbox.violation(-signal.SIGKILL, ""), "killed")
+        self.assertEqual(sandbox.violation(1, "Traceback...\nMemoryError\n"), "address_space")
+        self.assertIsNone(sandbox.violation(1, "syntax error"))
+        self.assertIsNone(sandbox.violation(0, ""))
+        self.assertEqual(sandbox.stats["cpu_time"], 1)
+    
+    def test_limit_breach_becomes_tool_error(self):
+        executor = TaskExecutor(repo_cache=Mock(), warm_analyzers=False)
+        with patch.object(executor, "_stream_tool", side_effect=ResourceLimitExceeded("cpu_time", "flake8")):
+            result = executor._run_flake8(self.work_dir, ["main.py"])
+        
+        self.assertEqual(result["resource_limit"], "cpu_time")
+        self.assertIn("CPU time limit exceeded", result["error"])
+
+
+class TestRepoCache(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir = make_git_fixture({"main.py": "print('hello')\n"})
+        self.cache_dir = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+        for path in (self.repo_dir, self.cache_dir, self.work_dir):
+            self.addCleanup(shutil.rmtree, path, True)
+        self.code_url = f"file://{self.repo_dir}"
+        self.cache = RepoCache(self.cache_dir)
+    
+    def test_second_checkout_fetches_from_mirror(self):
+        first = self.cache.checkout(self.code_url, os.path.join(self.work_dir, "a"))
+        
+        with open(os.path.join(self.repo_dir, "extra.py"), 'w') as f:
+            f.write("x = 1\n")
+        commit_git_fixture(self.repo_dir, "second")
+        second = self.cache.checkout(self.code_url, os.path.join(self.work_dir, "b"))
+        
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertTrue(os.path.exists(os.path.join(first, "main.py")))
+        self.assertTrue(os.path.exists(os.path.join(second, "extra.py")))
+    
+    def test_checkout_updates_existing_working_copy(self):
+        target = os.path.join(self.work_dir, "a")
+        self.cache.checkout(self.code_url, target)
+        with open(os.path.join(target, "scratch.txt"), 'w') as f:
+            f.write("left over\n")
+        
+        with open(os.path.join(self.repo_dir, "extra.py"), 'w') as f:
+            f.write("x = 1\n")
+        commit_git_fixture(self.repo_dir, "second")
+        self.cache.checkout(self.code_url, target)
+        
+        self.assertTrue(os.path.exists(os.path.join(target, "extra.py")))
+        self.assertFalse(os.path.exists(os.path.join(target, "scratch.txt")))
+    
+    def test_evicts_least_recently_used_mirror(self):
+        other_dir = make_git_fixture({"other.py": "y = 2\n"})
+        self.addCleanup(shutil.rmtree, other_dir, True)
+        
+        self.cache.checkout(self.code_url, os.path.join(self.work_dir, "a"))
+        self.cache.max_bytes = self.cache.disk_usage()
+        self.cache.checkout(f"file://{other_dir}", os.path.join(self.work_dir, "b"))
+        
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertFalse(os.path.exists(self.cache.mirror_path(self.code_url)))
+        self.assertEqual(self.cache.cached_repos(), 1)
+    
+    def test_mirror_in_use_is_not_evicted(self):
+        other_dir = make_git_fixture({"other.py": "y = 2\n"})
+        self.addCleanup(shutil.rmtree, other_dir, True)
+        target = os.path.join(self.work_dir, "a")
+        
+        with self.cache.in_use(self.code_url):
+            self.cache.checkout(self.code_url, target)
+            self.cache.max_bytes = self.cache.disk_usage()
+            self.cache.checkout(f"file://{other_dir}", os.path.join(self.work_dir, "b"))
+            
+            self.assertEqual(self.cache.stats["evictions"], 0)
+            subprocess.run(['git', 'log', '-1'], cwd=target, check=True, capture_output=True)
+        
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(self.cache.mirror_path(self.code_url)))
+    
+    def test_task_executor_uses_cache_for_file_urls(self):
+        executor = TaskExecutor(repo_cache=self.cache)
+        
+        result = executor.execute_analysis("task-1", self.code_url, "none")
+        
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual(result["language"], "python")
+        self.assertEqual(self.cache.stats["misses"], 1)
+    
+    def test_incremental_analysis_reanalyzes_only_changed_files(self):
+        with open(os.path.join(self.repo_dir, "other.py"), 'w') as f:
+            f.write("import os\n")
+        commit_git_fixture(self.repo_dir, "add other")
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, True)
+        executor = TaskExecutor(repo_cache=self.cache,
+                                analysis_state=AnalysisStateStore(state_dir),
+                                findings_cache=FindingsCache(os.path.join(state_dir, "findings")))
+        flake8 = Mock(wraps=executor._run_flake8)
+        executor.supported_languages["python"]["analyzers"]["flake8"] = flake8
+        
+        first = executor.execute_analysis("task-1", self.code_url, "flake8")
+        self.assertFalse(first["results"]["flake8"]["incremental"])
+        self.assertEqual(first["results"]["flake8"]["issue_count"], 1)  # unused import
+        
+        with open(os.path.join(self.repo_dir, "main.py"), 'w') as f:
+            f.write("import sys\nimport json\n")
+        commit_git_fixture(self.repo_dir, "change main")
+        second = executor.execute_analysis("task-2", self.code_url, "flake8")
+        
+        self.assertEqual(flake8.call_args.args[1], ["main.py"])
+        self.assertTrue(second["results"]["flake8"]["incremental"])
+        self.assertEqual(second["results"]["flake8"]["files_analyzed"], 1)
+        self.assertEqual(second["results"]["flake8"]["issue_count"], 3)
+        self.assertNotEqual(first["commit_id"], second["commit_id"])
+    
+    def test_config_change_forces_full_analysis(self):
+        with open(os.path.join(self.repo_dir, "main.py"), 'w') as f:
+            f.write("x = '" + "a" * 100 + "'\n")
+        with open(os.path.join(self.repo_dir, "other.py"), 'w') as f:
+            f.write("y = 1\n")
+        commit_git_fixture(self.repo_dir, "long line")
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, True)
+        executor = TaskExecutor(repo_cache=self.cache,
+                                analysis_state=AnalysisStateStore(state_dir),
+                                findings_cache=FindingsCache(os.path.join(state_dir, "findings")))
+        
+        first = executor.execute_analysis("task-1", self.code_url, "flake8")
+        self.assertEqual(first["results"]["flake8"]["issue_count"], 1)  # E501
+        
+        with open(os.path.join(self.repo_dir, "setup.cfg"), 'w') as f:
+            f.write("[flake8]\nmax-line-length = 200\n")
+        with open(os.path.join(self.repo_dir, "other.py"), 'w') as f:
+            f.write("y = 2\n")
+        commit_git_fixture(self.repo_dir, "relax line length")
+        second = executor.execute_analysis("task-2", self.code_url, "flake8")
+        
+        self.assertFalse(second["results"]["flake8"]["incremental"])
+        self.assertEqual(second["results"]["flake8"]["issue_count"], 0)
+        
+        with patch.object(executor, "_tool_version", return_value="0.0-upgraded"):
+            third = executor.execute_analysis("task-3", self.code_url, "flake8")
+        self.assertFalse(third["results"]["flake8"]["incremental"])
+    
+    def test_findings_cache_skips_unchanged_files_across_repositories(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        findings_cache = FindingsCache(os.path.join(work_dir, "findings"))
+        executor = TaskExecutor(repo_cache=self.cache,
+                                analysis_state=AnalysisStateStore(os.path.join(work_dir, "state")),
+                                findings_cache=findings_cache)
+        flake8 = Mock(wraps=executor._run_flake8)
+        executor.supported_languages["python"]["analyzers"]["flake8"] = flake8
+        fork_dir = make_git_fixture({"main.py": "print('hello')\n", "new.py": "import os\n"})
+        self.addCleanup(shutil.rmtree, fork_dir, True)
+        
+        executor.execute_analysis("task-1", self.code_url, "flake8")
+        fork = executor.execute_analysis("task-2", f"file://{fork_dir}", "flake8")
+        
+        # Same main.py content in both repositories; only new.py is linted
+        self.assertEqual(flake8.call_args.args[1], ["new.py"])
+        self.assertEqual(fork["results"]["flake8"]["cache_hits"], 1)
+        self.assertEqual(fork["results"]["flake8"]["issue_count"], 1)
+        self.assertAlmostEqual(findings_cache.get_stats()["hit_rate"], 1 / 3, places=3)
+        self.assertEqual(fork["findings_cache"], {"hits": 1, "misses": 1, "evictions": 0})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,308 @@
+"""
+Long-lived analyzer processes for the worker's warm-analyzer mode.
+
+A cold analyzer run starts a fresh interpreter and imports pylint, flake8
+or mypy before it looks at a single file. In warm mode each analysis
+process instead keeps:
+
+* one ``LintServer`` per tool: a child process that has already imported
+  pylint or flake8 and runs jobs sent over a pipe, in process;
+* ``dmypy`` daemons, one per repository working copy, which also keep
+  mypy's incremental state between tasks.
+
+Servers answer a ping before every job and are restarted when they die,
+time out or have served ``max_jobs`` jobs, so leaks in the analyzers
+cannot accumulate.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from typing import List, Optional
+
+from . import sandbox
+from .sandbox import ResourceLimits
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_JOBS = 200
+HEALTH_CHECK_TIMEOUT = 5
+# dmypy daemons shut themselves down after this long without a request
+DMYPY_IDLE_TIMEOUT = 1800
+
+_MP = multiprocessing.get_context("spawn")
+
+
+def _run_pylint_in_process(args: List[str]) -> int:
+    from astroid import MANAGER
+    from pylint.lint import Run
+
+    # Module ASTs from the previous job may belong to another checkout
+    MANAGER.clear_cache()
+    run = Run(args, exit=False)
+    return run.linter.msg_status
+
+
+def _run_flake8_in_process(args: List[str]) -> int:
+    from flake8.main.application import Application
+
+    app = Application()
+    # Stay on this process; the worker's CPU budget already covers it
+    app.run(["--jobs=1", *args])
+    return app.exit_code()
+
+
+_IN_PROCESS_RUNNERS = {
+    "pylint": _run_pylint_in_process,
+    "flake8": _run_flake8_in_process,
+}
+
+
+def _serve(tool: str, conn, limits: Optional[ResourceLimits] = None):
+    """LintServer child: import the analyzer once, then run jobs until told to stop"""
+    if limits:
+        # CPU time would add up across jobs; job timeouts bound it instead
+        limits.apply(cpu=False)
+    if tool == "pylint":
+        import pylint.lint  # noqa: F401
+    else:
+        import flake8.main.application  # noqa: F401
+    runner = _IN_PROCESS_RUNNERS[tool]
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        if job == "ping":
+            conn.send("pong")
+            continue
+
+        # Output goes straight to the job's file rather than into memory;
+        # flake8 writes bytes to sys.stdout.buffer, pylint text to sys.stdout
+        with open(job["output"], "wb") as raw:
+            out = io.TextIOWrapper(raw, encoding="utf-8", write_through=True)
+            try:
+                os.chdir(job["cwd"])
+                with redirect_stdout(out):
+                    returncode = runner(job["args"])
+                stderr = ""
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else 1
+                stderr = ""
+            except Exception as e:
+                returncode, stderr = 1, f"{type(e).__name__}: {e}"
+            out.flush()
+            out.detach()
+        conn.send({"stderr": stderr, "returncode": returncode})
+
+
+class LintServer:
+    """Pre-imported pylint or flake8 in a child process, fed jobs over a pipe"""
+
+    def __init__(self, tool: str, max_jobs: int = DEFAULT_MAX_JOBS,
+                 limits: Optional[ResourceLimits] = None):
+        if tool not in _IN_PROCESS_RUNNERS:
+            raise ValueError(f"No warm server for {tool}")
+        self.tool = tool
+        self.max_jobs = max_jobs
+        self.limits = limits
+        self.stats = {"jobs": 0, "restarts": 0, "recycled": 0}
+        self._process = None
+        self._conn = None
+        self._jobs_since_start = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        parent_conn, child_conn = _MP.Pipe()
+        self._process = _MP.Process(target=_serve, args=(self.tool, child_conn, self.limits), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._jobs_since_start = 0
+
+    def _kill(self):
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            self._process.join()
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def _healthy(self) -> bool:
+        if self._process is None or not self._process.is_alive():
+            return False
+        try:
+            self._conn.send("ping")
+            return self._conn.poll(HEALTH_CHECK_TIMEOUT) and self._conn.recv() == "pong"
+        except (OSError, EOFError):
+            return False
+
+    def _ensure_ready(self):
+        if self._process is not None and self._jobs_since_start >= self.max_jobs:
+            self.stop_locked()
+            self.stats["recycled"] += 1
+        if not self._healthy():
+            if self._process is not None:
+                logger.warning(f"Warm {self.tool} server failed its health check; restarting")
+                self.stats["restarts"] += 1
+            self._kill()
+            self._start()
+
+    def run(self, args: List[str], cwd: str, timeout: float,
+            output: str) -> subprocess.CompletedProcess:
+        """Run one job, writing its stdout to ``output``; times out like ``subprocess.run``"""
+        with self._lock:
+            self._ensure_ready()
+            self._jobs_since_start += 1
+            self.stats["jobs"] += 1
+            try:
+                self._conn.send({"cwd": cwd, "args": args, "output": output})
+                if not self._conn.poll(timeout):
+                    self._kill()
+                    raise subprocess.TimeoutExpired([self.tool, *args], timeout)
+                reply = self._conn.recv()
+            except (OSError, EOFError):
+                self._kill()
+                raise RuntimeError(f"Warm {self.tool} server died during analysis")
+        return subprocess.CompletedProcess(
+            [self.tool, *args], reply["returncode"], None, reply["stderr"]
+        )
+
+    def stop_locked(self):
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+                self._process.join(HEALTH_CHECK_TIMEOUT)
+            except OSError:
+                pass
+        self._kill()
+
+    def stop(self):
+        with self._lock:
+            self.stop_locked()
+
+
+class MypyDaemons:
+    """dmypy daemons keyed by working directory, at most ``max_daemons`` at once.
+
+    dmypy resolves files against the directory it was started in, so each
+    repository needs a stable working copy and its own daemon.
+    """
+
+    def __init__(self, status_dir: str, max_daemons: int = 2,
+                 max_jobs: int = DEFAULT_MAX_JOBS,
+                 limits: Optional[ResourceLimits] = None):
+        self.status_dir = status_dir
+        self.max_daemons = max_daemons
+        self.max_jobs = max_jobs
+        # Inherited by the daemons dmypy starts, minus CPU time as for LintServer
+        self.limits = limits
+        self.stats = {"jobs": 0, "restarts": 0, "recycled": 0}
+        self._jobs = OrderedDict()  # working directory -> jobs since start
+        self._lock = threading.Lock()
+        os.makedirs(status_dir, exist_ok=True)
+
+    def _status_file(self, cwd: str) -> str:
+        key = hashlib.sha256(cwd.encode()).hexdigest()[:24]
+        return os.path.join(self.status_dir, f"{key}.json")
+
+    def _dmypy(self, cwd: str, *args: str, timeout: float = HEALTH_CHECK_TIMEOUT,
+               stdout=subprocess.PIPE):
+        return sandbox.run(
+            ["dmypy", "--status-file", self._status_file(cwd), *args],
+            self.limits, timeout, cpu=False,
+            cwd=cwd, stdout=stdout, stderr=subprocess.PIPE, text=True
+        )
+
+    def _stop_daemon(self, cwd: str):
+        try:
+            self._dmypy(cwd, "stop")
+        except (OSError, subprocess.TimeoutExpired):
+            try:
+                self._dmypy(cwd, "kill")
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self._jobs.pop(cwd, None)
+
+    def healthy(self, cwd: str) -> bool:
+        try:
+            return self._dmypy(cwd, "status").returncode == 0
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+    def run(self, args: List[str], cwd: str, timeout: float,
+            output: str) -> subprocess.CompletedProcess:
+        with self._lock:
+            if cwd in self._jobs:
+                self._jobs.move_to_end(cwd)
+                if self._jobs[cwd] >= self.max_jobs:
+                    self._stop_daemon(cwd)
+                    self.stats["recycled"] += 1
+                elif not self.healthy(cwd):
+                    self._stop_daemon(cwd)
+                    self.stats["restarts"] += 1
+            while len(self._jobs) >= self.max_daemons and cwd not in self._jobs:
+                self._stop_daemon(next(iter(self._jobs)))
+            self._jobs[cwd] = self._jobs.get(cwd, 0) + 1
+            self.stats["jobs"] += 1
+
+        # The client's own "Daemon started" lines end up in the output too;
+        # mypy output is filtered by file path, so they are skipped there
+        try:
+            with open(output, "w") as stdout:
+                return self._dmypy(cwd, "run", "--timeout", str(DMYPY_IDLE_TIMEOUT), "--",
+                                   *args, timeout=timeout, stdout=stdout)
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                self._stop_daemon(cwd)
+            raise
+
+    def forget(self, cwd: str):
+        with self._lock:
+            if cwd in self._jobs:
+                self._stop_daemon(cwd)
+
+    def stop(self):
+        with self._lock:
+            for cwd in list(self._jobs):
+                self._stop_daemon(cwd)
+
+
+class WarmAnalyzers:
+    """Entry point used by TaskExecutor; routes tool runs to the warm processes"""
+
+    def __init__(self, state_dir: str, max_jobs: int = DEFAULT_MAX_JOBS,
+                 limits: Optional[ResourceLimits] = None):
+        self.lint_servers = {
+            tool: LintServer(tool, max_jobs=max_jobs, limits=limits) for tool in _IN_PROCESS_RUNNERS
+        }
+        self.mypy = MypyDaemons(os.path.join(state_dir, "dmypy"), max_jobs=max_jobs, limits=limits)
+
+    def supports(self, tool: str) -> bool:
+        return tool in self.lint_servers or tool == "mypy"
+
+    def run(self, tool: str, args: List[str], cwd: str, timeout: float,
+            output: str) -> subprocess.CompletedProcess:
+        """Run ``tool`` on a warm process; its stdout is written to the file ``output``"""
+        if tool == "mypy":
+            return self.mypy.run(args, cwd, timeout, output)
+        return self.lint_servers[tool].run(args, cwd, timeout, output)
+
+    def get_stats(self):
+        stats = {tool: dict(server.stats) for tool, server in self.lint_servers.items()}
+        stats["mypy"] = dict(self.mypy.stats)
+        return stats
+
+    def stop(self):
+        for server in self.lint_servers.values():
+            server.stop()
+        self.mypy.stop()
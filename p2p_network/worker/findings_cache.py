@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+# Counters kept by each FindingsCache and summed across analysis processes
+STAT_KEYS = ("hits", "misses", "evictions")
+
+# Repository files whose contents change what each analyzer reports
+CONFIG_FILES = {
+    "pylint": (".pylintrc", "pylintrc", "pyproject.toml", "setup.cfg", "tox.ini"),
+    "flake8": (".flake8", "setup.cfg", "tox.ini"),
+    "mypy": ("mypy.ini", ".mypy.ini", "pyproject.toml", "setup.cfg"),
+}
+
+
+def hit_rate(stats: Dict[str, int]) -> float:
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    return stats.get("hits", 0) / lookups if lookups else 0.0
+
+
+def blob_hashes(code_path: str, files: List[str]) -> Dict[str, str]:
+    """Git blob ids of ``files``, from the index where possible"""
+    hashes = {}
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-s", "-z"],
+            cwd=code_path, check=True, capture_output=True
+        )
+        # Decoded like os.listdir decodes names, so non-UTF-8 paths match list_files
+        for entry in result.stdout.decode(errors="surrogateescape").split("\0"):
+            if entry:
+                meta, path = entry.split("\t", 1)
+                hashes[path] = meta.split()[1]
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    missing = [path for path in files if path not in hashes]
+    for path in missing:
+        # Same id git would assign, for files outside the index
+        with open(os.path.join(code_path, path), "rb") as f:
+            data = f.read()
+        hashes[path] = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    return {path: hashes[path] for path in files}
+
+
+def config_hash(code_path: str, tool: str, args: List[str]) -> str:
+    digest = hashlib.sha256(json.dumps(args).encode())
+    for name in CONFIG_FILES.get(tool, ()):
+        path = os.path.join(code_path, name)
+        if os.path.isfile(path):
+            digest.update(name.encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class FindingsCache:
+    """On-disk cache of one analyzer's findings for one file.
+
+    Entries are keyed by (blob hash, tool, tool version, config hash), so a
+    file is only re-analyzed when its content, the analyzer or its
+    configuration changes. Entries are small JSON files shared by every
+    analysis process on the worker; once the cache grows past
+    ``max_bytes`` the least recently used ones are removed.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {key: 0 for key in STAT_KEYS}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Estimate only; other processes write here too, so eviction rescans
+        self._approx_bytes = self.disk_usage()
+
+    @staticmethod
+    def key(blob_hash: str, tool: str, version: str, config: str) -> str:
+        return hashlib.sha256(f"{blob_hash}\0{tool}\0{version}\0{config}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                findings = json.load(f)
+            # mtime doubles as the LRU timestamp
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return findings
+
+    def put(self, key: str, findings: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(findings, f)
+            size = f.tell()
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._approx_bytes += size
+            over_budget = self._approx_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self) -> int:
+        """Remove least recently used entries down to 90% of the budget"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        evicted = 0
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._approx_bytes = total
+            self.stats["evictions"] += evicted
+        if evicted:
+            logger.info(f"Evicted {evicted} cached findings")
+        return evicted
+
+    def disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def hit_rate(self) -> float:
+        return hit_rate(self.counters())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, hit_rate=round(self.hit_rate(), 4), size_bytes=self._approx_bytes)
+
+
+def default_findings_cache() -> FindingsCache:
+    cache_dir = os.environ.get("WORKER_FINDINGS_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "p2p_findings_cache"
+    )
+    max_bytes = int(os.environ.get("WORKER_FINDINGS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    return FindingsCache(cache_dir, max_bytes=max_bytes)
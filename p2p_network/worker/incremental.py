@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..common.findings import MAX_ISSUES, TopIssues, merge_severity
+
+logger = logging.getLogger(__name__)
+
+_IMPORT_RE = re.compile(
+    r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+(?:\(([^)]*)\)|([\w \t,]+))"
+    r"|import\s+([\w.]+(?:\s*,\s*[\w.]+)*))",
+    re.M
+)
+
+
+class AnalysisStateStore:
+    """Last analyzed commit and per-file findings for each (repository, analyzer).
+
+    The analyzer version and configuration hash are saved alongside, since
+    findings for unchanged files are only valid while both stay the same.
+    State files are replaced atomically, so concurrent tasks on the same
+    repository can at worst redo each other's work, never corrupt it.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, code_url: str, tool: str) -> str:
+        key = hashlib.sha256(code_url.encode()).hexdigest()[:24]
+        return os.path.join(self.root, key, f"{tool}.json")
+
+    def load(self, code_url: str, tool: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(code_url, tool)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, code_url: str, tool: str, commit: str, files: Dict[str, Any],
+             version: Optional[str] = None, config: Optional[str] = None):
+        path = self._path(code_url, tool)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump({"commit": commit, "version": version, "config": config, "files": files}, f)
+        os.replace(tmp_path, path)
+
+
+def default_analysis_state() -> AnalysisStateStore:
+    return AnalysisStateStore(
+        os.environ.get("WORKER_ANALYSIS_STATE_DIR")
+        or os.path.join(tempfile.gettempdir(), "p2p_analysis_state")
+    )
+
+
+def head_commit(code_path: str) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=code_path, check=True, capture_output=True, text=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def changed_files(code_path: str, old_commit: str,
+                  new_commit: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Files modified/added and files deleted between two commits, or None if unknown"""
+    try:
+        result = subprocess.run(
+            ["git", "diff", "--name-status", "--no-renames", "-z", old_commit, new_commit],
+            cwd=code_path, check=True, capture_output=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    fields = result.stdout.decode().split("\0")
+    modified, deleted = set(), set()
+    for status, path in zip(fields[0::2], fields[1::2]):
+        (deleted if status == "D" else modified).add(path)
+    return modified, deleted
+
+
+def list_files(code_path: str, extensions: Iterable[str]) -> List[str]:
+    """Repository-relative paths of source files, skipping hidden directories"""
+    extensions = tuple(extensions)
+    found = []
+    for root, dirs, files in os.walk(code_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if name.endswith(extensions):
+                found.append(os.path.relpath(os.path.join(root, name), code_path))
+    return found
+
+
+def _module_name(path: str) -> str:
+    module = path[:-3] if path.endswith(".py") else path
+    module = module.replace(os.sep, ".")
+    return module[:-len(".__init__")] if module.endswith(".__init__") else module
+
+
+def _resolve_relative(path: str, module: str) -> Optional[str]:
+    """Absolute dotted name of ``module`` as imported from ``path``; None above the root"""
+    level = len(module) - len(module.lstrip("."))
+    if not level:
+        return module
+    package = _module_name(path).split(".")
+    if not path.endswith("__init__.py"):
+        package = package[:-1]
+    if level - 1 > len(package):
+        return None
+    base = package[:len(package) - (level - 1)]
+    return ".".join(base + [module[level:]] if module[level:] else base)
+
+
+def _imports(code_path: str, path: str) -> Set[str]:
+    """Absolute dotted names ``path`` imports, with relative imports resolved.
+
+    ``from a import b`` yields both ``a`` and ``a.b``, since ``b`` may be a
+    submodule.
+    """
+    try:
+        with open(os.path.join(code_path, path), errors="replace") as f:
+            source = f.read()
+    except OSError:
+        return set()
+    modules = set()
+    for from_module, grouped_names, names, import_list in _IMPORT_RE.findall(source):
+        if import_list:
+            modules.update(name.strip() for name in import_list.split(","))
+            continue
+        base = _resolve_relative(path, from_module)
+        if base is None:
+            continue
+        if base:
+            modules.add(base)
+        for name in (grouped_names or names).split(","):
+            name = name.split()[0] if name.split() else ""
+            if name and name != "*":
+                modules.add(f"{base}.{name}" if base else name)
+    return modules
+
+
+def python_dependents(code_path: str, changed: Set[str], all_files: List[str]) -> Set[str]:
+    """Files that import a changed module, directly or transitively.
+
+    Imports are matched by dotted name against repository-relative module
+    paths, which is approximate but errs towards re-checking more files.
+    """
+    imports = {path: _imports(code_path, path) for path in all_files}
+    dirty = {_module_name(path) for path in changed if path.endswith(".py")}
+    dependents: Set[str] = set()
+
+    while dirty:
+        next_dirty = set()
+        for path, modules in imports.items():
+            if path in dependents or path in changed:
+                continue
+            if any(
+                imported == module or imported.startswith(module + ".")
+                or module.startswith(imported + ".") or module.endswith("." + imported)
+                for imported in modules for module in dirty
+            ):
+                dependents.add(path)
+                next_dirty.add(_module_name(path))
+        dirty = next_dirty
+
+    return dependents
+
+
+def merge_findings(previous: Dict[str, Any], fresh: Dict[str, Any],
+                   analyzed: Iterable[str], deleted: Iterable[str]) -> Dict[str, Any]:
+    """Cached findings with re-analyzed files replaced and deleted files dropped"""
+    merged = dict(previous)
+    for path in list(analyzed) + list(deleted):
+        merged.pop(path, None)
+    merged.update(fresh)
+    return merged
+
+
+def summarize(tool: str, file_findings: Dict[str, Any]) -> Dict[str, Any]:
+    top = TopIssues(MAX_ISSUES)
+    for path in sorted(file_findings):
+        for issue in file_findings[path]["issues"]:
+            top.add(issue)
+    return {
+        "tool": tool,
+        "issue_count": sum(findings["count"] for findings in file_findings.values()),
+        "severity_counts": merge_severity(file_findings.values()),
+        "issues": top.items()
+    }
@@ -0,0 +1,136 @@
+"""
+Streaming parsers for analyzer output.
+
+Analyzer output is consumed from the pipe as it is produced and folded
+into an ``IssueCollector``: every issue is counted and tallied by
+severity, but only a bounded number of issues per file (the most severe,
+earliest first) are kept. Memory use depends on the number of files, not
+on the size of the output.
+"""
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from ..common.findings import MAX_ISSUES, TopIssues, severity_of
+
+CHUNK_SIZE = 1 << 16
+
+# flake8 code prefixes: pyflakes (F) and pycodestyle errors (E) are errors
+FLAKE8_SEVERITY = {"F": "error", "E": "error", "W": "warning", "C": "convention"}
+
+
+class IssueCollector:
+    """Counts, severity histogram and top issues, overall and per file"""
+
+    def __init__(self, limit: int = MAX_ISSUES):
+        self.limit = limit
+        self.issue_count = 0
+        self.severity = Counter()
+        self._files: Dict[str, Tuple[Counter, TopIssues]] = {}
+
+    def add(self, path: str, issue: Dict[str, Any]):
+        path = os.path.normpath(path)
+        severity = severity_of(issue)
+        self.issue_count += 1
+        self.severity[severity] += 1
+        if path not in self._files:
+            self._files[path] = (Counter(), TopIssues(self.limit))
+        file_severity, top = self._files[path]
+        file_severity[severity] += 1
+        top.add(issue)
+
+    def file_findings(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            path: {
+                "count": sum(file_severity.values()),
+                "severity": dict(file_severity),
+                "issues": top.items()
+            }
+            for path, (file_severity, top) in self._files.items()
+        }
+
+    def result(self, tool: str) -> Dict[str, Any]:
+        top = TopIssues(self.limit)
+        for _, file_top in self._files.values():
+            for issue in file_top.items():
+                top.add(issue)
+        return {
+            "tool": tool,
+            "issue_count": self.issue_count,
+            "severity_counts": dict(self.severity),
+            "issues": top.items(),
+            "file_findings": self.file_findings()
+        }
+
+
+def iter_json_array(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the elements of a JSON array one at a time as the text arrives"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and the array punctuation between elements
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in ",["):
+            if buffer[pos] == "[":
+                started = True
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos < len(buffer) and started:
+            try:
+                element, pos = decoder.raw_decode(buffer, pos)
+                yield element
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif pos < len(buffer):
+            raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+        if eof:
+            if not started:
+                return
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+
+        buffer = buffer[pos:]
+        pos = 0
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+
+def parse_pylint(stream: TextIO, collector: IssueCollector):
+    for issue in iter_json_array(stream):
+        collector.add(issue.get("path", ""), issue)
+
+
+def parse_flake8(stream: TextIO, collector: IssueCollector):
+    for line in stream:
+        parts = line.rstrip("\n").split(':')
+        if len(parts) < 4:
+            continue
+        message = ':'.join(parts[3:])
+        code = message.strip()[:1]
+        collector.add(parts[0], {
+            "file": parts[0],
+            "line": parts[1],
+            "column": parts[2],
+            "message": message,
+            "severity": FLAKE8_SEVERITY.get(code, "warning")
+        })
+
+
+def parse_mypy(stream: TextIO, collector: IssueCollector, requested: Optional[Set[str]] = None):
+    """mypy lines are ``path:line: severity: message``; other files' lines are skipped"""
+    for line in stream:
+        line = line.rstrip("\n")
+        path, sep, rest = line.partition(':')
+        if not sep or (requested is not None and path not in requested):
+            continue
+        severity = "note" if ": note:" in rest else "error"
+        collector.add(path, {"message": line, "severity": severity})
@@ -0,0 +1,89 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from ..common.message_formats import TaskAssignment
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchBuffer:
+    """Leased tasks fetched ahead of free slots, so one can start as soon as another finishes.
+
+    The buffer is sized to cover a round trip to the supernode at the rate
+    tasks complete: ``limit * rtt / task_duration``, at least one task.
+    Every buffered task holds a lease; the supernode hands it to another
+    worker if it isn't started before the lease runs out, so expired tasks
+    are dropped here rather than started.
+    """
+
+    def __init__(self, max_depth: int = 8, min_lease: float = 60.0, smoothing: float = 0.3):
+        self.max_depth = max_depth
+        self.min_lease = min_lease
+        self.smoothing = smoothing
+        self.avg_task_duration: Optional[float] = None
+        self.avg_rtt: Optional[float] = None
+        # (task, local time its lease runs out)
+        self._tasks: Deque[Tuple[TaskAssignment, float]] = deque()
+        self._lock = threading.Lock()
+
+    def _average(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else self.smoothing * value + (1 - self.smoothing) * previous
+
+    def record_task_duration(self, seconds: float):
+        with self._lock:
+            self.avg_task_duration = self._average(self.avg_task_duration, seconds)
+
+    def record_rtt(self, seconds: float):
+        with self._lock:
+            self.avg_rtt = self._average(self.avg_rtt, seconds)
+
+    def depth(self, concurrency: int) -> int:
+        with self._lock:
+            if not self.avg_task_duration or self.avg_rtt is None:
+                return 1
+            wanted = math.ceil(concurrency * self.avg_rtt / self.avg_task_duration)
+        return max(1, min(self.max_depth, wanted))
+
+    def lease_seconds(self, concurrency: int) -> float:
+        """Lease to request: a few times the expected wait of the last buffered task"""
+        depth = self.depth(concurrency)
+        with self._lock:
+            duration = self.avg_task_duration or 0.0
+        expected_wait = duration * (1 + depth / max(concurrency, 1))
+        return round(max(self.min_lease, 3 * expected_wait), 1)
+
+    def add(self, tasks: List[TaskAssignment], lease_seconds: float):
+        now = time.time()
+        with self._lock:
+            for task in tasks:
+                # The supernode may grant a shorter lease than requested
+                self._tasks.append((task, now + (task.lease_seconds or lease_seconds)))
+
+    def pop(self) -> Optional[TaskAssignment]:
+        """The next task whose lease hasn't run out, or None"""
+        now = time.time()
+        with self._lock:
+            while self._tasks:
+                task, expires = self._tasks.popleft()
+                if expires > now:
+                    return task
+                logger.warning(f"Lease on prefetched task {task.task_id} expired before it started")
+        return None
+
+    def drain(self) -> List[TaskAssignment]:
+        with self._lock:
+            tasks = [task for task, _ in self._tasks]
+            self._tasks.clear()
+        return tasks
+
+    def task_ids(self) -> List[str]:
+        with self._lock:
+            return [task.task_id for task, _ in self._tasks]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
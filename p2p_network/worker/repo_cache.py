@@ -0,0 +1,239 @@
+import fcntl
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from ..common.message_formats import repo_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RepoCache:
+    """Local cache of bare mirror repositories keyed by URL.
+
+    The first task for a repository makes a bare clone tracking its
+    branches; later tasks only ``fetch`` what changed. Each task gets a ``--shared`` clone of the
+    mirror, which borrows the mirror's objects instead of copying them.
+    Access to a mirror is serialized by a per-repository file lock, so
+    tasks in different worker processes can share the cache safely.
+    Least recently used mirrors are evicted once the cache exceeds
+    ``max_bytes``, except those a task holds ``in_use`` because its
+    working copy still reads objects from them.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 git_timeout: int = 300):
+        self.cache_dir = cache_dir
+        self.mirrors_dir = os.path.join(cache_dir, "mirrors")
+        self.locks_dir = os.path.join(cache_dir, "locks")
+        self.max_bytes = max_bytes
+        self.git_timeout = git_timeout
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_guard = threading.Lock()
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+
+    @staticmethod
+    def repo_key(code_url: str) -> str:
+        return repo_key(code_url)
+
+    def mirror_path(self, code_url: str) -> str:
+        return os.path.join(self.mirrors_dir, f"{self.repo_key(code_url)}.git")
+
+    @contextmanager
+    def repo_lock(self, key: str, blocking: bool = True):
+        """Exclusive lock on one mirror across threads and processes; yields False if not acquired"""
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(key, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            with open(os.path.join(self.locks_dir, f"{key}.lock"), "w") as lock_file:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                try:
+                    fcntl.flock(lock_file, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    @contextmanager
+    def in_use(self, code_url: str):
+        """Shared lock keeping ``code_url``'s mirror from eviction while a checkout of it is used"""
+        key = self.repo_key(code_url)
+        with open(os.path.join(self.locks_dir, f"{key}.use"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _unused(self, key: str):
+        """Exclusive counterpart of ``in_use``; yields False while any task holds it"""
+        with open(os.path.join(self.locks_dir, f"{key}.use"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _git(self, *args: str, cwd: Optional[str] = None):
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        subprocess.run(
+            ["git", *args],
+            check=True,
+            capture_output=True,
+            cwd=cwd,
+            env=env,
+            timeout=self.git_timeout
+        )
+
+    def checkout(self, code_url: str, target_dir: str) -> str:
+        """Create a working copy of ``code_url`` at ``target_dir`` via the mirror cache.
+
+        An existing working copy at ``target_dir`` is updated in place.
+        """
+        mirror = self.mirror_path(code_url)
+
+        with self.repo_lock(self.repo_key(code_url)):
+            if os.path.isdir(mirror):
+                self._git("--git-dir", mirror, "fetch", "--prune", "--quiet", "origin")
+                self.stats["hits"] += 1
+            else:
+                partial = f"{mirror}.partial"
+                shutil.rmtree(partial, ignore_errors=True)
+                self._git("clone", "--bare", "--quiet", code_url, partial)
+                # Branches only; a full --mirror would also pull e.g. GitHub PR refs
+                self._git("--git-dir", partial, "config", "remote.origin.fetch",
+                          "+refs/heads/*:refs/heads/*")
+                os.replace(partial, mirror)
+                self.stats["misses"] += 1
+
+            if not self._update_working_copy(target_dir):
+                self._git("clone", "--shared", "--quiet", mirror, target_dir)
+            # Directory mtime doubles as the LRU timestamp
+            os.utime(mirror)
+            self._record_size(mirror)
+
+        self.evict(keep=mirror)
+        return target_dir
+
+    def _update_working_copy(self, target_dir: str) -> bool:
+        """Move an earlier checkout to the mirror's HEAD; False if there is none to reuse"""
+        if not os.path.isdir(os.path.join(target_dir, ".git")):
+            return False
+        try:
+            self._git("fetch", "--quiet", "origin", "HEAD", cwd=target_dir)
+            self._git("reset", "--hard", "--quiet", "FETCH_HEAD", cwd=target_dir)
+            self._git("clean", "-ffdxq", cwd=target_dir)
+            return True
+        except subprocess.CalledProcessError:
+            # e.g. the mirror it borrowed objects from was evicted
+            logger.warning(f"Could not update {target_dir}; cloning it again")
+            shutil.rmtree(target_dir, ignore_errors=True)
+            return False
+
+    @staticmethod
+    def _record_size(mirror: str):
+        # Remembered next to the mirror so eviction doesn't walk every repo
+        with open(f"{mirror}.size", "w") as f:
+            f.write(str(_dir_size(mirror)))
+
+    @staticmethod
+    def _mirror_size(mirror: str) -> int:
+        try:
+            with open(f"{mirror}.size") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return _dir_size(mirror)
+
+    def _mirrors_by_age(self) -> List[Tuple[float, str]]:
+        mirrors = []
+        for name in os.listdir(self.mirrors_dir):
+            if not name.endswith(".git"):
+                continue
+            path = os.path.join(self.mirrors_dir, name)
+            try:
+                mirrors.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+        return sorted(mirrors)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used mirrors until the cache fits its budget"""
+        mirrors = self._mirrors_by_age()
+        sizes = {path: self._mirror_size(path) for _, path in mirrors}
+        total = sum(sizes.values())
+        evicted = 0
+
+        for _, path in mirrors:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            key = os.path.basename(path)[:-len(".git")]
+            # Skip mirrors another task is fetching, cloning or analyzing from right now
+            with self.repo_lock(key, blocking=False) as acquired, self._unused(key) as unused:
+                if not (acquired and unused):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                if os.path.exists(f"{path}.size"):
+                    os.remove(f"{path}.size")
+            total -= sizes[path]
+            evicted += 1
+            self.stats["evictions"] += 1
+            logger.info(f"Evicted cached mirror {path}")
+
+        return evicted
+
+    def disk_usage(self) -> int:
+        return sum(self._mirror_size(path) for _, path in self._mirrors_by_age())
+
+    def cached_repos(self) -> int:
+        return len(self._mirrors_by_age())
+
+    def cached_repo_keys(self, limit: Optional[int] = None) -> List[str]:
+        """Keys of the cached mirrors, most recently used first"""
+        keys = [os.path.basename(path)[:-len(".git")] for _, path in reversed(self._mirrors_by_age())]
+        return keys[:limit] if limit is not None else keys
+
+    def disk_free(self) -> int:
+        return shutil.disk_usage(self.cache_dir).free
+
+
+def default_repo_cache() -> RepoCache:
+    cache_dir = os.environ.get("WORKER_REPO_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "p2p_repo_cache"
+    )
+    max_bytes = int(os.environ.get("WORKER_REPO_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    return RepoCache(cache_dir, max_bytes=max_bytes)
@@ -0,0 +1,169 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResourceSample:
+    cpu_utilization: float      # busy fraction of all CPUs since the previous sample
+    memory_available: float     # MemAvailable / MemTotal
+    run_queue: float            # runnable tasks per CPU
+    cpu_count: int
+    memory_available_bytes: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ResourceMonitor:
+    """Samples CPU, memory and run-queue figures from /proc.
+
+    CPU utilization is a delta between consecutive samples, so the first
+    sample reports the average since boot. ``sample`` returns None where
+    /proc is unavailable (e.g. not Linux).
+    """
+
+    def __init__(self, proc_root: str = "/proc"):
+        self.proc_root = proc_root
+        self.cpu_count = os.cpu_count() or 1
+        self._last_cpu: Optional[Tuple[int, int]] = None
+
+    def _read(self, name: str) -> str:
+        with open(os.path.join(self.proc_root, name)) as f:
+            return f.read()
+
+    def _cpu_times(self) -> Tuple[int, int]:
+        # "cpu  user nice system idle iowait irq softirq steal guest guest_nice"
+        fields = [int(value) for value in self._read("stat").split("\n", 1)[0].split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        # guest time is already counted in user/nice
+        total = sum(fields[:8])
+        return total - idle, total
+
+    def _memory_available(self) -> Tuple[float, int]:
+        meminfo = {}
+        for line in self._read("meminfo").splitlines():
+            key, _, value = line.partition(":")
+            meminfo[key] = int(value.split()[0])
+        # Values are in kB
+        return meminfo["MemAvailable"] / meminfo["MemTotal"], meminfo["MemAvailable"] * 1024
+
+    def _run_queue(self) -> float:
+        # "0.50 0.40 0.30 3/345 6789": the fourth field is running/total tasks
+        running = int(self._read("loadavg").split()[3].split("/")[0])
+        # Don't count the sampling thread's own process
+        return max(0, running - 1) / self.cpu_count
+
+    def sample(self) -> Optional[ResourceSample]:
+        try:
+            busy, total = self._cpu_times()
+            memory_available, memory_available_bytes = self._memory_available()
+            run_queue = self._run_queue()
+        except (OSError, ValueError, KeyError, IndexError, ZeroDivisionError):
+            return None
+
+        if self._last_cpu and total > self._last_cpu[1]:
+            cpu = (busy - self._last_cpu[0]) / (total - self._last_cpu[1])
+        else:
+            cpu = busy / total if total else 0.0
+        self._last_cpu = (busy, total)
+
+        return ResourceSample(
+            cpu_utilization=round(min(1.0, max(0.0, cpu)), 4),
+            memory_available=round(memory_available, 4),
+            run_queue=round(run_queue, 4),
+            cpu_count=self.cpu_count,
+            memory_available_bytes=memory_available_bytes
+        )
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for how many tasks a worker runs at once.
+
+    While the worker is using all of its slots and the machine has CPU and
+    memory headroom, the limit grows by one per sample. As soon as CPU
+    utilization, memory or the run queue crosses its threshold, the limit
+    is cut multiplicatively. With no samples it stays where it is.
+    """
+
+    def __init__(self, initial: int, max_limit: int, min_limit: int = 1,
+                 target_cpu: float = 0.85, min_memory_available: float = 0.10,
+                 max_run_queue: float = 1.5, decrease_factor: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = min(max(initial, min_limit), self.max_limit)
+        self.target_cpu = target_cpu
+        self.min_memory_available = min_memory_available
+        self.max_run_queue = max_run_queue
+        self.decrease_factor = decrease_factor
+        self.last_sample: Optional[ResourceSample] = None
+        self._lock = threading.Lock()
+
+    def overloaded(self, sample: ResourceSample) -> bool:
+        return (
+            sample.cpu_utilization > self.target_cpu
+            or sample.memory_available < self.min_memory_available
+            or sample.run_queue > self.max_run_queue
+        )
+
+    def update(self, sample: Optional[ResourceSample], active_tasks: int) -> int:
+        with self._lock:
+            if sample is not None:
+                self.last_sample = sample
+                if self.overloaded(sample):
+                    self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+                elif active_tasks >= self.limit:
+                    self.limit = min(self.max_limit, self.limit + 1)
+            return self.limit
+
+    def load(self, active_tasks: int) -> float:
+        """Load in [0, 1] for heartbeats: the most constrained of slots, CPU and memory"""
+        with self._lock:
+            load = active_tasks / self.limit
+            sample = self.last_sample
+            if sample is not None:
+                memory_pressure = (1 - sample.memory_available) / (1 - self.min_memory_available)
+                load = max(
+                    load,
+                    sample.cpu_utilization / self.target_cpu,
+                    memory_pressure,
+                    sample.run_queue / self.max_run_queue
+                )
+            return round(min(1.0, load), 4)
+
+
+class AnalyzerThroughput:
+    """Moving average of files analyzed per second, by analyzer.
+
+    Fed with the findings of completed tasks. Files served from the
+    findings cache or the incremental state don't count, so the rate
+    reflects actual analyzer speed on this machine.
+    """
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self._rates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, findings: Dict[str, Any]):
+        for tool, result in findings.items():
+            if not isinstance(result, dict) or "error" in result:
+                continue
+            files = result.get("cache_misses", result.get("files_analyzed"))
+            duration = result.get("duration")
+            if not files or not duration:
+                continue
+            rate = files / duration
+            with self._lock:
+                previous = self._rates.get(tool)
+                self._rates[tool] = rate if previous is None else (
+                    self.smoothing * rate + (1 - self.smoothing) * previous
+                )
+
+    def rates(self) -> Dict[str, float]:
+        with self._lock:
+            return {tool: round(rate, 2) for tool, rate in self._rates.items()}
@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from ..common.message_formats import ResultSubmission
+
+logger = logging.getLogger(__name__)
+
+
+class ResultBatcher:
+    """Coalesces result submissions so tasks finishing together share one request.
+
+    The first queued result waits up to ``window`` seconds for others to
+    join it, and a batch goes out as soon as it holds ``max_batch``
+    results. Batches are handed to ``send`` on the batcher's own thread.
+    """
+
+    def __init__(self, send: Callable[[List[ResultSubmission]], None],
+                 window: float = 0.2, max_batch: int = 50):
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[ResultSubmission] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit(self, submission: ResultSubmission):
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._pending.append(submission)
+                self._cond.notify()
+        if closed:
+            # Stragglers after close go out on their own
+            self._send([submission])
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """Send everything queued now, on the calling thread"""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._send(batch)
+
+    def close(self, timeout: Optional[float] = 10):
+        """Stop the batcher thread once it has sent what was queued"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def _take_batch(self) -> List[ResultSubmission]:
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        return batch
+
+    def _send(self, batch: List[ResultSubmission]):
+        try:
+            self.send(batch)
+        except Exception as e:
+            logger.error(f"Error sending {len(batch)} results: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give results finishing right behind this one a chance to join
+                deadline = time.time() + self.window
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+            self._send(batch)
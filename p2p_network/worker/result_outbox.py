@@ -0,0 +1,141 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from ..common.message_formats import ResultSubmission
+
+logger = logging.getLogger(__name__)
+
+# Rewrite the journal once this many delivered entries have piled up in it
+COMPACT_AFTER = 256
+
+
+class ResultOutbox:
+    """Durable journal of results not yet delivered to the supernode.
+
+    Each result is appended and fsynced before it is submitted, and a
+    delivery record is appended once the supernode has answered for it.
+    Replaying the journal on start-up gives back everything undelivered, so
+    results survive both supernode outages and worker restarts. A delivery
+    record lost in a crash only means a result is sent twice, which the
+    supernode dedupes by task id.
+
+    A journal belongs to one worker at a time: an exclusive lock is held on
+    it while it is open, and opening one that another worker holds fails.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # On a separate file, since compaction replaces the journal itself
+        self._lock_file = open(f"{path}.lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(
+                f"Result outbox {path} is in use by another worker; "
+                f"give each worker on this host its own port or WORKER_OUTBOX_DIR"
+            )
+        # task_id -> (submission, time it was queued)
+        self._pending: Dict[str, Tuple[ResultSubmission, float]] = {}
+        self._delivered = 0
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(path, "a")
+        if self._file.tell() and not self._ends_with_newline():
+            # Don't let the next entry run on from a torn one
+            self._file.write("\n")
+            self._file.flush()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A write torn by a crash; everything before it is intact
+                    continue
+                if entry.get("op") == "put":
+                    submission = ResultSubmission.from_dict(entry["submission"])
+                    self._pending[submission.task_id] = (submission, 0.0)
+                elif entry.get("op") == "done":
+                    if self._pending.pop(entry["task_id"], None) is not None:
+                        self._delivered += 1
+        if self._pending:
+            logger.info(f"Result outbox {self.path} has {len(self._pending)} undelivered results")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, entries: List[Dict], sync: bool):
+        self._file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def put(self, submission: ResultSubmission):
+        with self._lock:
+            self._append([{"op": "put", "submission": submission.to_dict()}], sync=True)
+            self._pending[submission.task_id] = (submission, time.time())
+
+    def mark_delivered(self, task_ids: List[str]):
+        with self._lock:
+            task_ids = [task_id for task_id in task_ids if task_id in self._pending]
+            if not task_ids:
+                return
+            self._append([{"op": "done", "task_id": task_id} for task_id in task_ids], sync=False)
+            for task_id in task_ids:
+                del self._pending[task_id]
+            self._delivered += len(task_ids)
+            if self._delivered >= COMPACT_AFTER:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the undelivered results (lock held)"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            for submission, _ in self._pending.values():
+                f.write(json.dumps({"op": "put", "submission": submission.to_dict()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a")
+        self._delivered = 0
+
+    def undelivered(self, older_than: float = 0.0) -> List[ResultSubmission]:
+        """Undelivered results queued at least ``older_than`` seconds ago, oldest first"""
+        cutoff = time.time() - older_than
+        with self._lock:
+            return [submission for submission, queued in self._pending.values() if queued <= cutoff]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            # Closing the file releases the lock
+            self._lock_file.close()
+
+
+def default_result_outbox(port: int) -> ResultOutbox:
+    """The outbox of the worker listening on ``port``, which identifies it across restarts.
+
+    Fails if another worker on this host already uses the same port's outbox.
+    """
+    outbox_dir = os.environ.get("WORKER_OUTBOX_DIR") or os.path.join(
+        tempfile.gettempdir(), "p2p_result_outbox"
+    )
+    return ResultOutbox(os.path.join(outbox_dir, f"results-{port}.ndjson"))
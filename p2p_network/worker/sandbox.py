@@ -0,0 +1,250 @@
+"""
+Resource envelope for analyzer subprocesses.
+
+Every analyzer run gets rlimits on address space, CPU time, open files,
+processes and file size, set with ``prlimit`` right after it is spawned
+(``preexec_fn`` is not safe with the worker's threads), its own session so
+a kill takes its children with it, and a scratch directory for temporary files and caches whose
+total size is watched against a quota. A run that breaches a limit is
+killed and reported as ``ResourceLimitExceeded``, so one pathological
+repository can't starve the other tasks on the worker.
+
+Limits are read from the environment; ``0`` disables a limit:
+
+* ``WORKER_LIMIT_AS_BYTES``       address space (default 4 GiB)
+* ``WORKER_LIMIT_CPU_SECONDS``    CPU time (default 600)
+* ``WORKER_LIMIT_NOFILE``         open files (default 1024)
+* ``WORKER_LIMIT_NPROC``          processes of the worker's user (default: current count + 256)
+* ``WORKER_LIMIT_FSIZE_BYTES``    size of any one file written (default 512 MiB)
+* ``WORKER_SCRATCH_QUOTA_BYTES``  total size of the scratch directory (default 1 GiB)
+"""
+import logging
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# RLIMIT_NPROC counts every process of the user, not just the analyzer's
+PROCESS_HEADROOM = 256
+# Seconds between SIGXCPU at the soft CPU limit and SIGKILL at the hard one
+CPU_GRACE_SECONDS = 5
+SCRATCH_CHECK_INTERVAL = 1.0
+
+SIGNAL_VIOLATIONS = {
+    signal.SIGXCPU: "cpu_time",
+    signal.SIGXFSZ: "file_size",
+}
+
+VIOLATION_MESSAGES = {
+    "address_space": "memory limit exceeded",
+    "cpu_time": "CPU time limit exceeded",
+    "file_size": "file size limit exceeded",
+    "scratch_quota": "scratch directory quota exceeded",
+    "killed": "killed by SIGKILL",
+}
+
+
+class ResourceLimitExceeded(Exception):
+    """An analyzer run was stopped for breaching its resource envelope"""
+
+    def __init__(self, limit: str, tool: str):
+        self.limit = limit
+        self.tool = tool
+        super().__init__(f"{tool}: {VIOLATION_MESSAGES.get(limit, limit)}")
+
+
+def user_process_count() -> Optional[int]:
+    """Processes running as this user, or None without /proc"""
+    uid = str(os.getuid())
+    count = 0
+    try:
+        pids = [name for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("Uid:"):
+                        count += line.split()[1] == uid
+                        break
+        except OSError:
+            continue
+    return count
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _env_limit(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return int(value) or None
+
+
+@dataclass
+class ResourceLimits:
+    address_space: Optional[int] = 4 * 1024 ** 3
+    cpu_seconds: Optional[int] = 600
+    open_files: Optional[int] = 1024
+    processes: Optional[int] = None
+    file_size: Optional[int] = 512 * 1024 ** 2
+    scratch_bytes: Optional[int] = 1024 ** 3
+
+    @classmethod
+    def from_env(cls) -> 'ResourceLimits':
+        default_processes = user_process_count()
+        if default_processes is not None:
+            default_processes += PROCESS_HEADROOM
+        return cls(
+            address_space=_env_limit("WORKER_LIMIT_AS_BYTES", cls.address_space),
+            cpu_seconds=_env_limit("WORKER_LIMIT_CPU_SECONDS", cls.cpu_seconds),
+            open_files=_env_limit("WORKER_LIMIT_NOFILE", cls.open_files),
+            processes=_env_limit("WORKER_LIMIT_NPROC", default_processes),
+            file_size=_env_limit("WORKER_LIMIT_FSIZE_BYTES", cls.file_size),
+            scratch_bytes=_env_limit("WORKER_SCRATCH_QUOTA_BYTES", cls.scratch_bytes),
+        )
+
+    def rlimits(self, cpu: bool = True) -> List[Tuple[int, Tuple[int, int]]]:
+        """(resource, (soft, hard)) pairs, never above the current hard limits"""
+        wanted = [
+            (resource.RLIMIT_AS, self.address_space, 0),
+            (resource.RLIMIT_NOFILE, self.open_files, 0),
+            (resource.RLIMIT_NPROC, self.processes, 0),
+            (resource.RLIMIT_FSIZE, self.file_size, 0),
+        ]
+        if cpu:
+            # SIGXCPU at the soft limit, so the kill can be told apart
+            wanted.append((resource.RLIMIT_CPU, self.cpu_seconds, CPU_GRACE_SECONDS))
+        limits = []
+        for res, value, grace in wanted:
+            if value is None:
+                continue
+            _, current_hard = resource.getrlimit(res)
+            hard = value + grace
+            if current_hard != resource.RLIM_INFINITY:
+                hard = min(hard, current_hard)
+            limits.append((res, (min(value, hard), hard)))
+        return limits
+
+    def apply_to(self, pid: int, cpu: bool = True):
+        """Apply the limits to a running process; children it starts later inherit them"""
+        try:
+            for res, values in self.rlimits(cpu):
+                resource.prlimit(pid, res, values)
+        except ProcessLookupError:
+            # Already exited; its return code tells the rest
+            pass
+
+    def apply(self, cpu: bool = True):
+        """Apply the limits to the current process (e.g. a long-lived server)"""
+        self.apply_to(0, cpu)
+
+
+def run(args: Sequence[str], limits: Optional[ResourceLimits], timeout: float,
+        cpu: bool = True, **kwargs) -> subprocess.CompletedProcess:
+    """``subprocess.run`` with ``limits`` applied to the process once it has started"""
+    with subprocess.Popen(args, **kwargs) as process:
+        if limits:
+            limits.apply_to(process.pid, cpu)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+class Sandbox:
+    """Runs analyzer subprocesses inside a ``ResourceLimits`` envelope"""
+
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+        self.limits = limits or ResourceLimits.from_env()
+        self.stats = {violation: 0 for violation in VIOLATION_MESSAGES}
+
+    @contextmanager
+    def scratch(self) -> Iterator[str]:
+        path = tempfile.mkdtemp(prefix="p2p_scratch_")
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def env(scratch: str) -> Dict[str, str]:
+        """Environment pointing analyzers' temporary files and caches into ``scratch``"""
+        env = dict(os.environ)
+        env.update(
+            TMPDIR=scratch,
+            MYPY_CACHE_DIR=os.path.join(scratch, ".mypy_cache"),
+            PYLINTHOME=os.path.join(scratch, "pylint"),
+            XDG_CACHE_HOME=os.path.join(scratch, "cache"),
+        )
+        return env
+
+    def popen_kwargs(self, scratch: str) -> Dict:
+        return {
+            "env": self.env(scratch),
+            # Own process group, so kills reach anything the analyzer started
+            "start_new_session": True,
+        }
+
+    def limit(self, process):
+        """Apply the limits to a freshly spawned analyzer"""
+        self.limits.apply_to(process.pid)
+
+    @staticmethod
+    def kill(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+
+    def watch_scratch(self, scratch: str, on_exceeded: Callable[[], None]) -> Callable[[], None]:
+        """Call ``on_exceeded`` once if ``scratch`` outgrows its quota; returns a stop function"""
+        if not self.limits.scratch_bytes:
+            return lambda: None
+        stopped = threading.Event()
+
+        def watch():
+            while not stopped.wait(SCRATCH_CHECK_INTERVAL):
+                if _dir_size(scratch) > self.limits.scratch_bytes:
+                    on_exceeded()
+                    return
+
+        threading.Thread(target=watch, daemon=True).start()
+        return stopped.set
+
+    def violation(self, returncode: int, stderr: str, killed_for: Optional[str] = None) -> Optional[str]:
+        """Which limit a finished run breached, if any"""
+        if killed_for:
+            violation = killed_for
+        elif returncode < 0 and -returncode in SIGNAL_VIOLATIONS:
+            violation = SIGNAL_VIOLATIONS[-returncode]
+        elif returncode == -signal.SIGKILL:
+            # Hard CPU limit, or the kernel's OOM killer
+            violation = "killed"
+        elif returncode != 0 and self.limits.address_space and "MemoryError" in stderr:
+            violation = "address_space"
+        else:
+            return None
+        self.stats[violation] += 1
+        return violation
@@ -0,0 +1,35 @@
+import heapq
+import os
+from typing import List
+
+# Below this many files per shard, process start-up outweighs the split
+MIN_FILES_PER_SHARD = 8
+
+
+def plan_shards(code_path: str, files: List[str], shard_count: int) -> List[List[str]]:
+    """Split ``files`` into ``shard_count`` shards of similar total size.
+
+    Longest-processing-time-first: files are placed largest first onto the
+    currently lightest shard, with file size as the cost estimate. The plan
+    is deterministic for a given checkout, so every worker analyzing a
+    shard of the same commit computes the same split. Shards may be empty
+    when there are fewer files than shards.
+    """
+    shard_count = max(1, shard_count)
+    costs = []
+    for path in files:
+        try:
+            size = os.path.getsize(os.path.join(code_path, path))
+        except OSError:
+            size = 0
+        # Every file has some fixed per-file cost
+        costs.append((max(size, 1), path))
+    costs.sort(key=lambda cost: (-cost[0], cost[1]))
+
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    loads = [(0, index) for index in range(shard_count)]
+    for size, path in costs:
+        load, index = heapq.heappop(loads)
+        shards[index].append(path)
+        heapq.heappush(loads, (load + size, index))
+    return [sorted(shard) for shard in shards]
@@ -1,18 +1,77 @@
+import atexit
 import subprocess
 import tempfile
 import os
 import json
 import logging
-from typing import Dict, Any, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, List, Optional, TextIO, Tuple
 from urllib.parse import urlparse
 import shutil
+from importlib import metadata
+
+from .analyzer_daemons import WarmAnalyzers
+from .findings_cache import CONFIG_FILES, FindingsCache, blob_hashes, config_hash, default_findings_cache
+from .incremental import (
+    AnalysisStateStore, changed_files, default_analysis_state,
+    head_commit, list_files, merge_findings, python_dependents, summarize
+)
+from .output_parsing import IssueCollector, parse_flake8, parse_mypy, parse_pylint
+from .repo_cache import RepoCache, default_repo_cache
+from .sandbox import ResourceLimitExceeded, Sandbox
+from .sharding import MIN_FILES_PER_SHARD, plan_shards
+from ..common.findings import merge_tool_results
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Analyzers whose findings are per file, so unchanged files can reuse them
+INCREMENTAL_ANALYZERS = {"pylint", "flake8", "mypy"}
+
+# Analyzers whose findings for a file depend only on that file's content;
+# the arguments are part of the findings cache key
+ANALYZER_ARGS = {
+    "pylint": ["--output-format=json"],
+    "flake8": ["--format=default"],
+}
+
+# Bytes of analyzer stderr kept for error reports
+STDERR_TAIL = 500
+
+# Per-process working copies kept for warm analyzers (dmypy needs a stable path)
+WARM_WORKSPACES = 4
+
+
+def warm_analyzers_enabled() -> bool:
+    return os.environ.get("WORKER_WARM_ANALYZERS", "").lower() in ("1", "true", "yes")
+
 
 class TaskExecutor:
-    def __init__(self):
+    def __init__(self, repo_cache: Optional[RepoCache] = None,
+                 analyzer_slots=None,
+                 analysis_state: Optional[AnalysisStateStore] = None,
+                 findings_cache: Optional[FindingsCache] = None,
+                 warm_analyzers: Optional[bool] = None,
+                 max_shards: Optional[int] = None,
+                 sandbox: Optional[Sandbox] = None):
+        self.repo_cache = repo_cache or default_repo_cache()
+        self.analysis_state = analysis_state or default_analysis_state()
+        self.findings_cache = findings_cache or default_findings_cache()
+        self._tool_versions: Dict[str, str] = {}
+        # Caps analyzer subprocesses running at once; WorkerNode shares one
+        # semaphore across all of its analysis processes as the CPU budget
+        self.analyzer_slots = analyzer_slots or threading.BoundedSemaphore(os.cpu_count() or 1)
+        self.max_shards = max_shards or os.cpu_count() or 1
+        # Resource envelope for every analyzer subprocess
+        self.sandbox = sandbox or Sandbox()
+        if warm_analyzers is None:
+            warm_analyzers = warm_analyzers_enabled()
+        self.warm_dir = tempfile.mkdtemp(prefix="p2p_warm_") if warm_analyzers else None
+        self.warm = WarmAnalyzers(self.warm_dir, limits=self.sandbox.limits) if warm_analyzers else None
+        self._workspaces: "OrderedDict[str, str]" = OrderedDict()
         self.supported_languages = {
             "python": {
                 "extensions": [".py"],
@@ -32,28 +91,62 @@ class TaskExecutor:
         }
     
     def execute_analysis(self, task_id: str, code_url: str, 
-                        analysis_type: str) -> Dict[str, Any]:
+                        analysis_type: str, shard_index: Optional[int] = None,
+                        shard_count: Optional[int] = None) -> Dict[str, Any]:
+        """Run one task; ``findings_cache`` in the result holds this task's cache counters"""
+        before = self.findings_cache.counters()
+        analysis = self._execute_analysis(task_id, code_url, analysis_type, shard_index, shard_count)
+        after = self.findings_cache.counters()
+        # Each analysis process has its own cache counters; the worker sums these
+        analysis["findings_cache"] = {key: after[key] - before[key] for key in after}
+        return analysis
+    
+    def _execute_analysis(self, task_id: str, code_url: str, analysis_type: str,
+                          shard_index: Optional[int], shard_count: Optional[int]) -> Dict[str, Any]:
         logger.info(f"Starting analysis for task {task_id}")
         
-        with tempfile.TemporaryDirectory() as temp_dir:
+        # The working copy borrows the mirror's objects until the analysis is done
+        with tempfile.TemporaryDirectory() as temp_dir, self.repo_cache.in_use(code_url):
             try:
-                code_path = self._download_code(code_url, temp_dir)
+                download_dir = self._warm_workspace(code_url) if self.warm else temp_dir
+                code_path = self._download_code(code_url, download_dir)
                 
                 language = self._detect_language(code_path)
+                commit_id = head_commit(code_path)
+                
+                shard_files = None
+                if shard_count and shard_count > 1 and language in self.supported_languages:
+                    # One shard of a task the supernode fanned out to several workers
+                    shard_files = plan_shards(
+                        code_path,
+                        list_files(code_path, self.supported_languages[language]["extensions"]),
+                        shard_count
+                    )[shard_index]
                 
                 results = self._run_analysis(
                     code_path, 
                     language, 
-                    analysis_type
+                    analysis_type,
+                    code_url=code_url,
+                    commit_id=commit_id,
+                    files=shard_files
                 )
                 
-                return {
+                analysis = {
                     "task_id": task_id,
                     "status": "completed",
                     "language": language,
                     "analysis_type": analysis_type,
+                    "commit_id": commit_id,
                     "results": results
                 }
+                if shard_files is not None:
+                    analysis["shard"] = {
+                        "index": shard_index,
+                        "count": shard_count,
+                        "files": len(shard_files)
+                    }
+                return analysis
                 
             except Exception as e:
                 logger.error(f"Analysis failed: {e}")
@@ -63,16 +156,96 @@ class TaskExecutor:
                     "error": str(e)
                 }
     
+    def _warm_workspace(self, code_url: str) -> str:
+        """Stable directory for a repository, reused across its tasks in this process"""
+        key = RepoCache.repo_key(code_url)
+        workspace = os.path.join(self.warm_dir, "workspaces", key)
+        self._workspaces[key] = workspace
+        self._workspaces.move_to_end(key)
+        while len(self._workspaces) > WARM_WORKSPACES:
+            _, evicted = self._workspaces.popitem(last=False)
+            self.warm.mypy.forget(os.path.join(evicted, "repo"))
+            shutil.rmtree(evicted, ignore_errors=True)
+        os.makedirs(workspace, exist_ok=True)
+        return workspace
+    
+    def close(self):
+        if self.warm:
+            self.warm.stop()
+            shutil.rmtree(self.warm_dir, ignore_errors=True)
+            self.warm = None
+    
+    def _stream_tool(self, tool: str, args: List[str], cwd: str,
+                     parse: Callable[[TextIO], None],
+                     timeout: int = 300) -> Tuple[int, str]:
+        """Run an analyzer, feeding its stdout to ``parse`` as it is produced.
+        
+        Returns the exit code and the tail of stderr; raises
+        ``subprocess.TimeoutExpired`` like ``subprocess.run`` would, and
+        ``ResourceLimitExceeded`` when the sandbox stopped the analyzer.
+        """
+        if self.warm and self.warm.supports(tool):
+            # Warm servers write to a file, which is then read back in chunks
+            with tempfile.NamedTemporaryFile(dir=self.warm_dir, suffix=".out") as output:
+                result = self.warm.run(tool, args, cwd, timeout, output.name)
+                with open(output.name, errors="replace") as stream:
+                    parse(stream)
+            stderr_tail = result.stderr[-STDERR_TAIL:]
+            violation = self.sandbox.violation(result.returncode, stderr_tail)
+            if violation:
+                raise ResourceLimitExceeded(violation, tool)
+            return result.returncode, stderr_tail
+        
+        with tempfile.TemporaryFile() as stderr, self.sandbox.scratch() as scratch:
+            process = subprocess.Popen(
+                [tool, *args],
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                text=True,
+                errors="replace",
+                cwd=cwd,
+                **self.sandbox.popen_kwargs(scratch)
+            )
+            self.sandbox.limit(process)
+            killed_for = []
+            
+            def kill(reason):
+                if not killed_for:
+                    killed_for.append(reason)
+                self.sandbox.kill(process)
+            
+            timer = threading.Timer(timeout, kill, ("timeout",))
+            timer.start()
+            stop_watching = self.sandbox.watch_scratch(scratch, lambda: kill("scratch_quota"))
+            try:
+                parse(process.stdout)
+            except BaseException:
+                # Parsing gave up early; don't leave the analyzer blocked on a full pipe
+                self.sandbox.kill(process)
+                raise
+            finally:
+                timer.cancel()
+                stop_watching()
+                process.stdout.close()
+                returncode = process.wait()
+            if killed_for == ["timeout"]:
+                raise subprocess.TimeoutExpired([tool, *args], timeout)
+            stderr.seek(max(0, stderr.seek(0, os.SEEK_END) - STDERR_TAIL))
+            stderr_tail = stderr.read().decode(errors="replace")
+            violation = self.sandbox.violation(returncode, stderr_tail, killed_for[0] if killed_for else None)
+            if violation:
+                raise ResourceLimitExceeded(violation, tool)
+            return returncode, stderr_tail
+    
     def _download_code(self, code_url: str, target_dir: str) -> str:
         parsed_url = urlparse(code_url)
         
-        if "github.com" in parsed_url.netloc:
+        if "github.com" in parsed_url.netloc or parsed_url.scheme == "file":
             repo_path = os.path.join(target_dir, "repo")
-            cmd = ["git", "clone", "--depth", "1", code_url, repo_path]
             
             try:
-                subprocess.run(cmd, check=True, capture_output=True)
-                logger.info(f"Cloned repository from {code_url}")
+                self.repo_cache.checkout(code_url, repo_path)
+                logger.info(f"Checked out repository from {code_url}")
                 return repo_path
             except subprocess.CalledProcessError as e:
                 logger.error(f"Failed to clone repository: {e}")
@@ -102,7 +275,9 @@ class TaskExecutor:
         return "unknown"
     
     def _run_analysis(self, code_path: str, language: str, 
-                     analysis_type: str) -> Dict[str, Any]:
+                     analysis_type: str, code_url: Optional[str] = None,
+                     commit_id: Optional[str] = None,
+                     files: Optional[List[str]] = None) -> Dict[str, Any]:
         if language not in self.supported_languages:
             return {"error": f"Unsupported language: {language}"}
         
@@ -110,128 +285,258 @@ class TaskExecutor:
         results = {}
         
         if analysis_type == "all":
-            for analyzer_name, analyzer_func in analyzers.items():
-                results[analyzer_name] = analyzer_func(code_path)
+            # Each analyzer is its own subprocess, so threads are enough to
+            # overlap them; the slots keep the total within the CPU budget
+            with ThreadPoolExecutor(max_workers=len(analyzers)) as pool:
+                futures = {
+                    pool.submit(self._run_timed, analyzer_name, analyzer_func,
+                                code_path, code_url, commit_id, files): analyzer_name
+                    for analyzer_name, analyzer_func in analyzers.items()
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
         elif analysis_type in analyzers:
-            results[analysis_type] = analyzers[analysis_type](code_path)
+            results[analysis_type] = self._run_timed(
+                analysis_type, analyzers[analysis_type], code_path, code_url, commit_id, files
+            )
         else:
             results["error"] = f"Unknown analysis type: {analysis_type}"
         
         return results
     
-    def _run_pylint(self, code_path: str) -> Dict[str, Any]:
-        try:
-            cmd = ["pylint", "--output-format=json", code_path]
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                timeout=300  
-            )
-            
-            if result.stdout:
-                try:
-                    issues = json.loads(result.stdout)
-                    return {
-                        "tool": "pylint",
-                        "issue_count": len(issues),
-                        "issues": issues[:10]  # Limit to first 10 issues
-                    }
-                except json.JSONDecodeError:
-                    return {
-                        "tool": "pylint",
-                        "error": "Failed to parse output",
-                        "raw_output": result.stdout[:500]
+    def _run_timed(self, analyzer_name: str, analyzer_func, code_path: str,
+                   code_url: Optional[str] = None,
+                   commit_id: Optional[str] = None,
+                   files: Optional[List[str]] = None) -> Dict[str, Any]:
+        with self.analyzer_slots:
+            started = time.time()
+            if analyzer_name in INCREMENTAL_ANALYZERS and files is not None:
+                # A shard's file set differs from the repository's, so it
+                # bypasses the per-repository incremental state
+                result = self._analyze_files(analyzer_name, analyzer_func, code_path, files)
+                file_findings = result.pop("file_findings", None)
+                if file_findings is not None and "error" not in result:
+                    cache_stats = {
+                        k: result[k] for k in ("cache_hits", "cache_misses") if k in result
                     }
+                    result = summarize(analyzer_name, file_findings)
+                    result.update(cache_stats, files_analyzed=len(files))
+            elif analyzer_name in INCREMENTAL_ANALYZERS and code_url and commit_id:
+                result = self._run_incremental(analyzer_name, analyzer_func,
+                                               code_path, code_url, commit_id)
+            else:
+                result = analyzer_func(code_path)
+                result.pop("file_findings", None)
+            result["duration"] = round(time.time() - started, 3)
+        return result
+    
+    def _run_incremental(self, tool: str, analyzer_func, code_path: str,
+                         code_url: str, commit_id: str) -> Dict[str, Any]:
+        """Analyze only files changed since the last analyzed commit of this repo.
+        
+        Findings for unchanged files come from the stored state; a missing
+        state, an unusable diff (e.g. after a force push), or a different
+        analyzer version or configuration means a full run.
+        """
+        version = self._tool_version(tool)
+        config = config_hash(code_path, tool, ANALYZER_ARGS.get(tool, []))
+        state = self.analysis_state.load(code_url, tool)
+        if state and (state.get("version"), state.get("config")) != (version, config):
+            state = None
+        diff = None
+        if state:
+            if state["commit"] == commit_id:
+                result = summarize(tool, state["files"])
+                result.update(incremental=True, files_analyzed=0)
+                return result
+            diff = changed_files(code_path, state["commit"], commit_id)
+            if diff is not None and set(CONFIG_FILES.get(tool, ())) & (diff[0] | diff[1]):
+                diff = None
+        
+        if diff is None:
+            targets = None
+            result = self._analyze_files(tool, analyzer_func, code_path)
+            file_findings = result.pop("file_findings", None)
+        else:
+            modified, deleted = diff
+            targets = {
+                path for path in modified
+                if path.endswith(".py") and os.path.isfile(os.path.join(code_path, path))
+            }
+            if tool == "mypy":
+                # Type errors can surface in modules importing a changed one
+                targets |= python_dependents(
+                    code_path, targets | deleted, list_files(code_path, [".py"])
+                )
+            if targets:
+                result = self._analyze_files(tool, analyzer_func, code_path, sorted(targets))
+                file_findings = result.pop("file_findings", None)
             else:
+                result, file_findings = {}, {}
+            if file_findings is not None:
+                file_findings = merge_findings(state["files"], file_findings, targets, deleted)
+        
+        if "error" in result or file_findings is None:
+            return result
+        
+        self.analysis_state.save(code_url, tool, commit_id, file_findings, version, config)
+        cache_stats = {k: result[k] for k in ("cache_hits", "cache_misses") if k in result}
+        result = summarize(tool, file_findings)
+        result.update(cache_stats)
+        result["incremental"] = targets is not None
+        result["files_analyzed"] = (
+            len(targets) if targets is not None else len(list_files(code_path, [".py"]))
+        )
+        return result
+    
+    def _analyze_files(self, tool: str, analyzer_func, code_path: str,
+                       files: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run ``analyzer_func`` on the files whose findings are not cached"""
+        if tool not in ANALYZER_ARGS:
+            return analyzer_func(code_path, files)
+        
+        files = self._target_files(code_path, files)
+        version = self._tool_version(tool)
+        config = config_hash(code_path, tool, ANALYZER_ARGS[tool])
+        keys = {
+            path: self.findings_cache.key(blob, tool, version, config)
+            for path, blob in blob_hashes(code_path, files).items()
+        }
+        
+        file_findings = {}
+        misses = []
+        for path in files:
+            cached = self.findings_cache.get(keys[path])
+            if cached is None:
+                misses.append(path)
+            elif cached["count"]:
+                file_findings[path] = cached
+        
+        if misses:
+            result = self._run_sharded(tool, analyzer_func, code_path, misses)
+            fresh = result.pop("file_findings", None)
+            if fresh is None:
+                return result
+            for path in misses:
+                findings = fresh.get(path, {"count": 0, "issues": []})
+                self.findings_cache.put(keys[path], findings)
+                if findings["count"]:
+                    file_findings[path] = findings
+        
+        return {
+            "tool": tool,
+            "file_findings": file_findings,
+            "cache_hits": len(files) - len(misses),
+            "cache_misses": len(misses)
+        }
+    
+    def _run_sharded(self, tool: str, analyzer_func, code_path: str,
+                     files: List[str]) -> Dict[str, Any]:
+        """Split a large file list into size-balanced shards analyzed in parallel.
+        
+        The caller already holds one analyzer slot; each further shard needs
+        a slot that is free right now, so sharding only soaks up idle cores
+        and never waits on (or deadlocks against) other analyzers.
+        """
+        wanted = min(self.max_shards, len(files) // MIN_FILES_PER_SHARD)
+        extra_slots = 0
+        if not self.warm:  # warm servers run one job at a time per tool
+            while extra_slots < wanted - 1 and self.analyzer_slots.acquire(False):
+                extra_slots += 1
+        if not extra_slots:
+            return analyzer_func(code_path, files)
+        
+        try:
+            shards = [shard for shard in plan_shards(code_path, files, extra_slots + 1) if shard]
+            with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                results = list(pool.map(lambda shard: analyzer_func(code_path, shard), shards))
+        finally:
+            for _ in range(extra_slots):
+                self.analyzer_slots.release()
+        
+        result = merge_tool_results(tool, results)
+        result["shards"] = len(shards)
+        return result
+    
+    def _tool_version(self, tool: str) -> str:
+        if tool not in self._tool_versions:
+            try:
+                self._tool_versions[tool] = metadata.version(tool)
+            except metadata.PackageNotFoundError:
+                self._tool_versions[tool] = "unknown"
+        return self._tool_versions[tool]
+    
+    @staticmethod
+    def _target_files(code_path: str, files: Optional[List[str]]) -> List[str]:
+        # Analyzers run from the repository root on relative paths, so
+        # findings are keyed the same way in full and incremental runs
+        return files if files is not None else list_files(code_path, [".py"])
+    
+    def _run_pylint(self, code_path: str, files: Optional[List[str]] = None) -> Dict[str, Any]:
+        try:
+            args = [*ANALYZER_ARGS["pylint"], *self._target_files(code_path, files)]
+            collector = IssueCollector()
+            try:
+                self._stream_tool("pylint", args, code_path,
+                                  lambda stream: parse_pylint(stream, collector))
+            except json.JSONDecodeError as e:
                 return {
                     "tool": "pylint",
-                    "issue_count": 0,
-                    "issues": []
+                    "error": "Failed to parse output",
+                    "raw_output": e.doc[:500]
                 }
+            return collector.result("pylint")
                 
         except subprocess.TimeoutExpired:
             return {"tool": "pylint", "error": "Analysis timeout"}
+        except ResourceLimitExceeded as e:
+            return {"tool": "pylint", "error": f"Resource limit exceeded: {e}", "resource_limit": e.limit}
         except Exception as e:
             return {"tool": "pylint", "error": str(e)}
     
-    def _run_flake8(self, code_path: str) -> Dict[str, Any]:
+    def _run_flake8(self, code_path: str, files: Optional[List[str]] = None) -> Dict[str, Any]:
         try:
-            cmd = ["flake8", "--format=json", code_path]
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                timeout=300
-            )
-            
-            if result.stdout:
-                try:
-                    lines = result.stdout.strip().split('\n')
-                    issues = []
-                    for line in lines[:10]:  # Limit to first 10
-                        if line:
-                            parts = line.split(':')
-                            if len(parts) >= 4:
-                                issues.append({
-                                    "file": parts[0],
-                                    "line": parts[1],
-                                    "column": parts[2],
-                                    "message": ':'.join(parts[3:])
-                                })
-                    
-                    return {
-                        "tool": "flake8",
-                        "issue_count": len(lines),
-                        "issues": issues
-                    }
-                except Exception:
-                    return {
-                        "tool": "flake8",
-                        "error": "Failed to parse output"
-                    }
-            else:
-                return {
-                    "tool": "flake8",
-                    "issue_count": 0,
-                    "issues": []
-                }
+            args = [*ANALYZER_ARGS["flake8"], *self._target_files(code_path, files)]
+            collector = IssueCollector()
+            self._stream_tool("flake8", args, code_path,
+                              lambda stream: parse_flake8(stream, collector))
+            return collector.result("flake8")
                 
         except subprocess.TimeoutExpired:
             return {"tool": "flake8", "error": "Analysis timeout"}
+        except ResourceLimitExceeded as e:
+            return {"tool": "flake8", "error": f"Resource limit exceeded: {e}", "resource_limit": e.limit}
         except Exception as e:
             return {"tool": "flake8", "error": str(e)}
     
-    def _run_mypy(self, code_path: str) -> Dict[str, Any]:
+    def _run_mypy(self, code_path: str, files: Optional[List[str]] = None) -> Dict[str, Any]:
         try:
-            cmd = ["mypy", "--json-report", "-", code_path]
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                timeout=300
-            )
-            if result.stderr:
-                lines = result.stderr.strip().split('\n')
-                issues = []
-                for line in lines[:10]: 
-                    if line and ':' in line:
-                        issues.append({"message": line})
-                
-                return {
-                    "tool": "mypy",
-                    "issue_count": len(lines),
-                    "issues": issues
-                }
+            files = self._target_files(code_path, files)
+            if self.warm:
+                # dmypy only supports skipped imports and already rechecks
+                # just what changed, so it is given the whole repository
+                # and its output is narrowed to the requested files
+                follow_imports, checked = "skip", list_files(code_path, [".py"])
             else:
-                return {
-                    "tool": "mypy",
-                    "issue_count": 0,
-                    "issues": []
-                }
+                # Imported modules are type-checked for context but only the
+                # given files are reported, so partial runs stay per file
+                follow_imports, checked = "silent", files
+            args = [f"--follow-imports={follow_imports}", "--explicit-package-bases",
+                    "--no-error-summary", "--no-color-output", *checked]
+            collector = IssueCollector()
+            requested = set(files)
+            returncode, stderr = self._stream_tool(
+                "mypy", args, code_path,
+                lambda stream: parse_mypy(stream, collector, requested)
+            )
+            if not collector.issue_count and returncode > 1:
+                return {"tool": "mypy", "error": stderr.strip() or "mypy failed"}
+            return collector.result("mypy")
                 
         except subprocess.TimeoutExpired:
             return {"tool": "mypy", "error": "Analysis timeout"}
+        except ResourceLimitExceeded as e:
+            return {"tool": "mypy", "error": f"Resource limit exceeded: {e}", "resource_limit": e.limit}
         except Exception as e:
             return {"tool": "mypy", "error": str(e)}
     
@@ -246,3 +551,28 @@ class TaskExecutor:
             "tool": "jshint",
             "error": "JSHint not implemented yet"
         }
+
+
+_process_executor = None
+_process_analyzer_slots = None
+_process_warm_analyzers = None
+
+
+def init_analysis_process(analyzer_slots=None, warm_analyzers=None):
+    """Process-pool initializer; receives the worker-wide analyzer semaphore"""
+    global _process_analyzer_slots, _process_warm_analyzers
+    _process_analyzer_slots = analyzer_slots
+    _process_warm_analyzers = warm_analyzers
+
+
+def run_analysis_task(task_id: str, code_url: str, analysis_type: str,
+                      shard_index: Optional[int] = None,
+                      shard_count: Optional[int] = None) -> Dict[str, Any]:
+    """Process-pool entry point; each worker process reuses one TaskExecutor"""
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = TaskExecutor(analyzer_slots=_process_analyzer_slots,
+                                         warm_analyzers=_process_warm_analyzers)
+        atexit.register(_process_executor.close)
+    return _process_executor.execute_analysis(task_id, code_url, analysis_type,
+                                              shard_index, shard_count)
@@ -2,43 +2,118 @@ import threading
 import time
 import logging
 import json
+import multiprocessing
+import os
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 from ..common.message_formats import (
     NodeRegistration, TaskAssignment, 
-    ResultSubmission, Heartbeat
+    ResultSubmission, Heartbeat, ResourceReport
 )
 from ..common.network_utils import NetworkClient
+from .findings_cache import STAT_KEYS, hit_rate
+from .prefetch import PrefetchBuffer
+from .repo_cache import default_repo_cache
+from .result_batcher import ResultBatcher
+from .result_outbox import default_result_outbox
+from .resource_monitor import AdaptiveConcurrency, AnalyzerThroughput, ResourceMonitor
+from .task_executor import init_analysis_process, run_analysis_task
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bounds the heartbeat payload for workers with large clone caches
+MAX_REPORTED_REPOS = 64
+# Results younger than this are still on their first attempt through the batcher
+OUTBOX_GRACE_SECONDS = 60
+OUTBOX_MAX_BACKOFF = 300
+# How long stop() lets running tasks finish by default
+DRAIN_TIMEOUT = 300
+
 
 class WorkerNode:
     def __init__(self, node_id: Optional[str] = None, 
                  ip_address: str = "localhost", 
                  port: int = 8080,
                  capabilities: Optional[List[str]] = None,
-                 max_concurrent_tasks: int = 3):
+                 max_concurrent_tasks: int = 3,
+                 analysis_workers: Optional[int] = None,
+                 cpu_budget: Optional[int] = None,
+                 warm_analyzers: bool = False,
+                 adaptive_concurrency: bool = True,
+                 max_concurrency: Optional[int] = None):
         self.node_id = node_id or str(uuid.uuid4())
         self.ip_address = ip_address
         self.port = port
         self.capabilities = capabilities or ["python", "javascript"]
         self.supernode_url = None
         self.is_running = False
+        # Set while stopping: no new tasks are fetched or started
+        self.draining = False
         self.current_tasks = {}  # Dictionary of task_id -> task
         self.max_concurrent_tasks = max_concurrent_tasks
         self.heartbeat_interval = 30  
         self.task_poll_interval = 10  
+        self.resource_sample_interval = 5
+        self.outbox_retry_interval = 5
         self.network_client = NetworkClient()
         self.heartbeat_thread = None
         self.task_poll_thread = None
+        self.resource_thread = None
+        self.outbox_thread = None
         self.task_lock = threading.Lock()
-        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_tasks)
+        # Tasks leased ahead of free slots; polls are also woken early when
+        # a task finishes so the buffer refills straight away
+        self.prefetch = PrefetchBuffer()
+        self.poll_wakeup = threading.Event()
+        # Results are journaled before they are sent, and the ones a
+        # submission didn't deliver are retried from the journal
+        self.outbox = default_result_outbox(port)
+        # Results of tasks finishing close together go out in one request
+        self.result_batcher = ResultBatcher(self._send_results)
+        self.resource_monitor = ResourceMonitor()
+        self.resource_sample = None
+        self.throughput = AnalyzerThroughput()
+        # Findings cache counters summed over the tasks of every analysis process
+        self.findings_cache_stats = {key: 0 for key in STAT_KEYS}
+        self.stats_lock = threading.Lock()
+        # Same cache directory as the analysis processes; read for telemetry
+        self.repo_cache = default_repo_cache()
+        # max_concurrent_tasks is where the limit starts; when adaptive it
+        # then follows measured CPU, memory and run-queue pressure
+        self.adaptive_concurrency = adaptive_concurrency
+        self.concurrency = AdaptiveConcurrency(
+            initial=max_concurrent_tasks,
+            max_limit=(max_concurrency or max(max_concurrent_tasks, 2 * (os.cpu_count() or 1)))
+            if adaptive_concurrency else max_concurrent_tasks
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency.max_limit)
+        # Analyses are CPU-bound, so they run in processes; the thread pool
+        # above only orchestrates them and submits results. Spawned rather
+        # than forked because this process already runs network threads.
+        # Processes start on demand, and the analyzer slots below keep
+        # analyzers within the CPU budget however many tasks are running.
+        # Analyzer subprocesses running at once across all analysis processes
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        # Warm mode keeps a set of analyzer servers per analysis process, and
+        # no more than cpu_budget of them can run at once, so the pool is
+        # kept to that size instead of one process per task slot
+        default_workers = (min(self.cpu_budget, self.concurrency.max_limit)
+                           if warm_analyzers else self.concurrency.max_limit)
+        self.analysis_workers = analysis_workers or default_workers
+        mp_context = multiprocessing.get_context("spawn")
+        self.analyzer_slots = mp_context.BoundedSemaphore(self.cpu_budget)
+        self.analysis_pool = ProcessPoolExecutor(
+            max_workers=self.analysis_workers,
+            mp_context=mp_context,
+            initializer=init_analysis_process,
+            # Warm mode keeps analyzer daemons alive inside each analysis process
+            initargs=(self.analyzer_slots, warm_analyzers)
+        )
         
     def register_with_supernode(self, supernode_url: str) -> bool:
         self.supernode_url = supernode_url
@@ -91,20 +166,99 @@ class WorkerNode:
         )
         self.task_poll_thread.start()
         
+        self.resource_thread = threading.Thread(
+            target=self._resource_loop,
+            daemon=True
+        )
+        self.resource_thread.start()
+        
+        self.result_batcher.start()
+        
+        self.outbox_thread = threading.Thread(
+            target=self._outbox_loop,
+            daemon=True
+        )
+        self.outbox_thread.start()
+        
         logger.info(f"Worker node {self.node_id} started")
     
-    def stop(self):
+    def stop(self, drain: bool = True, drain_timeout: float = DRAIN_TIMEOUT):
+        """Stop the worker, by default draining it first (see ``drain``)"""
+        if drain and self.is_running:
+            self.drain(drain_timeout)
+        
         self.is_running = False
+        self.poll_wakeup.set()
         
         if self.heartbeat_thread:
             self.heartbeat_thread.join(timeout=2)
         if self.task_poll_thread:
             self.task_poll_thread.join(timeout=2)
+        if self.resource_thread:
+            self.resource_thread.join(timeout=2)
+        if self.outbox_thread:
+            self.outbox_thread.join(timeout=2)
             
         self.executor.shutdown(wait=False)
+        self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+        self.result_batcher.close()
+        self.outbox.close()
             
         logger.info(f"Worker node {self.node_id} stopped")
     
+    def drain(self, timeout: float = DRAIN_TIMEOUT):
+        """Wind down without losing work.
+        
+        Stops fetching and starting tasks, hands prefetched tasks back to
+        the supernode, and waits up to ``timeout`` seconds for running tasks
+        to finish. Tasks still running then are handed back too. Finally
+        the finished results are sent; any the supernode doesn't take stay
+        in the outbox for the next start.
+        """
+        with self.task_lock:
+            # A poll already in flight checks this under the same lock, and
+            # hands back what it fetched itself instead of buffering it
+            self.draining = True
+            prefetched = self.prefetch.drain()
+        self.poll_wakeup.set()
+        logger.info(f"Worker {self.node_id} draining")
+        
+        self._release_tasks([task.task_id for task in prefetched])
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.task_lock:
+                if not self.current_tasks:
+                    break
+            time.sleep(0.2)
+        with self.task_lock:
+            unfinished = list(self.current_tasks)
+        if unfinished:
+            logger.warning(f"Worker {self.node_id} drain timed out with {len(unfinished)} tasks running")
+            self._release_tasks(unfinished)
+        
+        self.result_batcher.flush()
+        try:
+            self._drain_outbox(older_than=0)
+        except Exception as e:
+            logger.error(f"Outbox drain error: {e}")
+        
+        logger.info(f"Worker {self.node_id} drained ({len(self.outbox)} results left in the outbox)")
+    
+    def _release_tasks(self, task_ids: List[str]):
+        """Hand tasks back to the supernode so it can assign them elsewhere"""
+        if not task_ids:
+            return
+        response = self.network_client.post(
+            f"{self.supernode_url}/tasks/release",
+            {"node_id": self.node_id, "task_ids": task_ids}
+        )
+        if response and response.status_code == 200:
+            logger.info(f"Worker {self.node_id} released tasks: {', '.join(task_ids)}")
+        else:
+            # Unstarted leases expire on their own; started tasks stay assigned
+            logger.error(f"Worker {self.node_id} failed to release tasks: {', '.join(task_ids)}")
+    
     def _heartbeat_loop(self):
         while self.is_running:
             try:
@@ -112,7 +266,8 @@ class WorkerNode:
                     node_id=self.node_id,
                     timestamp=datetime.now().isoformat(),
                     status="active",
-                    current_load=self._calculate_load()
+                    current_load=self._calculate_load(),
+                    resources=self._resource_report().to_dict()
                 )
                 
                 response = self.network_client.post(
@@ -130,86 +285,164 @@ class WorkerNode:
             
             time.sleep(self.heartbeat_interval)
     
+    def _resource_loop(self):
+        while self.is_running:
+            try:
+                sample = self.resource_monitor.sample()
+                self.resource_sample = sample
+                if self.adaptive_concurrency:
+                    with self.task_lock:
+                        active_tasks = len(self.current_tasks)
+                    previous = self.concurrency.limit
+                    limit = self.concurrency.update(sample, active_tasks)
+                    if limit != previous:
+                        logger.info(f"Worker {self.node_id} concurrency {previous} -> {limit} ({sample})")
+            except Exception as e:
+                logger.error(f"Resource sampling error: {e}")
+            
+            time.sleep(self.resource_sample_interval)
+    
+    def _record_findings_cache(self, counters: Optional[Dict[str, int]]):
+        if not counters:
+            return
+        with self.stats_lock:
+            for key in STAT_KEYS:
+                self.findings_cache_stats[key] += counters.get(key, 0)
+    
+    def findings_cache_report(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            stats = dict(self.findings_cache_stats)
+        return dict(stats, hit_rate=round(hit_rate(stats), 4))
+    
+    def _resource_report(self) -> ResourceReport:
+        report = ResourceReport(throughput=self.throughput.rates())
+        cache_report = self.findings_cache_report()
+        if cache_report["hits"] or cache_report["misses"]:
+            report.findings_cache = cache_report
+        sample = self.resource_sample
+        if sample:
+            report.cpu_count = sample.cpu_count
+            report.cpu_utilization = sample.cpu_utilization
+            report.memory_available = sample.memory_available
+            report.memory_free_bytes = sample.memory_available_bytes
+        try:
+            report.cached_repos = self.repo_cache.cached_repo_keys(MAX_REPORTED_REPOS)
+            report.disk_free_bytes = self.repo_cache.disk_free()
+        except OSError as e:
+            logger.warning(f"Could not read clone cache: {e}")
+        return report
+    
     def _task_poll_loop(self):
         while self.is_running:
             try:
-                with self.task_lock:
-                    can_take_more = len(self.current_tasks) < self.max_concurrent_tasks
-                
-                if can_take_more:
+                if not self.draining:
                     self._poll_for_tasks()
-                else:
-                    logger.debug(f"Worker {self.node_id} at max tasks ({len(self.current_tasks)})")
-                    
+                    self._dispatch_prefetched()
             except Exception as e:
                 logger.error(f"Task polling error: {e}")
             
-            time.sleep(self.task_poll_interval)
+            self.poll_wakeup.wait(self.task_poll_interval)
+            self.poll_wakeup.clear()
     
     def _poll_for_tasks(self):
+        with self.task_lock:
+            limit = self.concurrency.limit
+            wanted = limit + self.prefetch.depth(limit) - len(self.current_tasks) - len(self.prefetch)
+        if wanted <= 0:
+            logger.debug(f"Worker {self.node_id} at max tasks ({len(self.current_tasks)})")
+            return
+        
         try:
+            lease_seconds = self.prefetch.lease_seconds(limit)
+            started = time.time()
             response = self.network_client.get(
                 f"{self.supernode_url}/tasks",
                 params={
                     "node_id": self.node_id,
-                    "max_tasks": self.max_concurrent_tasks - len(self.current_tasks)
+                    "max_tasks": wanted,
+                    "lease": lease_seconds
                 }
             )
             
             if response and response.status_code == 200:
+                self.prefetch.record_rtt(time.time() - started)
                 data = response.json()
-                tasks = data.get("tasks", [])
+                tasks = [TaskAssignment.from_dict(task_data) for task_data in data.get("tasks", [])]
                 
                 if tasks:
-                    for task_data in tasks:
-                        task = TaskAssignment.from_dict(task_data)
-                        
-                        #Store task and submit to executor
-                        with self.task_lock:
-                            self.current_tasks[task.task_id] = task
-                        
+                    for task in tasks:
                         logger.info(f"Worker {self.node_id} received task: {task.task_id}")
-                        self.executor.submit(self._execute_task, task)
+                    with self.task_lock:
+                        draining = self.draining
+                        if not draining:
+                            self.prefetch.add(tasks, lease_seconds)
+                    if draining:
+                        self._release_tasks([task.task_id for task in tasks])
                 else:
                     logger.debug(f"No tasks available for worker {self.node_id}")
                     
         except Exception as e:
             logger.error(f"Error polling for tasks: {e}")
     
+    def _dispatch_prefetched(self):
+        """Start prefetched tasks while there are free slots"""
+        while True:
+            with self.task_lock:
+                if self.draining or len(self.current_tasks) >= self.concurrency.limit:
+                    return
+                task = self.prefetch.pop()
+                if task is None:
+                    return
+                self.current_tasks[task.task_id] = task
+            self.executor.submit(self._execute_task, task)
+    
+    def _acknowledge_start(self, task: TaskAssignment) -> bool:
+        """Tell the supernode a leased task is starting; False if the lease was lost"""
+        if task.lease_seconds is None:
+            return True
+        response = self.network_client.post(
+            f"{self.supernode_url}/tasks/start",
+            {"node_id": self.node_id, "task_id": task.task_id}
+        )
+        return bool(response and response.status_code == 200)
+    
     def _execute_task(self, task: TaskAssignment):
         logger.info(f"Worker {self.node_id} executing task {task.task_id}")
         
         try:
-            time.sleep(5)  
+            if not self._acknowledge_start(task):
+                logger.warning(f"Worker {self.node_id} lost the lease on task {task.task_id}")
+                return
+            
+            started = time.time()
+            analysis = self.analysis_pool.submit(
+                run_analysis_task,
+                task.task_id,
+                task.code_url,
+                task.analysis_type,
+                task.shard_index,
+                task.shard_count
+            ).result()
+            execution_time = time.time() - started
+            self.prefetch.record_task_duration(execution_time)
+            self.throughput.record(analysis.get("results", {}))
+            self._record_findings_cache(analysis.pop("findings_cache", None))
             
             results = {
                 "task_id": task.task_id,
                 "analysis_type": task.analysis_type,
                 "code_url": task.code_url,
-                "findings": {
-                    "issues_found": 3,
-                    "severity": "medium",
-                    "details": [
-                        {
-                            "type": "security",
-                            "line": 42,
-                            "description": "Potential SQL injection"
-                        },
-                        {
-                            "type": "style",
-                            "line": 15,
-                            "description": "Line too long"
-                        },
-                        {
-                            "type": "performance",
-                            "line": 78,
-                            "description": "Inefficient loop"
-                        }
-                    ]
-                },
-                "execution_time": 5.0,
+                "status": analysis.get("status", "failed"),
+                "language": analysis.get("language"),
+                "commit_id": analysis.get("commit_id"),
+                "findings": analysis.get("results", {}),
+                "execution_time": round(execution_time, 3),
                 "timestamp": datetime.now().isoformat()
             }
+            if "shard" in analysis:
+                results["shard"] = analysis["shard"]
+            if "error" in analysis:
+                results["error"] = analysis["error"]
             
             # Submit results
             submission = ResultSubmission(
@@ -218,16 +451,8 @@ class WorkerNode:
                 node_id=self.node_id,
                 timestamp=datetime.now().isoformat()
             )
-            
-            response = self.network_client.post(
-                f"{self.supernode_url}/results",
-                submission.to_dict()
-            )
-            
-            if response and response.status_code == 200:
-                logger.info(f"Worker {self.node_id} submitted results for task {task.task_id}")
-            else:
-                logger.error(f"Worker {self.node_id} failed to submit results for task {task.task_id}")
+            self.outbox.put(submission)
+            self.result_batcher.submit(submission)
                 
         except Exception as e:
             logger.error(f"Worker {self.node_id} error executing task {task.task_id}: {e}")
@@ -238,12 +463,70 @@ class WorkerNode:
                     del self.current_tasks[task.task_id]
             
             logger.info(f"Worker {self.node_id} completed task {task.task_id}")
+            # Start the next task now and top the buffer back up
+            if self.is_running:
+                self._dispatch_prefetched()
+                self.poll_wakeup.set()
+    
+    def _send_results(self, submissions: List[ResultSubmission]) -> bool:
+        # Waiting for the blocks tells which results actually reached the ledger
+        response = self.network_client.post(
+            f"{self.supernode_url}/results/batch?wait=true",
+            {"submissions": [submission.to_dict() for submission in submissions]},
+            compress=True
+        )
+        
+        if not (response and response.status_code == 200):
+            task_ids = ", ".join(submission.task_id for submission in submissions)
+            logger.error(f"Worker {self.node_id} failed to submit results for tasks {task_ids}")
+            return False
+        
+        # Results leave the outbox once sealed in a block or recorded before;
+        # rejections are final too. Ledger failures and shards whose parent
+        # isn't gathered yet stay, and a resend confirms them.
+        delivered = []
+        for item in response.json().get("results", []):
+            task_id = item.get("task_id")
+            if item.get("status") != "success":
+                logger.error(f"Worker {self.node_id} failed to submit results for task "
+                             f"{task_id}: {item.get('message')}")
+                if not item.get("retry"):
+                    delivered.append(task_id)
+            elif "block_index" in item or item.get("duplicate"):
+                logger.info(f"Worker {self.node_id} submitted results for task {task_id}")
+                delivered.append(task_id)
+        self.outbox.mark_delivered(delivered)
+        return True
+    
+    def _drain_outbox(self, older_than: float = OUTBOX_GRACE_SECONDS) -> bool:
+        """Resend undelivered results; False if the supernode couldn't be reached"""
+        undelivered = self.outbox.undelivered(older_than=older_than)
+        if undelivered:
+            logger.info(f"Worker {self.node_id} resending {len(undelivered)} undelivered results")
+        batch_size = self.result_batcher.max_batch
+        for start in range(0, len(undelivered), batch_size):
+            if not self._send_results(undelivered[start:start + batch_size]):
+                return False
+        return True
+    
+    def _outbox_loop(self):
+        # Also replays results left undelivered by a previous run
+        backoff = self.outbox_retry_interval
+        while self.is_running:
+            try:
+                delivered = self._drain_outbox()
+            except Exception as e:
+                logger.error(f"Outbox drain error: {e}")
+                delivered = False
+            
+            backoff = self.outbox_retry_interval if delivered else min(backoff * 2, OUTBOX_MAX_BACKOFF)
+            time.sleep(backoff)
     
     def _calculate_load(self) -> float:
         with self.task_lock:
             task_count = len(self.current_tasks)
         
-        return min(1.0, task_count / self.max_concurrent_tasks)
+        return self.concurrency.load(task_count)
     
     def get_status(self) -> Dict[str, Any]:
         #Get current node status
@@ -257,5 +540,10 @@ class WorkerNode:
             "capabilities": self.capabilities,
             "is_running": self.is_running,
             "current_tasks": current_task_ids,
-            "load": self._calculate_load()
+            "prefetched_tasks": self.prefetch.task_ids(),
+            "undelivered_results": len(self.outbox),
+            "load": self._calculate_load(),
+            "concurrency_limit": self.concurrency.limit,
+            "findings_cache": self.findings_cache_report(),
+            "resources": self._resource_report().to_dict()
         }
@@ -1,10 +1,21 @@
-
 import sys
 import os
+import argparse
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from p2p_network.supernode.api import app
-
 if __name__ == '__main__':
-    print("Starting Supernode on http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the P2P supernode')
+    parser.add_argument('--port', type=int, default=5000,
+                       help='Supernode port (default: 5000)')
+    parser.add_argument('--replica-of', type=str,
+                       help='Primary supernode URL to follow as a read-only ledger replica')
+    args = parser.parse_args()
+    
+    # The ledger is configured from the environment when it is first imported
+    if args.replica_of:
+        os.environ["LEDGER_REPLICA_OF"] = args.replica_of
+    
+    from p2p_network.supernode.api import app
+    
+    print(f"Starting Supernode on http://localhost:{args.port}")
+    app.run(host='0.0.0.0', port=args.port, debug=True)
\ No newline at end of file
@@ -11,9 +11,12 @@ from p2p_network.worker.worker_node import WorkerNode
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
-    print("\nShutting down worker node...")
+    print("\nDraining worker node (signal again to stop immediately)...")
+    # A second signal interrupts the drain
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
     if worker_node:
-        worker_node.stop()
+        worker_node.stop(drain_timeout=args.drain_timeout)
     sys.exit(0)
 
 
@@ -27,6 +30,16 @@ if __name__ == '__main__':
     parser.add_argument('--capabilities', type=str, nargs='+',
                        default=['python', 'javascript'],
                        help='Node capabilities (default: python javascript)')
+    parser.add_argument('--warm-analyzers', action='store_true',
+                       help='Keep pylint/flake8 servers and dmypy daemons running between tasks; '
+                            'each analysis process (one per CPU) holds its own set, '
+                            'which costs a few hundred MB of memory per process')
+    parser.add_argument('--max-concurrency', type=int,
+                       help='Upper bound for the adaptive task limit (default: 2 per CPU)')
+    parser.add_argument('--fixed-concurrency', action='store_true',
+                       help='Always run 3 tasks at once instead of adapting to CPU and memory')
+    parser.add_argument('--drain-timeout', type=float, default=300,
+                       help='Seconds to let running tasks finish on shutdown (default: 300)')
     
     args = parser.parse_args()
     
@@ -38,7 +51,10 @@ if __name__ == '__main__':
     worker_node = WorkerNode(
         node_id=args.node_id,
         port=args.port,
-        capabilities=args.capabilities
+        capabilities=args.capabilities,
+        warm_analyzers=args.warm_analyzers,
+        adaptive_concurrency=not args.fixed_concurrency,
+        max_concurrency=args.max_concurrency
     )
     
     print(f"Starting worker node {worker_node.node_id}...")